@@ -9,6 +9,7 @@ from typing import List
 from fastapi import FastAPI, Body
 from fastapi.responses import JSONResponse
 from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uuid
@@ -21,6 +22,11 @@ from sources.browser import Browser, create_driver
 from sources.utility import pretty_print
 from sources.logger import Logger
 from sources.schemas import QueryRequest, QueryResponse
+from sources.warmup import Warmup
+from sources.executors import executors
+from sources.plan_cache import PlanCache
+from sources.plan_checkpoint import PlanCheckpoint
+from sources.metrics import registry as metrics_registry
 
 
 from celery import Celery
@@ -48,19 +54,33 @@ def initialize_system():
     stealth_mode = config.getboolean('BROWSER', 'stealth_mode')
     personality_folder = "jarvis" if config.getboolean('MAIN', 'jarvis_personality') else "base"
     languages = config["MAIN"]["languages"].split(' ')
+    executors.configure(llm_io=config.getint('MAIN', 'executor_llm_io_workers', fallback=None),
+                        tools=config.getint('MAIN', 'executor_tool_workers', fallback=None),
+                        background=config.getint('MAIN', 'executor_background_workers', fallback=None))
 
     provider = Provider(
         provider_name=config["MAIN"]["provider_name"],
         model=config["MAIN"]["provider_model"],
         server_address=config["MAIN"]["provider_server_address"],
-        is_local=config.getboolean('MAIN', 'is_local')
+        is_local=config.getboolean('MAIN', 'is_local'),
+        record_path=config.get('MAIN', 'record_llm_path', fallback=None) or None,
+        replay_timing=config.get('MAIN', 'replay_timing', fallback="recorded"),
+        max_concurrency=config.getint('MAIN', 'provider_max_concurrency', fallback=4),
+        keep_alive=config.get('MAIN', 'provider_keep_alive', fallback="30m"),
+        context_length=config.getint('MAIN', 'provider_context_length', fallback=None),
+        num_thread=config.getint('MAIN', 'provider_num_thread', fallback=None),
+        max_retries=config.getint('MAIN', 'provider_max_retries', fallback=2),
+        hedge=config.getboolean('MAIN', 'provider_hedge_requests', fallback=False)
     )
     logger.info(f"Provider initialized: {provider.provider_name} ({provider.model})")
 
-    browser = Browser(
-        create_driver(headless=config.getboolean('BROWSER', 'headless_browser'), stealth_mode=stealth_mode),
-        anticaptcha_manual_install=stealth_mode
-    )
+    def make_browser() -> Browser:
+        return Browser(
+            create_driver(headless=config.getboolean('BROWSER', 'headless_browser'), stealth_mode=stealth_mode),
+            anticaptcha_manual_install=stealth_mode
+        )
+
+    browser = make_browser()
     logger.info("Browser initialized")
 
     agents = [
@@ -83,13 +103,26 @@ def initialize_system():
             name="Browser",
             prompt_path=f"prompts/{personality_folder}/browser_agent.txt",
             provider=provider, verbose=False, browser=browser
-        ),
+        )
+    ]
+    agents.append(
         PlannerAgent(
             name="Planner",
             prompt_path=f"prompts/{personality_folder}/planner_agent.txt",
-            provider=provider, verbose=False, browser=browser
+            provider=provider, verbose=False, browser=browser, browser_factory=make_browser,
+            max_parallel_tasks=config.getint('MAIN', 'planner_max_parallel_tasks', fallback=2),
+            update_policy=config.get('MAIN', 'planner_update_policy', fallback="on_failure"),
+            checkpoints=PlanCheckpoint(config.get('MAIN', 'planner_checkpoint_dir', fallback="conversations/planner_agent/checkpoints")),
+            handoff_tokens=config.getint('MAIN', 'planner_handoff_tokens', fallback=512),
+            early_dispatch=config.getboolean('MAIN', 'planner_early_dispatch', fallback=True),
+            task_time_budget=config.getfloat('MAIN', 'planner_task_time_budget', fallback=600),
+            task_token_budget=config.getint('MAIN', 'planner_task_token_budget', fallback=150000),
+            plan_cache=PlanCache(config.get('MAIN', 'planner_plan_cache_path', fallback="conversations/planner_agent/plan_cache.json"),
+                                 hit_threshold=config.getfloat('MAIN', 'planner_plan_cache_hit_threshold', fallback=0.75),
+                                 seed_threshold=config.getfloat('MAIN', 'planner_plan_cache_seed_threshold', fallback=0.5)),
+            shared_agents=agents
         )
-    ]
+    )
     logger.info("Agents initialized")
 
     interaction = Interaction(
@@ -103,6 +136,7 @@ def initialize_system():
     return interaction
 
 interaction = initialize_system()
+warmup = Warmup(interaction.agents, idle_timeout=config.getfloat('MAIN', 'warmup_idle_timeout', fallback=600.0))
 is_generating = False
 query_resp_history = []
 
@@ -141,6 +175,11 @@ user_profile = UserProfile(username="demo_user")
 integration_keys = IntegrationKeys()
 feedback_list: list = []
 
+@api.on_event("startup")
+async def start_warmup():
+    if config.getboolean('MAIN', 'warmup', fallback=True):
+        warmup.start()
+
 @api.get("/screenshot")
 async def get_screenshot():
     logger.info("Screenshot endpoint called")
@@ -158,6 +197,21 @@ async def health_check():
     logger.info("Health check endpoint called")
     return {"status": "healthy", "version": "0.1.0"}
 
+@api.get("/metrics")
+async def get_metrics(format: str = "prometheus"):
+    """LLM call telemetry, in the Prometheus text format or as json summaries."""
+    if format == "json":
+        return JSONResponse(status_code=200, content=metrics_registry.snapshot())
+    return PlainTextResponse(metrics_registry.render())
+
+@api.post("/stop")
+async def stop_query():
+    """Cancel the query being processed, aborting the provider call or tool in progress."""
+    logger.info("Stop endpoint called")
+    if interaction.stop():
+        return JSONResponse(status_code=200, content={"status": "stopping"})
+    return JSONResponse(status_code=404, content={"error": "No query in progress"})
+
 @api.get("/is_active")
 async def is_active():
     logger.info("Is active endpoint called")
@@ -186,11 +240,11 @@ async def get_latest_answer():
         return JSONResponse(status_code=200, content=query_resp_history[-1])
     return JSONResponse(status_code=404, content={"error": "No answer available"})
 
-async def think_wrapper(interaction, query):
+async def think_wrapper(interaction, query, agent=None):
     try:
         interaction.last_query = query
         logger.info("Agents request is being processed")
-        success = await interaction.think()
+        success = await interaction.think(agent=agent)
         if not success:
             interaction.last_answer = "Error: No answer from agent"
             interaction.last_success = False
@@ -207,8 +261,21 @@ async def think_wrapper(interaction, query):
 
 @api.post("/query", response_model=QueryResponse)
 async def process_query(request: QueryRequest):
-    global is_generating, query_resp_history
     logger.info(f"Processing query: {request.query}")
+    return await answer_query(request.query)
+
+@api.post("/resume", response_model=QueryResponse)
+async def resume_query():
+    """Resume the last interrupted planner run from its first unfinished task."""
+    planner = next((agent for agent in interaction.agents if agent.type == "planner_agent"), None)
+    goal = planner.checkpoints.latest() if planner is not None else None
+    if goal is None:
+        return JSONResponse(status_code=404, content={"error": "No interrupted plan to resume"})
+    logger.info(f"Resuming plan of query: {goal}")
+    return await answer_query(goal, agent=planner)
+
+async def answer_query(query: str, agent=None):
+    global is_generating, query_resp_history
     query_resp = QueryResponse(
         done="false",
         answer="",
@@ -224,7 +291,7 @@ async def process_query(request: QueryRequest):
 
     try:
         is_generating = True
-        success = await think_wrapper(interaction, request.query)
+        success = await think_wrapper(interaction, query, agent)
         is_generating = False
 
         if not success:
@@ -4,12 +4,17 @@ import sys
 import argparse
 import configparser
 import asyncio
+import threading
 
 from sources.llm_provider import Provider
 from sources.interaction import Interaction
 from sources.agents import Agent, CoderAgent, CasualAgent, FileAgent, PlannerAgent, BrowserAgent, McpAgent
 from sources.browser import Browser, create_driver
 from sources.utility import pretty_print
+from sources.warmup import Warmup
+from sources.executors import executors
+from sources.plan_cache import PlanCache
+from sources.plan_checkpoint import PlanCheckpoint
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -17,21 +22,57 @@ warnings.filterwarnings("ignore")
 config = configparser.ConfigParser()
 config.read('config.ini')
 
+async def get_user(interaction: Interaction) -> None:
+    """
+    Wait for the user input in a daemon thread: the event loop keeps running (warm-up) meanwhile,
+    and an interrupt still exits without waiting for the pending input.
+    """
+    loop = asyncio.get_running_loop()
+    read = asyncio.Event()
+    errors = []
+
+    def worker():
+        try:
+            interaction.get_user()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            loop.call_soon_threadsafe(read.set)
+
+    threading.Thread(target=worker, daemon=True).start()
+    await read.wait()
+    if errors:
+        raise errors[0]
+
 async def main():
     pretty_print("Initializing...", color="status")
     stealth_mode = config.getboolean('BROWSER', 'stealth_mode')
     personality_folder = "jarvis" if config.getboolean('MAIN', 'jarvis_personality') else "base"
     languages = config["MAIN"]["languages"].split(' ')
+    executors.configure(llm_io=config.getint('MAIN', 'executor_llm_io_workers', fallback=None),
+                        tools=config.getint('MAIN', 'executor_tool_workers', fallback=None),
+                        background=config.getint('MAIN', 'executor_background_workers', fallback=None))
 
     provider = Provider(provider_name=config["MAIN"]["provider_name"],
                         model=config["MAIN"]["provider_model"],
                         server_address=config["MAIN"]["provider_server_address"],
-                        is_local=config.getboolean('MAIN', 'is_local'))
+                        is_local=config.getboolean('MAIN', 'is_local'),
+                        record_path=config.get('MAIN', 'record_llm_path', fallback=None) or None,
+                        replay_timing=config.get('MAIN', 'replay_timing', fallback="recorded"),
+                        max_concurrency=config.getint('MAIN', 'provider_max_concurrency', fallback=4),
+                        keep_alive=config.get('MAIN', 'provider_keep_alive', fallback="30m"),
+                        context_length=config.getint('MAIN', 'provider_context_length', fallback=None),
+                        num_thread=config.getint('MAIN', 'provider_num_thread', fallback=None),
+                        max_retries=config.getint('MAIN', 'provider_max_retries', fallback=2),
+                        hedge=config.getboolean('MAIN', 'provider_hedge_requests', fallback=False))
 
-    browser = Browser(
-        create_driver(headless=config.getboolean('BROWSER', 'headless_browser'), stealth_mode=stealth_mode),
-        anticaptcha_manual_install=stealth_mode
-    )
+    def make_browser() -> Browser:
+        return Browser(
+            create_driver(headless=config.getboolean('BROWSER', 'headless_browser'), stealth_mode=stealth_mode),
+            anticaptcha_manual_install=stealth_mode
+        )
+
+    browser = make_browser()
 
     agents = [
         CasualAgent(name=config["MAIN"]["agent_name"],
@@ -46,13 +87,26 @@ async def main():
         BrowserAgent(name="Browser",
                      prompt_path=f"prompts/{personality_folder}/browser_agent.txt",
                      provider=provider, verbose=False, browser=browser),
-        PlannerAgent(name="Planner",
-                     prompt_path=f"prompts/{personality_folder}/planner_agent.txt",
-                     provider=provider, verbose=False, browser=browser),
         #McpAgent(name="MCP Agent",
         #            prompt_path=f"prompts/{personality_folder}/mcp_agent.txt",
         #            provider=provider, verbose=False), # NOTE under development
     ]
+    agents.append(
+        PlannerAgent(name="Planner",
+                     prompt_path=f"prompts/{personality_folder}/planner_agent.txt",
+                     provider=provider, verbose=False, browser=browser, browser_factory=make_browser,
+                     max_parallel_tasks=config.getint('MAIN', 'planner_max_parallel_tasks', fallback=2),
+                     update_policy=config.get('MAIN', 'planner_update_policy', fallback="on_failure"),
+                     checkpoints=PlanCheckpoint(config.get('MAIN', 'planner_checkpoint_dir', fallback="conversations/planner_agent/checkpoints")),
+                     handoff_tokens=config.getint('MAIN', 'planner_handoff_tokens', fallback=512),
+                     early_dispatch=config.getboolean('MAIN', 'planner_early_dispatch', fallback=True),
+                     task_time_budget=config.getfloat('MAIN', 'planner_task_time_budget', fallback=600),
+                     task_token_budget=config.getint('MAIN', 'planner_task_token_budget', fallback=150000),
+                     plan_cache=PlanCache(config.get('MAIN', 'planner_plan_cache_path', fallback="conversations/planner_agent/plan_cache.json"),
+                                          hit_threshold=config.getfloat('MAIN', 'planner_plan_cache_hit_threshold', fallback=0.75),
+                                          seed_threshold=config.getfloat('MAIN', 'planner_plan_cache_seed_threshold', fallback=0.5)),
+                     shared_agents=agents)
+    )
 
     interaction = Interaction(agents,
                               tts_enabled=config.getboolean('MAIN', 'speak'),
@@ -60,9 +114,13 @@ async def main():
                               recover_last_session=config.getboolean('MAIN', 'recover_last_session'),
                               langs=languages
                             )
+    warmup_task = None
+    if config.getboolean('MAIN', 'warmup', fallback=True):
+        warmup = Warmup(agents, idle_timeout=config.getfloat('MAIN', 'warmup_idle_timeout', fallback=600.0))
+        warmup_task = asyncio.create_task(warmup.run())
     try:
         while interaction.is_active:
-            interaction.get_user()
+            await get_user(interaction)
             if await interaction.think():
                 interaction.show_answer()
                 interaction.speak_answer()
@@ -71,6 +129,8 @@ async def main():
             interaction.save_session()
         raise e
     finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
         if config.getboolean('MAIN', 'save_session'):
             interaction.save_session()
 
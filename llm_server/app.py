@@ -6,22 +6,32 @@ from flask import Flask, jsonify, request
 
 from sources.llamacpp_handler import LlamacppLLM
 from sources.ollama_handler import OllamaLLM
+from sources.fake_handler import FakeLLM
 
 parser = argparse.ArgumentParser(description='AgenticSeek server script')
-parser.add_argument('--provider', type=str, help='LLM backend library to use. set to [ollama], [vllm] or [llamacpp]', required=True)
+parser.add_argument('--provider', type=str, help='LLM backend library to use. set to [ollama], [llamacpp] or [fake] for benchmarks', required=True)
 parser.add_argument('--port', type=int, help='port to use', required=True)
+parser.add_argument('--ram-budget', type=float, help='memory budget in GB for loaded models, defaults to 80%% of the host memory', default=None)
+parser.add_argument('--pin', type=str, nargs='*', help='models to preload and never evict', default=[])
+parser.add_argument('--mode', type=str, help='server mode: [flask] legacy start/poll protocol or [asgi] OpenAI compatible async server', default="flask")
+parser.add_argument('--max-concurrent', type=int, help='maximum concurrent generations in asgi mode', default=1)
 args = parser.parse_args()
 
 app = Flask(__name__)
 
-assert args.provider in ["ollama", "llamacpp"], f"Provider {args.provider} does not exists. see --help for more information"
+assert args.provider in ["ollama", "llamacpp", "fake"], f"Provider {args.provider} does not exists. see --help for more information"
+assert args.mode in ["flask", "asgi"], f"Mode {args.mode} does not exists. see --help for more information"
+
+ram_budget = int(args.ram_budget * 1024**3) if args.ram_budget is not None else None
 
 handler_map = {
-    "ollama": OllamaLLM(),
-    "llamacpp": LlamacppLLM(),
+    "ollama": OllamaLLM,
+    "llamacpp": LlamacppLLM,
+    "fake": FakeLLM,
 }
 
-generator = handler_map[args.provider]
+generator = handler_map[args.provider](ram_budget=ram_budget, pinned_models=args.pin)
+generator.warm_models(args.pin)
 
 @app.route('/generate', methods=['POST'])
 def start_generation():
@@ -42,6 +52,23 @@ def setup():
     generator.set_model(model)
     return jsonify({"message": "Model set"}), 200
 
+@app.route('/stop', methods=['POST'])
+def stop_generation():
+    if generator.stop():
+        return jsonify({"message": "Generation stopping"}), 200
+    return jsonify({"message": "No generation in progress"}), 200
+
+@app.route('/models')
+def get_models():
+    return jsonify(generator.registry.stats()), 200
+
+@app.route('/model_info')
+def get_model_info():
+    model = request.args.get('model', None) or generator.model
+    if model is None:
+        return jsonify({"error": "Model not provided"}), 403
+    return jsonify({"model": model, "context_length": generator.context_length(model)}), 200
+
 @app.route('/get_updated_sentence')
 def get_updated_sentence():
     if not generator:
@@ -50,4 +77,11 @@ def get_updated_sentence():
     return generator.get_status()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', threaded=True, debug=True, port=args.port)
\ No newline at end of file
+    if args.mode == "asgi":
+        import uvicorn
+        from sources.scheduler import RequestScheduler
+        from sources.openai_api import create_app
+        scheduler = RequestScheduler(max_concurrent=args.max_concurrent)
+        uvicorn.run(create_app(generator, scheduler, args.provider), host='0.0.0.0', port=args.port)
+    else:
+        app.run(host='0.0.0.0', threaded=True, debug=True, port=args.port)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+"""
+Load generation benchmark for the llm_server OpenAI compatible endpoint (app.py --mode asgi).
+
+Replay recorded agenticSeek conversations (conversations/<agent>/memory_*.txt) against the server
+with a fixed concurrency (closed loop) or a Poisson arrival rate (open loop), then report
+TTFT, tokens/s, queue wait, latency percentiles and error rate per handler.
+
+Examples:
+    python3 benchmark.py --fake --requests 50 --concurrency 8
+    python3 benchmark.py --url http://127.0.0.1:3333 --model deepseek-r1:14b --rate 0.5 --requests 20
+"""
+
+import os
+import glob
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+
+import httpx
+
+def load_histories(path: str) -> list:
+    """
+    Load the recorded conversations and cut them at every user turn, where an agent called the LLM.
+    """
+    histories = []
+    for filename in sorted(glob.glob(os.path.join(path, "*", "memory_*.txt"))):
+        try:
+            with open(filename, 'r') as f:
+                memory = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            continue
+        messages = [{"role": m["role"], "content": m["content"]} for m in memory if "role" in m and "content" in m]
+        for i, message in enumerate(messages):
+            if message["role"] == "user":
+                histories.append(messages[:i+1])
+    if not histories:
+        histories.append([
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": "Write a python script that prints the first 10 prime numbers."},
+        ])
+    return histories
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+class RequestResult:
+    def __init__(self):
+        self.handler = "unknown"
+        self.ok = False
+        self.error = None
+        self.ttft = None
+        self.latency = 0.0
+        self.tokens = 0
+        self.queue_wait = 0.0
+
+async def send_request(client: httpx.AsyncClient, url: str, model: str, history: list, max_tokens: int | None) -> RequestResult:
+    result = RequestResult()
+    payload = {"model": model, "messages": history, "stream": True}
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+    start = time.perf_counter()
+    try:
+        async with client.stream("POST", f"{url}/v1/chat/completions", json=payload) as response:
+            result.handler = response.headers.get("x-handler", "unknown")
+            result.queue_wait = float(response.headers.get("x-queue-wait", 0.0))
+            if response.status_code != 200:
+                await response.aread()
+                raise Exception(f"HTTP {response.status_code}: {response.text}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                delta = json.loads(line[6:])["choices"][0]["delta"]
+                if delta.get("content", None):
+                    if result.ttft is None:
+                        result.ttft = time.perf_counter() - start
+                    result.tokens += 1
+        result.ok = True
+    except Exception as e:
+        result.error = str(e)
+    result.latency = time.perf_counter() - start
+    return result
+
+async def run_benchmark(url: str, model: str, histories: list, n_requests: int, concurrency: int,
+                        rate: float, max_tokens: int | None, seed: int = 0) -> list:
+    """
+    Send n_requests requests, either closed loop with `concurrency` workers or open loop with Poisson arrivals at `rate` req/s.
+    """
+    rng = random.Random(seed)
+    workload = [histories[i % len(histories)] for i in range(n_requests)]
+    rng.shuffle(workload)
+    limits = httpx.Limits(max_connections=max(concurrency, 1) * 2)
+    timeout = httpx.Timeout(None)
+    results = []
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        if rate > 0:
+            tasks = []
+            for history in workload:
+                tasks.append(asyncio.create_task(send_request(client, url, model, history, max_tokens)))
+                await asyncio.sleep(rng.expovariate(rate))
+            results = await asyncio.gather(*tasks)
+        else:
+            queue = asyncio.Queue()
+            for history in workload:
+                queue.put_nowait(history)
+
+            async def worker():
+                while True:
+                    try:
+                        history = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    results.append(await send_request(client, url, model, history, max_tokens))
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return list(results)
+
+def summarize(results: list, wall_time: float) -> dict:
+    report = {}
+    handlers = sorted(set(r.handler for r in results))
+    for handler in handlers:
+        rs = [r for r in results if r.handler == handler]
+        ok = [r for r in rs if r.ok]
+        ttfts = [r.ttft for r in ok if r.ttft is not None]
+        latencies = [r.latency for r in ok]
+        waits = [r.queue_wait for r in ok]
+        decode_rates = [r.tokens / (r.latency - r.ttft) for r in ok if r.ttft is not None and r.latency > r.ttft]
+        report[handler] = {
+            "requests": len(rs),
+            "errors": len(rs) - len(ok),
+            "error_rate": (len(rs) - len(ok)) / len(rs),
+            "ttft_p50": percentile(ttfts, 50),
+            "ttft_p99": percentile(ttfts, 99),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "queue_wait_p50": percentile(waits, 50),
+            "queue_wait_p99": percentile(waits, 99),
+            "tokens_per_second": sum(decode_rates) / len(decode_rates) if decode_rates else 0.0,
+            "throughput_tokens_per_second": sum(r.tokens for r in ok) / wall_time if wall_time > 0 else 0.0,
+            "sample_errors": list(set(r.error for r in rs if r.error))[:3],
+        }
+    return report
+
+def print_report(report: dict) -> None:
+    for handler, stats in report.items():
+        print(f"\n== handler: {handler} ==")
+        print(f"requests: {stats['requests']}  errors: {stats['errors']} ({stats['error_rate']*100:.1f}%)")
+        print(f"TTFT        p50 {stats['ttft_p50']*1000:9.1f} ms   p99 {stats['ttft_p99']*1000:9.1f} ms")
+        print(f"latency     p50 {stats['latency_p50']:9.2f} s    p95 {stats['latency_p95']:9.2f} s    p99 {stats['latency_p99']:9.2f} s")
+        print(f"queue wait  p50 {stats['queue_wait_p50']:9.2f} s    p99 {stats['queue_wait_p99']:9.2f} s")
+        print(f"decode      {stats['tokens_per_second']:9.1f} tokens/s per request, {stats['throughput_tokens_per_second']:.1f} tokens/s total")
+        for error in stats['sample_errors']:
+            print(f"error: {error}")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_fake_server(max_concurrent: int, tokens_per_second: float) -> str:
+    """
+    Start the ASGI server in-process with the fake handler, return its url.
+    """
+    import uvicorn
+    from sources.fake_handler import FakeLLM
+    from sources.scheduler import RequestScheduler
+    from sources.openai_api import create_app
+
+    generator = FakeLLM(tokens_per_second=tokens_per_second)
+    generator.set_model("fake")
+    app = create_app(generator, RequestScheduler(max_concurrent=max_concurrent), "fake")
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description='AgenticSeek server benchmark')
+    parser.add_argument('--url', type=str, help='url of the llm_server running in asgi mode', default=None)
+    parser.add_argument('--fake', action='store_true', help='start an in-process server with the fake handler, no model needed')
+    parser.add_argument('--model', type=str, help='model to request', default="fake")
+    parser.add_argument('--histories', type=str, help='folder of recorded conversations', default="../conversations")
+    parser.add_argument('--requests', type=int, help='number of requests to send', default=20)
+    parser.add_argument('--concurrency', type=int, help='concurrent clients (closed loop)', default=4)
+    parser.add_argument('--rate', type=float, help='arrival rate in requests/s (open loop), overrides --concurrency', default=0.0)
+    parser.add_argument('--max-tokens', type=int, help='max tokens per answer', default=None)
+    parser.add_argument('--server-concurrency', type=int, help='max concurrent generations of the fake server', default=1)
+    parser.add_argument('--fake-tokens-per-second', type=float, help='decode speed of the fake handler', default=200.0)
+    parser.add_argument('--json', type=str, help='write the report as json to this file', default=None)
+    args = parser.parse_args()
+
+    if args.fake:
+        url = start_fake_server(args.server_concurrency, args.fake_tokens_per_second)
+    elif args.url:
+        url = args.url.rstrip('/')
+    else:
+        parser.error("either --url or --fake is required")
+
+    histories = load_histories(args.histories)
+    print(f"Replaying {args.requests} requests from {len(histories)} recorded histories against {url}")
+    start = time.perf_counter()
+    results = asyncio.run(run_benchmark(url, args.model, histories, args.requests,
+                                        args.concurrency, args.rate, args.max_tokens))
+    report = summarize(results, time.perf_counter() - start)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import time
+from .generator import GeneratorLLM
+
+class FakeLLM(GeneratorLLM):
+
+    def __init__(self, ram_budget=None, pinned_models=None, tokens_per_second=50.0, prefill_tokens_per_second=1000.0, max_tokens=256):
+        """
+        Handle generation with a fake model, for benchmarks and tests without any model installed.
+        Prefill time is simulated from the prompt length, then tokens are emitted at a fixed rate.
+        """
+        super().__init__(ram_budget, pinned_models)
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.max_tokens = max_tokens
+
+    def stream(self, model, history, options=None):
+        options = options or {}
+        prompt_tokens = sum(len(message.get('content', '')) for message in history) // 4
+        with self.registry.lease(model):
+            time.sleep(prompt_tokens / self.prefill_tokens_per_second)
+            for i in range(options.get("max_tokens", None) or self.max_tokens):
+                time.sleep(1.0 / self.tokens_per_second)
+                yield f"token{i} "
+
+    def generate(self, history):
+        self.logger.info(f"Using {self.model} for generation with fake handler")
+        try:
+            with self.state.lock:
+                self.state.is_generating = True
+                self.state.last_complete_sentence = ""
+                self.state.current_buffer = ""
+            for content in self.stream(self.model, history):
+                with self.state.lock:
+                    if self.state.stop_requested:
+                        break
+                    self.state.current_buffer += content
+        finally:
+            with self.state.lock:
+                self.state.is_generating = False
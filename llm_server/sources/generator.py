@@ -3,6 +3,7 @@ import threading
 import logging
 from abc import abstractmethod
 from .cache import Cache
+from .model_registry import ModelRegistry, total_system_memory
 
 class GenerationState:
     def __init__(self):
@@ -10,6 +11,7 @@ class GenerationState:
         self.last_complete_sentence = ""
         self.current_buffer = ""
         self.is_generating = False
+        self.stop_requested = False
     
     def status(self) -> dict:
         return {
@@ -20,7 +22,12 @@ class GenerationState:
         }
 
 class GeneratorLLM():
-    def __init__(self):
+    def __init__(self, ram_budget: int | None = None, pinned_models: list | None = None):
+        """
+        Args:
+            ram_budget (int, optional): memory budget in bytes for loaded models, defaults to 80% of the host memory.
+            pinned_models (list, optional): warm set of models that are never evicted.
+        """
         self.model = None
         self.state = GenerationState()
         self.logger = logging.getLogger(__name__)
@@ -31,10 +38,23 @@ class GeneratorLLM():
         self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
         cache = Cache()
+        if ram_budget is None and total_system_memory() is not None:
+            ram_budget = int(total_system_memory() * 0.8)
+        self.registry = ModelRegistry(self.load_model,
+                                      self.unload_model,
+                                      self.estimate_model_size,
+                                      budget=ram_budget,
+                                      pinned=pinned_models)
     
     def set_model(self, model: str) -> None:
         self.logger.info(f"Model set to {model}")
         self.model = model
+
+    def warm_models(self, models: list) -> None:
+        """Load and pin the warm set in the background."""
+        if not models:
+            return
+        threading.Thread(target=self.registry.warm, args=(models,), daemon=True).start()
     
     def start(self, history: list) -> bool:
         if self.model is None:
@@ -43,14 +63,63 @@ class GeneratorLLM():
             if self.state.is_generating:
                 return False
             self.state.is_generating = True
+            self.state.stop_requested = False
             self.logger.info("Starting generation")
             threading.Thread(target=self.generate, args=(history,)).start()
         return True
     
+    def stop(self) -> bool:
+        """
+        Ask the generation in progress to stop, the handlers check it between chunks.
+        """
+        with self.state.lock:
+            if not self.state.is_generating:
+                return False
+            self.state.stop_requested = True
+        self.logger.info("Stop requested")
+        return True
+
     def get_status(self) -> dict:
         with self.state.lock:
             return self.state.status()
 
+    def context_length(self, model: str) -> int | None:
+        """
+        Context window the model runs with, None if unknown.
+        """
+        return None
+
+    def load_model(self, model: str):
+        """
+        Load a model in memory and return its handle.
+        """
+        return model
+
+    def unload_model(self, model: str, handle) -> None:
+        """
+        Free a model loaded by load_model.
+        """
+        pass
+
+    def estimate_model_size(self, model: str, handle=None) -> int:
+        """
+        Estimate the memory used by a model in bytes, measure it if the handle is given.
+        """
+        return 0
+
+    @abstractmethod
+    def stream(self, model: str, history: list, options: dict | None = None):
+        """
+        Generate text with the given model, yielding the text chunks as they are produced.
+        args:
+            model: name of the model to use
+            history: list of messages
+            options: generation options (max_tokens, temperature, stop)
+        yields:
+            str chunks of text
+        """
+        pass
+
     @abstractmethod
     def generate(self, history: list) -> None:
         """
@@ -1,40 +1,96 @@
-
+import os
+import fnmatch
+import threading
 from .generator import GeneratorLLM
-from llama_cpp import Llama
+from llama_cpp import Llama, LlamaRAMCache
 from .decorator import timer_decorator
 
 class LlamacppLLM(GeneratorLLM):
 
-    def __init__(self):
+    def __init__(self, ram_budget=None, pinned_models=None):
         """
         Handle generation using llama.cpp
         """
-        super().__init__()
-        self.llm = None
-    
+        super().__init__(ram_budget, pinned_models)
+        self.filename = "*Q8_0.gguf"
+        self.n_ctx = 4096
+        self.prefix_cache_bytes = 2 << 30
+        # a Llama instance is not thread-safe, concurrent requests to a model generate one at a time
+        self.model_locks = {}
+        self.model_locks_lock = threading.Lock()
+
+    def load_model(self, model: str):
+        self.logger.info(f"Loading {model}...")
+        llm = Llama.from_pretrained(
+            repo_id=model,
+            filename=self.filename,
+            n_ctx=self.n_ctx,
+            verbose=True
+        )
+        # reuse the KV state of shared prompt prefixes (agent system prompts) across requests
+        llm.set_cache(LlamaRAMCache(capacity_bytes=self.prefix_cache_bytes))
+        return llm
+
+    def unload_model(self, model: str, handle) -> None:
+        self.logger.info(f"Unloading {model}...")
+        handle.close()
+
+    def estimate_model_size(self, model: str, handle=None) -> int:
+        """
+        Use the size of the gguf file, from disk once loaded or from the hub metadata before.
+        """
+        if handle is not None:
+            return os.path.getsize(handle.model_path)
+        try:
+            from huggingface_hub import HfApi
+            info = HfApi().model_info(model, files_metadata=True)
+            for sibling in info.siblings:
+                if fnmatch.fnmatch(sibling.rfilename, self.filename) and sibling.size:
+                    return sibling.size
+        except Exception as e:
+            self.logger.warning(f"Could not estimate size of {model}: {str(e)}")
+        return 0
+
+    def context_length(self, model: str) -> int | None:
+        return self.n_ctx
+
+    def model_lock(self, model: str) -> threading.Lock:
+        with self.model_locks_lock:
+            if model not in self.model_locks:
+                self.model_locks[model] = threading.Lock()
+            return self.model_locks[model]
+
+    def stream(self, model, history, options=None):
+        options = options or {}
+        temperature = options.get("temperature", None)
+        with self.registry.lease(model) as llm, self.model_lock(model):
+            output = llm.create_chat_completion(
+                  messages = history,
+                  max_tokens = options.get("max_tokens", None),
+                  temperature = 0.2 if temperature is None else temperature,
+                  stop = options.get("stop", None) or [],
+                  stream = True
+            )
+            for chunk in output:
+                content = chunk['choices'][0]['delta'].get('content', None)
+                if content:
+                    yield content
+
     @timer_decorator
     def generate(self, history):
-        if self.llm is None:
-            self.logger.info(f"Loading {self.model}...")
-            self.llm = Llama.from_pretrained(
-                repo_id=self.model,
-                filename="*Q8_0.gguf",
-                n_ctx=4096,
-                verbose=True
-            )
         self.logger.info(f"Using {self.model} for generation with Llama.cpp")
         try:
             with self.state.lock:
                 self.state.is_generating = True
                 self.state.last_complete_sentence = ""
                 self.state.current_buffer = ""
-            output = self.llm.create_chat_completion(
-                  messages = history
-            )
-            with self.state.lock:
-                self.state.current_buffer = output['choices'][0]['message']['content']
+            for content in self.stream(self.model, history):
+                with self.state.lock:
+                    if self.state.stop_requested:
+                        break
+                    self.state.current_buffer += content
         except Exception as e:
             self.logger.error(f"Error: {e}")
         finally:
             with self.state.lock:
-                self.state.is_generating = False
\ No newline at end of file
+                self.state.is_generating = False
@@ -0,0 +1,221 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+def total_system_memory() -> int | None:
+    """
+    Return the physical memory of the host in bytes, None if unknown.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+class ModelEntry:
+    def __init__(self, name: str, handle, size: int):
+        self.name = name
+        self.handle = handle
+        self.size = size
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.uses = 0
+        self.in_use = 0
+
+    def jsonify(self) -> dict:
+        return {
+            "name": self.name,
+            "size": self.size,
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+            "uses": self.uses,
+            "in_use": self.in_use,
+        }
+
+class ModelRegistry:
+    """
+    Keep several models loaded within a memory budget.
+    Least recently used models are evicted first, pinned models and models in use are never evicted.
+    """
+    def __init__(self, loader, unloader, sizer, budget: int | None = None, pinned: list | None = None):
+        """
+        Args:
+            loader: callable(name) -> handle, load a model in memory.
+            unloader: callable(name, handle) -> None, free a model.
+            sizer: callable(name, handle=None) -> int, estimate the model size in bytes (measure it when a handle is given).
+            budget (int, optional): memory budget in bytes, None for no limit.
+            pinned (list, optional): models that are never evicted.
+        """
+        self.loader = loader
+        self.unloader = unloader
+        self.sizer = sizer
+        self.budget = budget
+        self.pinned = set(pinned or [])
+        self.models = OrderedDict()
+        self.loading = {} # name -> Event set once the model being loaded is inserted (or failed)
+        self.pending = 0 # estimated bytes of the models being loaded, counted in the budget
+        self.lock = threading.RLock()
+        self.logger = logging.getLogger(__name__)
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_failures": 0,
+            "evictions": 0,
+            "load_seconds": 0.0,
+        }
+
+    def used_memory(self) -> int:
+        with self.lock:
+            return sum(entry.size for entry in self.models.values())
+
+    def reserved_memory(self) -> int:
+        """Memory of the loaded models and of the models being loaded."""
+        with self.lock:
+            return self.used_memory() + self.pending
+
+    def is_loaded(self, name: str) -> bool:
+        with self.lock:
+            return name in self.models
+
+    def pin(self, name: str) -> None:
+        with self.lock:
+            self.pinned.add(name)
+
+    def unpin(self, name: str) -> None:
+        with self.lock:
+            self.pinned.discard(name)
+
+    def _evictable(self, keep: str | None = None) -> list:
+        with self.lock:
+            return [entry for entry in self.models.values()
+                    if entry.name not in self.pinned and entry.in_use == 0 and entry.name != keep]
+
+    def _make_room(self, needed: int, keep: str | None = None) -> None:
+        """Evict least recently used models until needed bytes fit in the budget."""
+        if self.budget is None:
+            return
+        while self.reserved_memory() + needed > self.budget:
+            candidates = self._evictable(keep)
+            if not candidates:
+                self.logger.warning(f"Memory budget exceeded, no model can be evicted ({self.reserved_memory()} + {needed} > {self.budget})")
+                return
+            self.evict(candidates[0].name)
+
+    def evict(self, name: str) -> bool:
+        with self.lock:
+            entry = self.models.get(name, None)
+            if entry is None:
+                return False
+            if entry.in_use > 0:
+                self.logger.warning(f"Model {name} is in use, not evicting.")
+                return False
+            del self.models[name]
+            self.metrics["evictions"] += 1
+        self.logger.info(f"Evicting model {name} ({entry.size} bytes)")
+        try:
+            self.unloader(name, entry.handle)
+        except Exception as e:
+            self.logger.error(f"Failed to unload {name}: {str(e)}")
+        return True
+
+    def get(self, name: str):
+        """
+        Return the handle of a model, loading it (and evicting others) if needed.
+        """
+        return self._get(name, lease=False)
+
+    def _get(self, name: str, lease: bool):
+        """
+        Return the handle of a model, counted in use if lease is True.
+        The model is loaded and measured outside the lock, so other models stay available meanwhile;
+        concurrent requests for the same model wait for the single load in progress.
+        """
+        while True:
+            with self.lock:
+                entry = self.models.get(name, None)
+                if entry is not None:
+                    self.metrics["hits"] += 1
+                    self.models.move_to_end(name)
+                    entry.last_used = time.time()
+                    entry.uses += 1
+                    if lease:
+                        entry.in_use += 1
+                    return entry.handle
+                loading = self.loading.get(name, None)
+                if loading is None:
+                    loading = threading.Event()
+                    self.loading[name] = loading
+                    self.metrics["misses"] += 1
+                    break
+            loading.wait() # loaded by another request, or its load failed and this one tries again
+        reserved = 0
+        try:
+            estimate = self.sizer(name)
+            with self.lock:
+                # reserved before making room, so concurrent loads of other models count it
+                self.pending += estimate
+                reserved = estimate
+            self._make_room(0)
+            start = time.time()
+            try:
+                handle = self.loader(name)
+            except Exception as e:
+                with self.lock:
+                    self.metrics["load_failures"] += 1
+                raise e
+            size = self.sizer(name, handle)
+            with self.lock:
+                self.pending -= reserved
+                reserved = 0
+                self.metrics["loads"] += 1
+                self.metrics["load_seconds"] += time.time() - start
+                entry = ModelEntry(name, handle, size)
+                entry.uses += 1
+                if lease:
+                    entry.in_use += 1
+                self.models[name] = entry
+            self.logger.info(f"Loaded model {name} in {time.time() - start:.2f}s ({entry.size} bytes)")
+            self._make_room(0, keep=name)
+            return handle
+        finally:
+            with self.lock:
+                self.pending -= reserved
+                del self.loading[name]
+            loading.set()
+
+    @contextmanager
+    def lease(self, name: str):
+        """
+        Hold a model for the duration of a generation so it cannot be evicted.
+        """
+        handle = self._get(name, lease=True)
+        try:
+            yield handle
+        finally:
+            with self.lock:
+                entry = self.models.get(name)
+                if entry is not None:
+                    entry.in_use -= 1
+
+    def warm(self, names: list) -> None:
+        """Load and pin a warm set of models."""
+        for name in names:
+            self.pin(name)
+            try:
+                self.get(name)
+            except Exception as e:
+                self.logger.error(f"Failed to warm model {name}: {str(e)}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "budget": self.budget,
+                "used": self.used_memory(),
+                "pending": self.pending,
+                "pinned": sorted(self.pinned),
+                "models": [entry.jsonify() for entry in reversed(self.models.values())],
+                **self.metrics,
+            }
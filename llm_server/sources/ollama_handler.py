@@ -1,4 +1,3 @@
-
 import time
 from .generator import GeneratorLLM
 from .cache import Cache
@@ -6,13 +5,89 @@ import ollama
 
 class OllamaLLM(GeneratorLLM):
 
-    def __init__(self):
+    def __init__(self, ram_budget=None, pinned_models=None):
         """
         Handle generation using Ollama.
+        Models are kept resident with keep_alive=-1 and unloaded by the registry.
         """
-        super().__init__()
+        super().__init__(ram_budget, pinned_models)
         self.cache = Cache()
 
+    def load_model(self, model: str):
+        self.logger.info(f"Loading {model} in Ollama...")
+        try:
+            ollama.generate(model=model, prompt="", keep_alive=-1)
+        except ollama.ResponseError as e:
+            if e.status_code != 404:
+                raise e
+            self.logger.info(f"Downloading {model}...")
+            ollama.pull(model)
+            ollama.generate(model=model, prompt="", keep_alive=-1)
+        return model
+
+    def unload_model(self, model: str, handle) -> None:
+        self.logger.info(f"Unloading {model} from Ollama...")
+        ollama.generate(model=model, prompt="", keep_alive=0)
+
+    def estimate_model_size(self, model: str, handle=None) -> int:
+        """
+        Use the resident size reported by Ollama once loaded, the size on disk before.
+        """
+        try:
+            if handle is not None:
+                for running in ollama.ps()['models']:
+                    if running['model'] == model or running['name'] == model:
+                        return running['size']
+            for local in ollama.list()['models']:
+                if local['model'] == model:
+                    return local['size']
+        except Exception as e:
+            self.logger.warning(f"Could not estimate size of {model}: {str(e)}")
+        return 0
+
+    def context_length(self, model: str) -> int | None:
+        """
+        Use the num_ctx of the Modelfile, the server does not override it.
+        """
+        try:
+            parameters = ollama.show(model).parameters or ""
+        except Exception as e:
+            self.logger.warning(f"Could not get context length of {model}: {str(e)}")
+            return None
+        for line in parameters.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0] == "num_ctx":
+                return int(fields[1])
+        return None
+
+    def stream(self, model, history, options=None):
+        options = options or {}
+        ollama_options = {}
+        if options.get("max_tokens", None) is not None:
+            ollama_options["num_predict"] = options["max_tokens"]
+        if options.get("temperature", None) is not None:
+            ollama_options["temperature"] = options["temperature"]
+        if options.get("stop", None):
+            ollama_options["stop"] = options["stop"]
+        try:
+            with self.registry.lease(model):
+                stream = ollama.chat(
+                    model=model,
+                    messages=history,
+                    stream=True,
+                    keep_alive=-1,
+                    options=ollama_options,
+                )
+                for chunk in stream:
+                    yield chunk['message']['content']
+        except Exception as e:
+            if "404" in str(e):
+                self.logger.info(f"Downloading {model}...")
+                ollama.pull(model)
+            if "refused" in str(e).lower():
+                raise Exception("Ollama connection failed. is the server running ?") from e
+            raise e
+
     def generate(self, history):
         self.logger.info(f"Using {self.model} for generation with Ollama")
         try:
@@ -21,26 +96,13 @@ class OllamaLLM(GeneratorLLM):
                 self.state.last_complete_sentence = ""
                 self.state.current_buffer = ""
 
-            stream = ollama.chat(
-                model=self.model,
-                messages=history,
-                stream=True,
-            )
-            for chunk in stream:
-                content = chunk['message']['content']
-
+            for content in self.stream(self.model, history):
                 with self.state.lock:
+                    if self.state.stop_requested:
+                        break
                     if '.' in content:
                         self.logger.info(self.state.current_buffer)
                     self.state.current_buffer += content
-
-        except Exception as e:
-            if "404" in str(e):
-                self.logger.info(f"Downloading {self.model}...")
-                ollama.pull(self.model)
-            if "refused" in str(e).lower():
-                raise Exception("Ollama connection failed. is the server running ?") from e
-            raise e
         finally:
             self.logger.info("Generation complete")
             with self.state.lock:
@@ -58,4 +120,4 @@ if __name__ == "__main__":
     generator.start(history)
     while True:
         print(generator.get_status())
-        time.sleep(1)
\ No newline at end of file
+        time.sleep(1)
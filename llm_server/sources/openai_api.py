@@ -0,0 +1,137 @@
+import json
+import time
+import uuid
+import asyncio
+import threading
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+async def iterate_in_thread(sync_iterator, on_finish=None):
+    """
+    Consume a blocking iterator in a worker thread and yield its items to the event loop.
+    When the consumer stops early (client disconnected), the iterator is closed so generation stops.
+    on_finish is called on the event loop once the iterator is closed, even if the consumer left before.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def worker():
+        try:
+            for item in sync_iterator:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            if hasattr(sync_iterator, "close"):
+                sync_iterator.close()
+            if on_finish is not None:
+                loop.call_soon_threadsafe(on_finish)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    threading.Thread(target=worker, daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def completion_chunk(completion_id: str, model: str, content: str | None, finish_reason: str | None = None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "delta": {"content": content} if content is not None else {},
+            "finish_reason": finish_reason,
+        }],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+def create_app(generator, scheduler, handler_name: str) -> FastAPI:
+    """
+    Create an OpenAI compatible ASGI app serving the given generator.
+    Args:
+        generator: the GeneratorLLM handler (ollama, llamacpp).
+        scheduler: the RequestScheduler bounding concurrent generations.
+        handler_name: name of the handler, reported in the X-Handler header.
+    """
+    app = FastAPI(title="AgenticSeek LLM server")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        data = await request.json()
+        model = data.get("model", None) or generator.model
+        messages = data.get("messages", [])
+        if model is None:
+            return JSONResponse(status_code=400, content={"error": {"message": "Model not provided"}})
+        options = {
+            "max_tokens": data.get("max_tokens", None),
+            "temperature": data.get("temperature", None),
+            "stop": data.get("stop", None),
+        }
+        if isinstance(options["stop"], str):
+            options["stop"] = [options["stop"]]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        queue_wait = await scheduler.acquire()
+        headers = {
+            "X-Queue-Wait": f"{queue_wait:.6f}",
+            "X-Handler": handler_name,
+        }
+
+        if data.get("stream", False):
+            async def event_stream():
+                # the slot is released by the worker thread once generation has really stopped
+                async for content in iterate_in_thread(generator.stream(model, messages, options), scheduler.release):
+                    yield completion_chunk(completion_id, model, content)
+                yield completion_chunk(completion_id, model, None, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+        try:
+            text = ""
+            async for content in iterate_in_thread(generator.stream(model, messages, options), scheduler.release):
+                text += content
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": {"message": str(e)}}, headers=headers)
+        return JSONResponse(content={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+        }, headers=headers)
+
+    @app.get("/v1/models")
+    async def list_models():
+        models = generator.registry.stats()["models"]
+        return {
+            "object": "list",
+            "data": [{"id": m["name"], "object": "model", "owned_by": handler_name,
+                      "context_length": generator.context_length(m["name"])} for m in models],
+        }
+
+    @app.get("/models")
+    async def models_stats():
+        return generator.registry.stats()
+
+    @app.get("/scheduler")
+    async def scheduler_stats():
+        return scheduler.stats()
+
+    return app
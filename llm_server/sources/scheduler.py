@@ -0,0 +1,58 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+class RequestScheduler:
+    """
+    Bound the number of generations running at the same time on the server.
+    Requests over the limit wait in FIFO order, the time spent waiting is recorded.
+    """
+    def __init__(self, max_concurrent: int = 1):
+        self.max_concurrent = max_concurrent
+        self.semaphore = None
+        self.waiting = 0
+        self.active = 0
+        self.metrics = {
+            "requests": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+        }
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free generation slot, return the time spent waiting in seconds.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        start = time.time()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.time() - start
+        self.active += 1
+        self.metrics["requests"] += 1
+        self.metrics["queue_wait_total"] += wait
+        self.metrics["queue_wait_max"] = max(self.metrics["queue_wait_max"], wait)
+        return wait
+
+    def release(self) -> None:
+        self.active -= 1
+        self.semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        wait = await self.acquire()
+        try:
+            yield wait
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "waiting": self.waiting,
+            "active": self.active,
+            **self.metrics,
+        }
@@ -1,16 +1,20 @@
 
-from typing import Tuple, Callable
+from typing import Tuple, Callable, Iterator
 from abc import abstractmethod
 import os
 import random
 import time
 
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 
 from sources.memory import Memory
 from sources.utility import pretty_print
 from sources.schemas import executorResult
+from sources.scheduler import PRIORITY_INTERACTIVE
+from sources.cancellation import check_cancelled
+from sources.tools.blocks import CodeBlock, parse_blocks, blocks_by_tag, replace_blocks
+from sources.streaming import BlockDispatcher
+from sources.executors import executors, TOOLS, BACKGROUND
 
 random.seed(time.time())
 
@@ -46,7 +50,11 @@ class Agent():
         self.last_answer = ""
         self.status_message = "Haven't started yet"
         self.verbose = verbose
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.priority = PRIORITY_INTERACTIVE
+        self.session_id = None
+        self.generation_options = {}
+        self.parsed_answer = (None, [])
+        self.stop_on_failure = True
     
     @property
     def get_agent_name(self) -> str:
@@ -142,21 +150,60 @@ class Agent():
         end_idx = text.rfind(end_tag)+8
         return text[start_idx:end_idx]
     
-    async def llm_request(self) -> Tuple[str, str]:
+    def get_session_id(self) -> str:
+        """
+        Session used for fair admission to the provider, sub-agents share the session of their planner.
+        """
+        return self.session_id or self.memory.session_id
+
+    def get_generation_options(self, options: dict | None = None) -> dict:
+        """
+        Merge the per-call generation options over the agent ones.
+        """
+        return {**self.generation_options, **(options or {})}
+
+    async def llm_request(self, options: dict | None = None, stream=None) -> Tuple[str, str]:
         """
         Asynchronously ask the LLM to process the prompt.
+        The provider is awaited directly, it admits calls by agent priority and session.
+        Args:
+            options (dict, optional): generation options for this call (max_tokens, stop, temperature, reasoning_effort).
+            stream (optional): sink fed with the answer as it is generated (e.g. a BlockDispatcher).
         """
         self.status_message = "Thinking..."
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, self.sync_llm_request)
+        options = self.get_generation_options(options)
+        memory = self.memory.get_within_context(options.get("max_tokens", None))
+        thought = await self.llm.arespond(memory, self.verbose, caller=self.agent_name,
+                                          priority=self.priority, session=self.get_session_id(), options=options,
+                                          stream=stream)
+        return self.handle_llm_answer(self.close_stopped_fence(thought, options))
     
-    def sync_llm_request(self) -> Tuple[str, str]:
+    def sync_llm_request(self, options: dict | None = None) -> Tuple[str, str]:
         """
         Ask the LLM to process the prompt and return the answer and the reasoning.
         """
-        memory = self.memory.get()
-        thought = self.llm.respond(memory, self.verbose)
+        options = self.get_generation_options(options)
+        memory = self.memory.get_within_context(options.get("max_tokens", None))
+        thought = self.llm.respond(memory, self.verbose, caller=self.agent_name,
+                                   priority=self.priority, session=self.get_session_id(), options=options)
+        return self.handle_llm_answer(self.close_stopped_fence(thought, options))
 
+    def close_stopped_fence(self, text: str, options: dict) -> str:
+        """
+        Stop sequences are not returned by the backends, close a code fence cut by a stop sequence.
+        """
+        if text is None or not any("```" in stop for stop in options.get("stop", None) or []):
+            return text
+        end_idx = text.rfind("</think>")
+        answer = text[end_idx + len("</think>"):] if end_idx != -1 else text
+        if answer.count("```") % 2 == 1:
+            return text + "\n```"
+        return text
+
+    def handle_llm_answer(self, thought: str) -> Tuple[str, str]:
+        """
+        Split the LLM output into answer and reasoning, and push the answer to memory.
+        """
         reasoning = self.extract_reasoning_text(thought)
         answer = self.remove_reasoning_text(thought)
         self.memory.push('assistant', answer)
@@ -169,8 +216,7 @@ class Agent():
                     "Computing... I recommand you have a coffee while I work.",
                     "Hold on, I’m crunching numbers.",
                     "Working on it, please let me think."]
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, lambda: speech_module.speak(messages[random.randint(0, len(messages)-1)]))
+        return await executors.run(BACKGROUND, speech_module.speak, messages[random.randint(0, len(messages)-1)])
     
     def get_last_tool_type(self) -> str:
         return self.blocks_result[-1].tool_type if len(self.blocks_result) > 0 else None
@@ -208,26 +254,21 @@ class Agent():
             else:
                 pretty_print(line, color="output")
 
+    def parse_answer(self, answer: str) -> list[CodeBlock]:
+        """
+        Parse the blocks of the answer, the result is kept for the following calls on the same answer.
+        """
+        text, blocks = self.parsed_answer
+        if text != answer:
+            blocks = parse_blocks(answer)
+            self.parsed_answer = (answer, blocks)
+        return blocks
+
     def remove_blocks(self, text: str) -> str:
         """
         Remove all code/query blocks within a tag from the answer text.
         """
-        tag = f'```'
-        lines = text.split('\n')
-        post_lines = []
-        in_block = False
-        block_idx = 0
-        for line in lines:
-            if tag in line and not in_block:
-                in_block = True
-                continue
-            if not in_block:
-                post_lines.append(line)
-            if tag in line:
-                in_block = False
-                post_lines.append(f"block:{block_idx}")
-                block_idx += 1
-        return "\n".join(post_lines)
+        return replace_blocks(text, self.parse_answer(text))
     
     def show_block(self, block: str) -> None:
         """
@@ -237,34 +278,108 @@ class Agent():
         pretty_print(block, color="code")
         pretty_print('▂'*64, color="status")
 
-    def execute_modules(self, answer: str) -> Tuple[bool, str]:
+    async def aexecute_modules(self, answer: str, dispatcher: BlockDispatcher | None = None) -> Tuple[bool, str]:
+        """
+        Execute the tools in the shared tools pool, so the event loop keeps serving (e.g. a stop request).
+        """
+        return await executors.run(TOOLS, self.execute_modules, answer, dispatcher)
+
+    def concurrent_block(self, tool, block: CodeBlock) -> bool:
+        """
+        A block can run next to others if it only reads (or was marked independent) and its tool is thread safe.
+        """
+        return (tool.side_effect_free or block.independent) and tool.thread_safe
+
+    def run_block(self, name: str, tool, block: str) -> executorResult:
+        check_cancelled()
+        output = tool.execute([block])
+        feedback = tool.interpreter_feedback(output) # tool interpreter feedback
+        success = not tool.execution_failure_check(output)
+        return executorResult(block, feedback, success, name)
+
+    def run_blocks(self, jobs: list, dispatcher: BlockDispatcher | None = None) -> Iterator[executorResult]:
+        """
+        Run the blocks and yield their results in the original order.
+        Consecutive concurrent blocks run together on the shared tools pool,
+        any other block waits for the blocks before it and runs alone.
+        Blocks the dispatcher already started while the answer streamed are not run again.
+        """
+        started = [dispatcher.take(block) if dispatcher is not None else None for _, _, block in jobs]
+        pool = executors.get(TOOLS)
+        announced = None
+        idx = 0
+        futures = []
+        try:
+            while idx < len(jobs):
+                batch = [idx]
+                idx += 1
+                if started[batch[0]] is None and self.concurrent_block(*jobs[batch[0]][1:]):
+                    while idx < len(jobs) and started[idx] is None and self.concurrent_block(*jobs[idx][1:]):
+                        batch.append(idx)
+                        idx += 1
+                for i in batch:
+                    name, _, block = jobs[i]
+                    if name != announced:
+                        count = sum(1 for job in jobs if job[0] == name)
+                        pretty_print(f"Executing {count} {name} blocks...", color="status")
+                        announced = name
+                    self.show_block(block.content)
+                if len(batch) == 1:
+                    name, tool, block = jobs[batch[0]]
+                    result = started[batch[0]].result() if started[batch[0]] is not None else None
+                    yield result if result is not None else self.run_block(name, tool, block.content)
+                    continue
+                futures = [pool.submit(self.run_block, *jobs[i][:2], jobs[i][2].content) for i in batch]
+                for i, future in zip(batch, futures):
+                    # a block still queued behind busy workers runs here, this thread may itself be a pool worker
+                    if future.cancel():
+                        yield self.run_block(*jobs[i][:2], jobs[i][2].content)
+                    else:
+                        yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            wait(futures)
+
+    def execute_modules(self, answer: str, dispatcher: BlockDispatcher | None = None) -> Tuple[bool, str]:
         """
         Execute all the tools the agent has and return the result.
+        With stop_on_failure the first failed block ends the execution, otherwise every block runs.
+        Args:
+            answer (str): the LLM answer.
+            dispatcher (BlockDispatcher, optional): blocks executed while the answer streamed, their results are reused.
         """
         feedback = ""
-        success = True
-        blocks = None
-        if answer.startswith("```"):
-            answer = "I will execute:\n" + answer # there should always be a text before blocks for the function that display answer
-
-        self.success = True
+        parsed = blocks_by_tag(self.parse_answer(answer))
+        jobs = []
+        tool_blocks = {}
         for name, tool in self.tools.items():
-            feedback = ""
-            blocks, save_path = tool.load_exec_block(answer)
-
+            blocks, save_path = tool.load_exec_block(answer, parsed.get(tool.tag, []))
             if blocks != None:
-                pretty_print(f"Executing {len(blocks)} {name} blocks...", color="status")
-                for block in blocks:
-                    self.show_block(block)
-                    output = tool.execute([block])
-                    feedback = tool.interpreter_feedback(output) # tool interpreter feedback
-                    success = not tool.execution_failure_check(output)
-                    self.blocks_result.append(executorResult(block, feedback, success, name))
-                    if not success:
-                        self.success = False
-                        self.memory.push('user', feedback)
+                tool_blocks[name] = (blocks, save_path)
+                jobs.extend((name, tool, block) for block in parsed[tool.tag])
+
+        self.success = True
+        failures = []
+        results = self.run_blocks(jobs, dispatcher)
+        try:
+            for idx, ((name, tool, _), result) in enumerate(zip(jobs, results)):
+                self.blocks_result.append(result)
+                feedback = result.feedback
+                last_of_tool = idx + 1 == len(jobs) or jobs[idx + 1][0] != name
+                if not result.success:
+                    self.success = False
+                    self.memory.push('user', feedback)
+                    if self.stop_on_failure:
                         return False, feedback
-                self.memory.push('user', feedback)
-                if save_path != None:
+                    failures.append(feedback)
+                elif last_of_tool:
+                    self.memory.push('user', feedback)
+                blocks, save_path = tool_blocks[name]
+                if last_of_tool and save_path != None:
                     tool.save_block(blocks, save_path)
+        finally:
+            results.close()
+        if failures:
+            return False, "\n".join(failures)
         return True, feedback
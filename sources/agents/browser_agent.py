@@ -38,10 +38,13 @@ class BrowserAgent(Agent):
         self.notes = []
         self.date = self.get_today_date()
         self.logger = Logger("browser_agent.log")
+        # the search query is a single line, skip the thinking and bound the decode
+        self.search_query_options = {"max_tokens": 512, "reasoning_effort": "none"}
         self.memory = Memory(self.load_prompt(prompt_path),
                         recover_last_session=False, # session recovery in handled by the interaction class
                         memory_compression=False,
-                        model_provider=provider.get_model_name())
+                        model_provider=provider.get_model_name(),
+                        context_length=provider.get_context_length())
     
     def get_today_date(self) -> str:
         """Get the date"""
@@ -338,7 +341,7 @@ class BrowserAgent(Agent):
 
         animate_thinking(f"Thinking...", color="status")
         mem_begin_idx = self.memory.push('user', self.search_prompt(user_prompt))
-        ai_prompt, reasoning = await self.llm_request()
+        ai_prompt, reasoning = await self.llm_request(options=self.search_query_options)
         if Action.REQUEST_EXIT.value in ai_prompt:
             pretty_print(f"Web agent requested exit.\n{reasoning}\n\n{ai_prompt}", color="failure")
             return ai_prompt, "" 
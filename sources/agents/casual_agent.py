@@ -21,7 +21,8 @@ class CasualAgent(Agent):
         self.memory = Memory(self.load_prompt(prompt_path),
                                 recover_last_session=False, # session recovery in handled by the interaction class
                                 memory_compression=False,
-                                model_provider=provider.get_model_name())
+                                model_provider=provider.get_model_name(),
+                                context_length=provider.get_context_length())
     
     async def process(self, prompt, speech_module) -> str:
         self.memory.push('user', prompt)
@@ -11,6 +11,8 @@ from sources.tools.JavaInterpreter import JavaInterpreter
 from sources.tools.fileFinder import FileFinder
 from sources.logger import Logger
 from sources.memory import Memory
+from sources.streaming import BlockDispatcher
+from sources.executors import executors, BACKGROUND
 
 class CoderAgent(Agent):
     """
@@ -33,7 +35,8 @@ class CoderAgent(Agent):
         self.memory = Memory(self.load_prompt(prompt_path),
                         recover_last_session=False, # session recovery in handled by the interaction class
                         memory_compression=False,
-                        model_provider=provider.get_model_name())
+                        model_provider=provider.get_model_name(),
+                        context_length=provider.get_context_length())
     
     def add_sys_info_prompt(self, prompt):
         """Add system information to the prompt."""
@@ -54,20 +57,25 @@ class CoderAgent(Agent):
         while attempt < max_attempts:
             animate_thinking("Thinking...", color="status")
             await self.wait_message(speech_module)
-            answer, reasoning = await self.llm_request()
-            if clarify_trigger in answer:
-                self.last_answer = answer
-                await asyncio.sleep(0)
-                return answer, reasoning
-            if not "```" in answer:
-                self.last_answer = answer
-                await asyncio.sleep(0)
-                break
-            self.show_answer()
-            animate_thinking("Executing code...", color="status")
-            self.status_message = "Executing code..."
-            self.logger.info(f"Attempt {attempt + 1}:\n{answer}")
-            exec_success, feedback = self.execute_modules(answer)
+            # blocks start executing as soon as their fence closes, while the model keeps generating
+            dispatcher = BlockDispatcher(self.tools, self.run_block)
+            try:
+                answer, reasoning = await self.llm_request(stream=dispatcher)
+                if clarify_trigger in answer:
+                    self.last_answer = answer
+                    await asyncio.sleep(0)
+                    return answer, reasoning
+                if not "```" in answer:
+                    self.last_answer = answer
+                    await asyncio.sleep(0)
+                    break
+                self.show_answer()
+                animate_thinking("Executing code...", color="status")
+                self.status_message = "Executing code..."
+                self.logger.info(f"Attempt {attempt + 1}:\n{answer}")
+                exec_success, feedback = await self.aexecute_modules(answer, dispatcher)
+            finally:
+                await executors.run(BACKGROUND, dispatcher.close)
             self.logger.info(f"Execution result: {exec_success}")
             answer = self.remove_blocks(answer)
             self.last_answer = answer
@@ -22,20 +22,26 @@ class FileAgent(Agent):
         self.memory = Memory(self.load_prompt(prompt_path),
                         recover_last_session=False, # session recovery in handled by the interaction class
                         memory_compression=False,
-                        model_provider=provider.get_model_name())
+                        model_provider=provider.get_model_name(),
+                        context_length=provider.get_context_length())
     
     async def process(self, prompt, speech_module) -> str:
         exec_success = False
+        attempt = 0
+        max_attempts = 5
         prompt += f"\nYou must work in directory: {self.work_dir}"
         self.memory.push('user', prompt)
-        while exec_success is False:
+        while exec_success is False and attempt < max_attempts:
             await self.wait_message(speech_module)
             animate_thinking("Thinking...", color="status")
             answer, reasoning = await self.llm_request()
-            exec_success, _ = self.execute_modules(answer)
+            exec_success, _ = await self.aexecute_modules(answer)
             answer = self.remove_blocks(answer)
             self.last_answer = answer
+            attempt += 1
         self.status_message = "Ready"
+        if not exec_success:
+            pretty_print(f"File operation still failing after {max_attempts} attempts.", color="failure")
         return answer, reasoning
 
 if __name__ == "__main__":
@@ -26,7 +26,8 @@ class McpAgent(Agent):
         self.memory = Memory(self.load_prompt(prompt_path),
                                 recover_last_session=False, # session recovery in handled by the interaction class
                                 memory_compression=False,
-                                model_provider=provider.get_model_name())
+                                model_provider=provider.get_model_name(),
+                                context_length=provider.get_context_length())
         self.enabled = True
     
     def get_api_keys(self) -> dict:
@@ -61,7 +62,7 @@ class McpAgent(Agent):
         while working == True:
             animate_thinking("Thinking...", color="status")
             answer, reasoning = await self.llm_request()
-            exec_success, _ = self.execute_modules(answer)
+            exec_success, _ = await self.aexecute_modules(answer)
             answer = self.remove_blocks(answer)
             self.last_answer = answer
             self.status_message = "Ready"
@@ -1,4 +1,6 @@
+import re
 import json
+import asyncio
 from typing import List, Tuple, Type, Dict
 from sources.utility import pretty_print, animate_thinking
 from sources.agents.agent import Agent
@@ -10,11 +12,55 @@ from sources.text_to_speech import Speech
 from sources.tools.tools import Tools
 from sources.logger import Logger
 from sources.memory import Memory
+from sources.scheduler import PRIORITY_PLANNER
+from sources.metrics import registry, estimate_tokens, current_usage
+from sources.cancellation import CancellationToken, CancelledByUser, current_cancellation
+from sources.budget import TaskBudget
+from sources.handoff import HandOff
+from sources.plan_parser import parse_json, PlanStreamParser
+from sources.plan_cache import PlanCache
+from sources.plan_checkpoint import PlanCheckpoint
+
+# sub-agent classes and prompts by the agent name used in plans
+SUB_AGENTS = {
+    "coder": (CoderAgent, "prompts/base/coder_agent.txt"),
+    "file": (FileAgent, "prompts/base/file_agent.txt"),
+    "web": (BrowserAgent, "prompts/base/browser_agent.txt"),
+    "casual": (CasualAgent, "prompts/base/casual_agent.txt")
+}
+
+# seconds a task over its time budget has to stop by itself before it is cancelled
+TASK_STOP_GRACE = 10
+
+UPDATE_POLICIES = ["always", "on_failure", "confidence"]
+# signs in an agent answer that the task went wrong even though no tool failed
+FAILURE_MARKERS = ["error", "failed", "failure", "traceback", "exception", "not found", "unable to",
+                   "could not", "couldn't", "cannot", "can't", "sorry", "no result"]
 
 class PlannerAgent(Agent):
-    def __init__(self, name, prompt_path, provider, verbose=False, browser=None):
+    def __init__(self, name, prompt_path, provider, verbose=False, browser=None,
+                 browser_factory=None, max_parallel_tasks=2, update_policy="on_failure", plan_cache=None,
+                 checkpoints=None, handoff_tokens=512, shared_agents=None, early_dispatch=True,
+                 task_time_budget=600, task_token_budget=150000):
         """
         The planner agent is a special agent that divides and conquers the task.
+        Tasks whose needs are met run concurrently, up to max_parallel_tasks, each on its own sub-agent instance.
+        Args:
+            browser_factory (callable, optional): creates a new Browser, for web tasks running next to another one.
+                                                  Without it web tasks share the browser and run one at a time.
+            max_parallel_tasks (int): maximum number of tasks running at the same time.
+            update_policy (str): when the plan is revised after a task, "always", "on_failure",
+                                 or "confidence" (on failure, or when the answer looks wrong).
+            plan_cache (PlanCache, optional): plans of past goals, by default kept in memory only.
+            checkpoints (PlanCheckpoint, optional): progress of the runs, to resume an interrupted one.
+                                                    By default kept in memory only.
+            handoff_tokens (int): budget in tokens of the prior results given to a task, see get_work_result_agent.
+            shared_agents (list, optional): agents already built (e.g. the ones of the interaction), used as the
+                                            first instance of their type. Other instances are created on first use.
+            early_dispatch (bool): start the tasks without needs while the plan is still generated,
+                                   when the provider streams its answer.
+            task_time_budget (float, optional): seconds a task may run before it is stopped, unlimited if None.
+            task_token_budget (int, optional): LLM tokens (prompt and completion) a task may use, unlimited if None.
         """
         super().__init__(name, prompt_path, provider, verbose, None)
         self.tools = {
@@ -22,19 +68,84 @@ class PlannerAgent(Agent):
         }
         self.tools['json'].tag = "json"
         self.browser = browser
-        self.agents = {
-            "coder": CoderAgent(name, "prompts/base/coder_agent.txt", provider, verbose=False),
-            "file": FileAgent(name, "prompts/base/file_agent.txt", provider, verbose=False),
-            "web": BrowserAgent(name, "prompts/base/browser_agent.txt", provider, verbose=False, browser=browser),
-            "casual": CasualAgent(name, "prompts/base/casual_agent.txt", provider, verbose=False)
-        }
+        self.browser_factory = browser_factory
+        self.max_parallel_tasks = max(1, max_parallel_tasks)
+        if update_policy not in UPDATE_POLICIES:
+            raise ValueError(f"Unknown plan update policy: {update_policy}, use one of {UPDATE_POLICIES}")
+        self.update_policy = update_policy
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache()
+        self.checkpoints = checkpoints if checkpoints is not None else PlanCheckpoint()
+        self.handoff_tokens = handoff_tokens
+        self.handoffs = {}
+        self.early_dispatch = early_dispatch
+        self.task_time_budget = task_time_budget or None
+        self.task_token_budget = task_token_budget or None
+        self.agents = {} # first instance of each sub-agent type, shared or created on first use
+        for agent in shared_agents or []:
+            for agent_type, (agent_class, _) in SUB_AGENTS.items():
+                if type(agent) is agent_class and agent_type not in self.agents:
+                    self.agents[agent_type] = agent
+        self.lent_settings = {} # priority, session and memory of the agents in use, restored on release
         self.role = "planification"
         self.type = "planner_agent"
         self.memory = Memory(self.load_prompt(prompt_path),
                                 recover_last_session=False, # session recovery in handled by the interaction class
                                 memory_compression=False,
-                                model_provider=provider.get_model_name())
+                                model_provider=provider.get_model_name(),
+                                context_length=provider.get_context_length())
         self.logger = Logger("planner_agent.log")
+        self.priority = PRIORITY_PLANNER
+        self.idle_agents = {agent_type: [self.agents[agent_type]] if agent_type in self.agents else []
+                            for agent_type in SUB_AGENTS}
+
+    def create_agent(self, agent_type: str, browser=None) -> Agent:
+        """
+        Create a sub-agent instance, with its own memory and tools.
+        """
+        agent_class, prompt_path = SUB_AGENTS[agent_type]
+        if agent_type == "web":
+            return agent_class(self.agent_name, prompt_path, self.llm, verbose=False, browser=browser)
+        return agent_class(self.agent_name, prompt_path, self.llm, verbose=False)
+
+    def acquire_agent(self, agent_type: str) -> Agent | None:
+        """
+        Take an idle instance of the sub-agent, or create one on first use or for a concurrent task.
+        Returns None when the task has to wait (a web task without browser factory).
+        """
+        if self.idle_agents[agent_type]:
+            agent = self.idle_agents[agent_type].pop()
+        elif agent_type not in self.agents:
+            agent = self.create_agent(agent_type, self.browser)
+            self.agents[agent_type] = agent
+            self.logger.info(f"Created the {agent_type} agent.")
+        elif agent_type == "web":
+            if self.browser_factory is None:
+                return None
+            agent = self.create_agent(agent_type, self.browser_factory())
+            self.logger.info(f"Created a new {agent_type} agent for a concurrent task.")
+        else:
+            agent = self.create_agent(agent_type)
+            self.logger.info(f"Created a new {agent_type} agent for a concurrent task.")
+        self.lent_settings[agent] = (agent.priority, agent.session_id, agent.memory)
+        agent.priority = PRIORITY_PLANNER
+        agent.session_id = self.memory.session_id
+        agent.memory = self.task_memory(agent)
+        return agent
+
+    def task_memory(self, agent: Agent) -> Memory:
+        """
+        A memory with only the system prompt of the agent, so a task neither sees nor adds to
+        the conversation the agent has with the user.
+        """
+        return Memory(agent.memory.get()[0]['content'],
+                      recover_last_session=False,
+                      memory_compression=False,
+                      model_provider=agent.memory.model_provider,
+                      context_length=agent.memory.context_length)
+
+    def release_agent(self, agent_type: str, agent: Agent) -> None:
+        agent.priority, agent.session_id, agent.memory = self.lent_settings.pop(agent)
+        self.idle_agents[agent_type].append(agent)
     
     def get_task_names(self, text: str) -> List[str]:
         """
@@ -74,30 +185,58 @@ class PlannerAgent(Agent):
 
         blocks, _ = self.tools["json"].load_exec_block(text)
         if blocks == None:
-            return []
+            blocks = self.unfenced_plan(text)
         for block in blocks:
-            line_json = json.loads(block)
-            if 'plan' in line_json:
-                for task in line_json['plan']:
-                    if task['agent'].lower() not in [ag_name.lower() for ag_name in self.agents.keys()]:
-                        self.logger.warning(f"Agent {task['agent']} does not exist.")
-                        pretty_print(f"Agent {task['agent']} does not exist.", color="warning")
+            try:
+                line_json, repaired = parse_json(block)
+            except ValueError as e:
+                self.logger.warning(f"Could not parse plan json: {str(e)}")
+                registry.inc("planner_plan_parse_total", labels={"result": "failed"})
+                continue
+            registry.inc("planner_plan_parse_total", labels={"result": "repaired" if repaired else "valid"})
+            if isinstance(line_json, dict) and isinstance(line_json.get('plan'), list):
+                for position, task in enumerate(line_json['plan'], 1):
+                    agent = self.plan_task(task, position)
+                    if agent is None:
+                        pretty_print(f"Invalid task in plan: {task}", color="warning")
                         return []
-                    agent = {
-                        'agent': task['agent'],
-                        'id': task['id'],
-                        'task': task['task']
-                    }
-                    self.logger.info(f"Created agent {task['agent']} with task: {task['task']}")
-                    if 'need' in task:
-                        self.logger.info(f"Agent {task['agent']} was given info:\n {task['need']}")
-                        agent['need'] = task['need']
+                    self.logger.info(f"Created agent {agent['agent']} with task: {agent['task']}")
+                    if 'need' in agent:
+                        self.logger.info(f"Agent {agent['agent']} was given info:\n {agent['need']}")
                     tasks.append(agent)
         if len(tasks_names) != len(tasks):
             names = [task['task'] for task in tasks]
             return list(map(list, zip(names, tasks)))
         return list(map(list, zip(tasks_names, tasks)))
     
+    def unfenced_plan(self, text: str) -> List[str]:
+        """
+        The json plan of an answer that did not put it within ```json, if any.
+        """
+        match = re.search(r"[\"']plan[\"']\s*:", text)
+        start = text.rfind("{", 0, match.start()) if match else -1
+        return [text[start:]] if start != -1 else []
+
+    def plan_task(self, task: dict, position: int) -> dict | None:
+        """
+        Check a task object of the plan and keep its fields, the id defaults to the position in the plan.
+        Returns None for an invalid task or an unknown agent.
+        """
+        if not isinstance(task, dict) or not isinstance(task.get('agent'), str) or not isinstance(task.get('task'), str):
+            self.logger.warning(f"Invalid task in plan: {task}")
+            return None
+        if task['agent'].lower() not in SUB_AGENTS:
+            self.logger.warning(f"Agent {task['agent']} does not exist.")
+            return None
+        agent = {
+            'agent': task['agent'],
+            'id': task['id'] if task.get('id') is not None else str(position),
+            'task': task['task']
+        }
+        if 'need' in task:
+            agent['need'] = task['need']
+        return agent
+
     def make_prompt(self, task: str, agent_infos_dict: dict) -> str:
         """
         Generates a prompt for the agent based on the task and previous agents work information.
@@ -138,11 +277,12 @@ class PlannerAgent(Agent):
             pretty_print(f"{task['agent']} -> {task['task']}", color="info")
         pretty_print("▔▗ E N D ▖▔", color="status")
 
-    async def make_plan(self, prompt: str) -> str:
+    async def make_plan(self, prompt: str, stream: PlanStreamParser | None = None) -> str:
         """
         Asks the LLM to make a plan.
         Args:
             prompt (str): The prompt to be sent to the LLM.
+            stream (PlanStreamParser, optional): sink of the plan as it is generated.
         Returns:
             str: The plan made by the LLM.
         """
@@ -151,7 +291,9 @@ class PlannerAgent(Agent):
         while not ok:
             animate_thinking("Thinking...", color="status")
             self.memory.push('user', prompt)
-            answer, reasoning = await self.llm_request()
+            if stream is not None:
+                stream.restart() # the parser may have read the json block of a previous unparsable answer
+            answer, reasoning = await self.llm_request(stream=stream)
             if "NO_UPDATE" in answer:
                 return []
             agents_tasks = self.parse_agent_tasks(answer)
@@ -164,9 +306,59 @@ class PlannerAgent(Agent):
         self.logger.info(f"Plan made:\n{answer}")
         return self.parse_agent_tasks(answer)
     
+    async def plan_goal(self, goal: str, stream: PlanStreamParser | None = None) -> List[dict]:
+        """
+        Makes the plan of the goal, reusing the plan of a similar past goal when possible.
+        A close match is reused without asking the LLM, a looser one is given to the LLM as an example.
+        Args:
+            goal (str): The goal to be achieved (user prompt).
+            stream (PlanStreamParser, optional): sink of the plan as it is generated.
+        Returns:
+            list: The plan.
+        """
+        result, plan, similarity = self.plan_cache.lookup(goal)
+        if result == "hit":
+            pretty_print(f"Reusing the plan of a similar goal ({similarity:.2f} similarity).", color="info")
+            self.show_plan(plan, "")
+            self.logger.info(f"Plan reused from cache:\n{plan}")
+            return plan
+        if result == "seed":
+            example = json.dumps({"plan": [task for _, task in plan]}, indent=2)
+            goal = f"""{goal}
+        A similar goal was achieved before with the following plan, adapt it to the current goal:
+        ```json
+        {example}
+        ```
+        """
+        return await self.make_plan(goal, stream=stream)
+
+    def work_looks_successful(self, work: str) -> bool:
+        """
+        Cheap local check of an agent answer, without asking the LLM.
+        """
+        answer = work.rsplit("\nAgent succeeded with task.", 1)[0].strip().lower()
+        if len(answer) < 20:
+            return False
+        return not any(marker in answer for marker in FAILURE_MARKERS)
+
+    def should_update_plan(self, work: str, success: bool) -> bool:
+        """
+        Whether the plan update LLM call is worth making after a task, according to the update policy.
+        """
+        if self.update_policy == "always" or not success:
+            return True
+        if self.update_policy == "confidence":
+            return not self.work_looks_successful(work)
+        return False
+
+    @staticmethod
+    def plan_signature(agents_tasks: List[dict]) -> list:
+        return [(task['agent'].lower(), str(task['id']), task['task']) for _, task in agents_tasks]
+
     async def update_plan(self, goal: str, agents_tasks: List[dict], agents_work_result: dict, id: str, success: bool) -> dict:
         """
         Updates the plan with the results of the agents work.
+        The LLM is only asked when the update policy calls for it, the outcome is counted in planner_plan_updates_total.
         Args:
             goal (str): The goal to be achieved.
             agents_tasks (list): The tasks assigned to each agent.
@@ -174,16 +366,20 @@ class PlannerAgent(Agent):
         Returns:
             dict: The updated plan.
         """
-        self.status_message = "Updating plan..."
         last_agent_work = agents_work_result[id]
         tool_success_str = "success" if success else "failure"
         pretty_print(f"Agent {id} work {tool_success_str}.", color="success" if success else "failure")
-        if int(id) == len(agents_tasks):
+        labels = {"policy": self.update_policy}
+        if not self.should_update_plan(last_agent_work, success):
+            registry.inc("planner_plan_updates_total", labels={**labels, "result": "skipped"})
+            return agents_tasks
+        self.status_message = "Updating plan..."
+        # tasks run in dependency order, the next one is the first of the plan without result
+        pending = [name for name, task in agents_tasks if str(task['id']) not in agents_work_result]
+        if not pending:
             next_task = "No task follow, this was the last step. If it failed add a task to recover."
         else:
-            next_task = f"Next task is: {agents_tasks[int(id)][0]}."
-        #if success:
-        #    return agents_tasks # we only update the plan if last task failed, for now
+            next_task = f"Next task is: {pending[0]}."
         update_prompt = f"""
         Your goal is : {goal}
         You previously made a plan, agents are currently working on it.
@@ -202,78 +398,271 @@ class PlannerAgent(Agent):
         """
         pretty_print("Updating plan...", color="status")
         plan = await self.make_plan(update_prompt)
-        if plan == []:
+        if plan == [] or self.plan_signature(plan) == self.plan_signature(agents_tasks):
+            registry.inc("planner_plan_updates_total", labels={**labels, "result": "unchanged"})
             pretty_print("No plan update required.", color="info")
             return agents_tasks
+        registry.inc("planner_plan_updates_total", labels={**labels, "result": "changed"})
         self.logger.info(f"Plan updated:\n{plan}")
         return plan
     
-    async def start_agent_process(self, task: dict, required_infos: dict | None) -> str:
+    async def start_agent_process(self, task: dict, required_infos: dict | None, agent: Agent | None = None) -> str:
         """
         Starts the agent process for a given task.
         Args:
             task (dict): The task to be performed.
             required_infos (dict | None): The required information for the task.
+            agent (Agent, optional): The sub-agent instance running the task, by default one is acquired for it.
         Returns:
             str: The result of the agent process.
         """
+        if agent is None:
+            agent_type = task['agent'].lower()
+            agent = self.acquire_agent(agent_type)
+            try:
+                return await self.start_agent_process(task, required_infos, agent)
+            finally:
+                self.release_agent(agent_type, agent)
         self.status_message = f"Starting task {task['task']}..."
         agent_prompt = self.make_prompt(task['task'], required_infos)
         pretty_print(f"Agent {task['agent']} started working...", color="status")
         self.logger.info(f"Agent {task['agent']} started working on {task['task']}.")
-        answer, _ = await self.agents[task['agent'].lower()].process(agent_prompt, None)
+        answer, stopped = await self.run_within_budget(agent, agent_prompt, task)
         self.last_answer = answer
-        self.blocks_result = self.agents[task['agent'].lower()].blocks_result
-        agent_answer = self.agents[task['agent'].lower()].raw_answer_blocks(answer)
-        success = self.agents[task['agent'].lower()].get_success
-        self.agents[task['agent'].lower()].show_answer()
+        blocks = agent.blocks_result if answer else []
+        self.blocks_result = blocks
+        if stopped is None:
+            agent_answer = agent.raw_answer_blocks(answer)
+            success = agent.get_success
+            agent.show_answer()
+        else:
+            partial = (agent.raw_answer_blocks(answer) or "") if answer else ""
+            agent_answer = f"{partial}\nTask stopped before completion: {stopped}"
+            success = False
+            pretty_print(f"Agent {task['agent']} stopped: {stopped}", color="warning")
+        prose = "\n".join(line for line in answer.split("\n") if "block:" not in line)
+        self.handoffs[str(task['id'])] = HandOff(prose, success, blocks)
         pretty_print(f"Agent {task['agent']} completed task.", color="status")
         self.logger.info(f"Agent {task['agent']} finished working on {task['task']}. Success: {success}")
         agent_answer += "\nAgent succeeded with task." if success else "\nAgent failed with task (Error detected)."
         return agent_answer, success
     
+    async def run_within_budget(self, agent: Agent, prompt: str, task: dict) -> Tuple[str, str | None]:
+        """
+        Run the agent on the task under the task time and token budgets.
+        The task gets its own cancellation token, cancelled with the query or when a budget runs out.
+        An agent not stopping within TASK_STOP_GRACE seconds of its time budget is cancelled.
+        Returns:
+            Tuple[str, str | None]: the answer and None, or the partial answer and why the task was stopped.
+        """
+        parent = current_cancellation.get()
+        token = CancellationToken()
+        forward = lambda: token.cancel(parent.reason)
+        if parent is not None:
+            parent.register(forward)
+        budget = TaskBudget(token, self.task_time_budget, self.task_token_budget, labels={"agent": task['agent'].lower()})
+        cancellation_context = current_cancellation.set(token)
+        usage_context = current_usage.set(budget)
+        before = agent.last_answer
+        timeout = self.task_time_budget + TASK_STOP_GRACE if self.task_time_budget is not None else None
+        try:
+            answer, _ = await asyncio.wait_for(agent.process(prompt, None), timeout)
+        except (CancelledByUser, asyncio.TimeoutError):
+            if budget.exceeded is None:
+                raise
+            answer = None
+        finally:
+            current_usage.reset(usage_context)
+            current_cancellation.reset(cancellation_context)
+            budget.close()
+            if parent is not None:
+                parent.unregister(forward)
+        if budget.exceeded is None:
+            return answer, None
+        self.logger.warning(f"Task {task['id']} stopped after {budget.elapsed:.1f}s and {budget.tokens} tokens, {budget.exceeded} budget exceeded.")
+        partial = agent.last_answer if agent.last_answer != before else ""
+        return answer or partial or "", f"{budget.exceeded} budget exceeded after {budget.elapsed:.0f}s and {budget.tokens} tokens."
+
     def get_work_result_agent(self, task_needs, agents_work_result):
-        res = {k: agents_work_result[k] for k in task_needs if k in agents_work_result}
+        """
+        Results of the needed tasks for the next agent, sharing the hand-off token budget.
+        A result fitting its share is given whole, a longer one as a hand-off of its facts and artifacts.
+        """
+        needs = [k for k in task_needs or [] if k in agents_work_result]
+        share = self.handoff_tokens // max(1, len(needs))
+        res = {}
+        for k in needs:
+            work = agents_work_result[k]
+            if estimate_tokens(work) <= share:
+                res[k] = work
+                continue
+            handoff = self.handoffs.get(k) or HandOff.from_text(work)
+            res[k] = handoff.render(share)
+            registry.inc("planner_handoff_tokens_saved_total", estimate_tokens(work) - estimate_tokens(res[k]))
         self.logger.info(f"Next agent needs: {task_needs}.\n Match previous agent result: {res}")
         return res
 
-    async def process(self, goal: str, speech_module: Speech) -> Tuple[str, str]:
+    def task_needs(self, task: dict, agents_tasks: List[dict]) -> List[str]:
+        """
+        Ids of the tasks of the plan this task waits for. Needs on ids missing from the plan are ignored.
+        """
+        plan_ids = {str(t['id']) for _, t in agents_tasks}
+        return [str(need) for need in task.get('need', None) or [] if str(need) in plan_ids]
+
+    def ready_tasks(self, agents_tasks: List[dict], done: set, running: set) -> List[Tuple[str, dict]]:
+        """
+        Tasks not started yet whose needs are all done, in plan order.
+        """
+        ready = []
+        for task_name, task in agents_tasks:
+            task_id = str(task['id'])
+            if task_id in done or task_id in running:
+                continue
+            if all(need in done for need in self.task_needs(task, agents_tasks)):
+                ready.append((task_name, task))
+        return ready
+
+    def announce_task(self, task_name: str, task: dict, speech_module: Speech) -> None:
+        self.status_message = "Starting agents..."
+        pretty_print(f"I will {task_name}.", color="info")
+        self.last_answer = f"I will {task_name.lower()}."
+        pretty_print(f"Assigned agent {task['agent']} to {task_name}", color="info")
+        if speech_module: speech_module.speak(f"I will {task_name}. I assigned the {task['agent']} agent to the task.")
+
+    def plan_stream(self, running: dict, speech_module: Speech) -> PlanStreamParser:
+        """
+        Sink of the plan generation starting the tasks without needs as soon as the LLM has written them.
+        The sink may be fed from a provider thread, the tasks are started on the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        stream = PlanStreamParser(lambda task, position: loop.call_soon_threadsafe(
+            self.start_early_task, stream, task, position, running, speech_module))
+        return stream
+
+    def start_early_task(self, stream: PlanStreamParser, task: dict, position: int, running: dict, speech_module: Speech) -> None:
+        if stream.closed or len(running) >= self.max_parallel_tasks:
+            return
+        task = self.plan_task(task, position)
+        if task is None or task.get('need') or str(task['id']) in {str(t['id']) for t, _, _ in running.values()}:
+            return
+        agent_type = task['agent'].lower()
+        agent = self.acquire_agent(agent_type)
+        if agent is None:
+            return
+        self.logger.info(f"Starting task {task['id']} while the plan is generated.")
+        registry.inc("planner_early_tasks_total", labels={"result": "started"})
+        self.announce_task(task['task'], task, speech_module)
+        work = asyncio.create_task(self.start_agent_process(task, {}, agent))
+        running[work] = (task, agent_type, agent)
+
+    async def keep_early_tasks(self, agents_tasks: List[dict], running: dict) -> None:
+        """
+        Tasks started while the plan was generated keep running if the final plan has them unchanged,
+        the others are stopped.
+        """
+        planned = {str(task['id']): task for _, task in agents_tasks}
+        for work, (task, agent_type, agent) in list(running.items()):
+            match = planned.get(str(task['id']))
+            if match is not None and match['agent'].lower() == agent_type and match['task'] == task['task'] and not match.get('need'):
+                running[work] = (match, agent_type, agent)
+                continue
+            self.logger.warning(f"Task {task['id']} started early is not in the final plan, stopping it.")
+            registry.inc("planner_early_tasks_total", labels={"result": "cancelled"})
+            running.pop(work)
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            self.release_agent(agent_type, agent)
+
+    async def process(self, goal: str, speech_module: Speech, resume: bool = True) -> Tuple[str, str]:
         """
         Process the goal by dividing it into tasks and assigning them to agents.
+        The plan is run as a graph: a task starts once the tasks it needs are done,
+        independent tasks run concurrently up to max_parallel_tasks. With early dispatch, the tasks
+        without needs start as soon as the LLM has written them.
+        The progress is checkpointed after each task, an interrupted run of the same goal resumes
+        from its unfinished tasks.
         Args:
             goal (str): The goal to be achieved (user prompt).
             speech_module (Speech): The speech module for text-to-speech.
+            resume (bool): continue the interrupted run of the goal if any, instead of planning again.
         Returns:
             Tuple[str, str]: The result of the agent process and empty reasoning string.
         """
         agents_tasks = []
-        required_infos = None
         agents_work_result = dict()
+        tasks_status = dict()
+        self.handoffs = {}
 
-        self.status_message = "Making a plan..."
-        agents_tasks = await self.make_plan(goal)
+        running = {} # asyncio task -> (task, agent type, agent)
+        try:
+            checkpoint = self.checkpoints.load(goal) if resume else None
+            if checkpoint is not None:
+                agents_tasks = checkpoint['plan']
+                agents_work_result = checkpoint['results']
+                tasks_status = checkpoint['status']
+                pretty_print(f"Resuming the plan, {len(agents_work_result)}/{len(agents_tasks)} tasks already done.", color="status")
+                self.show_plan(agents_tasks, "")
+                self.logger.info(f"Resumed plan of goal '{goal}' with tasks {list(agents_work_result)} done.")
+            else:
+                self.status_message = "Making a plan..."
+                stream = self.plan_stream(running, speech_module) if self.early_dispatch else None
+                agents_tasks = await self.plan_goal(goal, stream)
+                if stream is not None:
+                    stream.close()
+                    await self.keep_early_tasks(agents_tasks, running)
 
-        if agents_tasks == []:
-            return "Failed to parse the tasks.", ""
-        i = 0
-        steps = len(agents_tasks)
-        while i < steps:
-            task_name, task = agents_tasks[i][0], agents_tasks[i][1]
-            self.status_message = "Starting agents..."
-            pretty_print(f"I will {task_name}.", color="info")
-            self.last_answer = f"I will {task_name.lower()}."
-            pretty_print(f"Assigned agent {task['agent']} to {task_name}", color="info")
-            if speech_module: speech_module.speak(f"I will {task_name}. I assigned the {task['agent']} agent to the task.")
-
-            if agents_work_result is not None:
-                required_infos = self.get_work_result_agent(task['need'], agents_work_result)
-            try:
-                answer, success = await self.start_agent_process(task, required_infos)
-            except Exception as e:
-                raise e
-            agents_work_result[task['id']] = answer
-            agents_tasks = await self.update_plan(goal, agents_tasks, agents_work_result, task['id'], success)
-            steps = len(agents_tasks)
-            i += 1
-
-        return answer, ""
\ No newline at end of file
+            if agents_tasks == []:
+                return "Failed to parse the tasks.", ""
+            self.checkpoints.save(goal, agents_tasks, agents_work_result, tasks_status)
+            answer = ""
+            all_success = all(status == "success" for status in tasks_status.values())
+            while True:
+                running_ids = {str(task['id']) for task, _, _ in running.values()}
+                ready = self.ready_tasks(agents_tasks, set(agents_work_result), running_ids)
+                for task_name, task in ready:
+                    if len(running) >= self.max_parallel_tasks:
+                        break
+                    agent_type = task['agent'].lower()
+                    agent = self.acquire_agent(agent_type)
+                    if agent is None:
+                        continue # waits for the instance in use
+                    self.announce_task(task_name, task, speech_module)
+                    required_infos = self.get_work_result_agent(self.task_needs(task, agents_tasks), agents_work_result)
+                    work = asyncio.create_task(self.start_agent_process(task, required_infos, agent))
+                    running[work] = (task, agent_type, agent)
+                if not running:
+                    pending = [t for t in agents_tasks if str(t[1]['id']) not in agents_work_result]
+                    if not pending:
+                        break
+                    # needs that cannot be met (cycle), fall back to plan order
+                    self.logger.warning(f"No task ready, running task {pending[0][1]['id']} in plan order.")
+                    task_name, task = pending[0]
+                    agent_type = task['agent'].lower()
+                    self.announce_task(task_name, task, speech_module)
+                    required_infos = self.get_work_result_agent(self.task_needs(task, agents_tasks), agents_work_result)
+                    agent = self.acquire_agent(agent_type) # nothing runs, every instance is idle
+                    work = asyncio.create_task(self.start_agent_process(task, required_infos, agent))
+                    running[work] = (task, agent_type, agent)
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for work in done:
+                    task, agent_type, agent = running.pop(work)
+                    self.release_agent(agent_type, agent)
+                    answer, success = work.result()
+                    all_success = all_success and success
+                    agents_work_result[str(task['id'])] = answer
+                    tasks_status[str(task['id'])] = "success" if success else "failure"
+                    self.checkpoints.save(goal, agents_tasks, agents_work_result, tasks_status)
+                    agents_tasks = await self.update_plan(goal, agents_tasks, agents_work_result, str(task['id']), success)
+                    self.checkpoints.save(goal, agents_tasks, agents_work_result, tasks_status)
+        finally:
+            for work in running:
+                work.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            for task, agent_type, agent in running.values():
+                self.release_agent(agent_type, agent)
+        self.checkpoints.clear(goal)
+        if all_success:
+            self.plan_cache.store(goal, agents_tasks)
+        final_id = str(agents_tasks[-1][1]['id'])
+        return agents_work_result.get(final_id, answer), ""
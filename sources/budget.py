@@ -0,0 +1,59 @@
+import time
+import threading
+
+from sources.cancellation import CancellationToken
+from sources.metrics import registry
+
+class TaskBudget:
+    """
+    Wall-clock and token limits of a task, enforced through the cancellation token of the task:
+    the provider call or tool in progress is aborted once a limit is reached.
+    Tokens are the prompt and completion tokens of the LLM calls made in the task context (see metrics.current_usage).
+    Overruns are counted in task_budget_overruns_total by budget (time, tokens).
+    """
+    def __init__(self, token: CancellationToken, max_seconds: float | None = None, max_tokens: int | None = None,
+                 labels: dict | None = None):
+        """
+        Args:
+            token (CancellationToken): cancellation token of the task.
+            max_seconds (float, optional): wall-clock budget, unlimited if None.
+            max_tokens (int, optional): token budget, unlimited if None.
+            labels (dict, optional): extra labels of the overrun metric (e.g. the agent).
+        """
+        self.token = token
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.labels = labels or {}
+        self.start = time.time()
+        self.tokens = 0
+        self.exceeded = None # budget exhausted, "time" or "tokens"
+        self.lock = threading.Lock()
+        self.timer = None
+        if max_seconds is not None:
+            self.timer = threading.Timer(max_seconds, self.exceed, args=("time",))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def add_tokens(self, count: int) -> None:
+        with self.lock:
+            self.tokens += count
+            over = self.max_tokens is not None and self.tokens >= self.max_tokens
+        if over:
+            self.exceed("tokens")
+
+    def exceed(self, budget: str) -> None:
+        with self.lock:
+            if self.exceeded is not None or self.token.cancelled:
+                return
+            self.exceeded = budget
+        registry.inc("task_budget_overruns_total", labels={**self.labels, "budget": budget})
+        self.token.cancel(f"Task {budget} budget exceeded.")
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.start
+
+    def close(self) -> None:
+        """The task is over, stop the timer."""
+        if self.timer is not None:
+            self.timer.cancel()
@@ -0,0 +1,68 @@
+import threading
+import contextvars
+
+class CancelledByUser(Exception):
+    """
+    Raised when a generation is stopped through its CancellationToken.
+    """
+    pass
+
+class CancellationToken:
+    """
+    Cancellation signal of a query, shared by the agents, tools and provider calls working on it.
+    Callbacks registered by in-flight work (abort an HTTP stream, kill a subprocess) run on cancel.
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.reason = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def cancel(self, reason: str = "Stopped by user.") -> None:
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            callbacks = list(self.callbacks)
+            self.callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def register(self, callback) -> None:
+        """
+        Run the callback on cancel, right away if already cancelled.
+        """
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def unregister(self, callback) -> None:
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def raise_if_cancelled(self) -> None:
+        if self.event.is_set():
+            raise CancelledByUser(self.reason)
+
+# token of the query being processed in the current context
+current_cancellation = contextvars.ContextVar("current_cancellation", default=None)
+
+def get_cancellation() -> CancellationToken | None:
+    return current_cancellation.get()
+
+def check_cancelled() -> None:
+    """Raise CancelledByUser if the query of the current context was cancelled."""
+    token = current_cancellation.get()
+    if token is not None:
+        token.raise_if_cancelled()
@@ -0,0 +1,133 @@
+import re
+import threading
+
+import requests
+
+from sources.logger import Logger
+
+# Ollama runs models with a small default context unless num_ctx is given,
+# without a configured value we use the trained context up to this size (KV cache memory grows with it).
+DEFAULT_OLLAMA_CTX = 8192
+
+class ModelCapabilities:
+    """
+    Context window a backend runs a model with, as discovered by CapabilityProbe.
+    """
+    def __init__(self, context_length: int | None = None,
+                       trained_context_length: int | None = None,
+                       source: str = "unknown"):
+        self.context_length = context_length
+        self.trained_context_length = trained_context_length
+        self.source = source
+
+    def jsonify(self) -> dict:
+        return {
+            "context_length": self.context_length,
+            "trained_context_length": self.trained_context_length,
+            "source": self.source
+        }
+
+class CapabilityProbe:
+    """
+    Ask the backend for the context window of a model: Ollama /api/show, the llm_server /model_info route,
+    LM Studio and OpenAI compatible model listings. API providers use the configured value.
+    Results are cached per provider, address and model for the life of the process,
+    failed probes (backend not started yet) are retried on the next call.
+    """
+    cache = {}
+    lock = threading.Lock()
+
+    def __init__(self, session: requests.Session | None = None, configured_ctx: int | None = None, timeout: float = 3.0):
+        """
+        Args:
+            session (requests.Session, optional): session used for the probes.
+            configured_ctx (int, optional): context length from config.ini, takes precedence when the backend accepts it.
+            timeout (float): timeout of a probe request in seconds.
+        """
+        self.session = session or requests.Session()
+        self.configured_ctx = configured_ctx
+        self.timeout = timeout
+        self.logger = Logger("capabilities.log")
+
+    def probe(self, provider_name: str, address: str, model: str) -> ModelCapabilities:
+        key = (provider_name, address, model, self.configured_ctx)
+        with self.lock:
+            if key in self.cache:
+                return self.cache[key]
+        probes = {
+            "ollama": self.probe_ollama,
+            "server": self.probe_server,
+            "lm-studio": self.probe_lm_studio,
+            "openai": self.probe_openai
+        }
+        capabilities = None
+        failed = False
+        if provider_name in probes and address is not None:
+            try:
+                capabilities = probes[provider_name](address, model)
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                self.logger.warning(f"Capability probe of {model} at {address} failed: {str(e)}")
+                failed = True
+        if capabilities is None:
+            capabilities = ModelCapabilities(self.configured_ctx, None, "config" if self.configured_ctx else "unknown")
+        if failed:
+            return capabilities
+        self.logger.info(f"{provider_name} {model} capabilities: {capabilities.jsonify()}")
+        with self.lock:
+            self.cache[key] = capabilities
+        return capabilities
+
+    def probe_ollama(self, host: str, model: str) -> ModelCapabilities:
+        """
+        Read the trained context from the model info and the num_ctx of the Modelfile, if any.
+        We pass num_ctx with every request so the chosen value is the one Ollama runs with.
+        """
+        response = self.session.post(f"{host}/api/show", json={"model": model}, timeout=self.timeout)
+        response.raise_for_status()
+        info = response.json()
+        trained = None
+        for name, value in info.get("model_info", {}).items():
+            if name.endswith(".context_length"):
+                trained = int(value)
+        match = re.search(r"^num_ctx\s+(\d+)", info.get("parameters", "") or "", re.MULTILINE)
+        if self.configured_ctx:
+            context_length, source = self.configured_ctx, "config"
+        elif match:
+            context_length, source = int(match.group(1)), "modelfile"
+        else:
+            context_length, source = DEFAULT_OLLAMA_CTX, "default"
+        if trained is not None:
+            context_length = min(context_length, trained)
+        return ModelCapabilities(context_length, trained, source)
+
+    def probe_server(self, address: str, model: str) -> ModelCapabilities | None:
+        response = self.session.get(f"{address}/model_info", params={"model": model}, timeout=self.timeout)
+        response.raise_for_status()
+        context_length = response.json().get("context_length", None)
+        if context_length is None:
+            return None
+        return ModelCapabilities(context_length, context_length, "server")
+
+    def probe_lm_studio(self, address: str, model: str) -> ModelCapabilities | None:
+        response = self.session.get(f"{address}/api/v0/models/{model}", timeout=self.timeout)
+        response.raise_for_status()
+        info = response.json()
+        trained = info.get("max_context_length", None)
+        context_length = info.get("loaded_context_length", None) or trained
+        if context_length is None:
+            return None
+        return ModelCapabilities(context_length, trained, "lm-studio")
+
+    def probe_openai(self, base_url: str, model: str) -> ModelCapabilities | None:
+        """
+        OpenAI compatible servers (llm_server, vLLM, llama.cpp server) report the context in their model listing.
+        """
+        response = self.session.get(f"{base_url}/models", timeout=self.timeout)
+        response.raise_for_status()
+        for entry in response.json().get("data", []):
+            if entry.get("id", None) != model:
+                continue
+            context_length = entry.get("context_length", None) or entry.get("max_model_len", None)
+            if context_length is not None:
+                return ModelCapabilities(context_length, context_length, "openai")
+        return None
@@ -0,0 +1,140 @@
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from sources.logger import Logger
+from sources.metrics import registry
+
+LLM_IO = "llm_io"
+TOOLS = "tools"
+BACKGROUND = "background"
+
+DEFAULT_POOL_SIZES = {
+    LLM_IO: 8, # sync LLM backends and endpoint checks, waiting on the network
+    TOOLS: 4, # code execution, searches and other tool blocks
+    BACKGROUND: 2 # text to speech and housekeeping
+}
+
+class InstrumentedPool:
+    """
+    Bounded thread pool recording its queue depth, active workers, queue wait and task latency.
+    Tasks run in a copy of the submitter context, like asyncio.to_thread, so the cancellation token,
+    the LLM call record and the stream sink of the caller stay visible.
+    """
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"agenticseek-{name}")
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.lock = threading.Lock()
+        self.labels = {"pool": name}
+
+    def update_gauges(self) -> None:
+        registry.set_gauge("executor_queue_depth", self.queued, labels=self.labels)
+        registry.set_gauge("executor_active_workers", self.active, labels=self.labels)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        context = contextvars.copy_context()
+        submitted = time.time()
+        with self.lock:
+            self.queued += 1
+            self.update_gauges()
+
+        def task():
+            start = time.time()
+            with self.lock:
+                self.queued -= 1
+                self.active += 1
+                self.update_gauges()
+            registry.observe("executor_queue_wait_seconds", start - submitted, labels=self.labels)
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                registry.observe("executor_task_seconds", time.time() - start, labels=self.labels)
+                with self.lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.update_gauges()
+
+        future = self.executor.submit(task)
+        future.add_done_callback(self.on_done)
+        return future
+
+    def on_done(self, future: Future) -> None:
+        if future.cancelled(): # never started, still counted as queued
+            with self.lock:
+                self.queued -= 1
+                self.update_gauges()
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool and await its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+class ExecutorService:
+    """
+    Process-wide named thread pools shared by all the agents, instead of each agent owning threads.
+    Pools are created on first use with the configured size.
+    """
+    def __init__(self, sizes: dict | None = None):
+        self.sizes = {**DEFAULT_POOL_SIZES, **(sizes or {})}
+        self.pools = {}
+        self.lock = threading.Lock()
+        self.logger = Logger("executors.log")
+
+    def configure(self, **sizes) -> None:
+        """
+        Set the number of workers of the pools, e.g. configure(tools=8). Must be called before the pools are used.
+        """
+        with self.lock:
+            for name, size in sizes.items():
+                if size is None:
+                    continue
+                if name in self.pools:
+                    self.logger.warning(f"Pool {name} is already running with {self.pools[name].max_workers} workers, size {size} ignored.")
+                    continue
+                self.sizes[name] = max(1, int(size))
+
+    def get(self, name: str) -> InstrumentedPool:
+        with self.lock:
+            if name not in self.pools:
+                if name not in self.sizes:
+                    raise ValueError(f"Unknown executor pool: {name}")
+                self.pools[name] = InstrumentedPool(name, self.sizes[name])
+                self.logger.info(f"Started pool {name} with {self.sizes[name]} workers.")
+            return self.pools[name]
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Future:
+        return self.get(name).submit(fn, *args, **kwargs)
+
+    async def run(self, name: str, fn, *args, **kwargs):
+        return await self.get(name).run(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        with self.lock:
+            pools = dict(self.pools)
+        return {name: pool.stats() for name, pool in pools.items()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self.lock:
+            pools = list(self.pools.values())
+            self.pools.clear()
+        for pool in pools:
+            pool.shutdown(wait=wait)
+
+executors = ExecutorService()
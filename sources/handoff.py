@@ -0,0 +1,81 @@
+import re
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"'`()\[\]]+")
+PATH_PATTERN = re.compile(r"(?<![\w/.:-])(?:~|\.{1,2})?/?(?:[\w.-]+/)*[\w-]+\.[A-Za-z][A-Za-z0-9]{0,4}\b")
+# file names without folder are only taken with one of these extensions ("e.g" is not a file)
+FILE_EXTENSIONS = {"txt", "md", "csv", "json", "py", "js", "ts", "html", "css", "c", "h", "cpp", "go", "java",
+                   "sh", "yaml", "yml", "xml", "pdf", "png", "jpg", "jpeg", "log", "ini", "toml", "sql"}
+SUCCESS_MARKER = "\nAgent succeeded with task."
+FAILURE_MARKER = "\nAgent failed with task (Error detected)."
+MAX_ARTIFACTS = 10
+
+def unique(items: list) -> list:
+    return list(dict.fromkeys(items))
+
+def extract_urls(text: str) -> list:
+    return unique(url.rstrip(".,;:!?") for url in URL_PATTERN.findall(text))
+
+def extract_paths(text: str) -> list:
+    text = URL_PATTERN.sub(" ", text)
+    paths = []
+    for path in PATH_PATTERN.findall(text):
+        if "/" in path or path.rsplit(".", 1)[-1].lower() in FILE_EXTENSIONS:
+            paths.append(path)
+    return unique(paths)
+
+def clip(text: str, chars: int) -> str:
+    """Cut the text to the given number of characters, on a line or word boundary."""
+    text = text.strip()
+    if len(text) <= chars:
+        return text
+    marker = " [...]"
+    if chars <= len(marker):
+        return ""
+    cut = text[:chars - len(marker)]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + marker
+
+class HandOff:
+    """
+    What a task passes to the tasks needing it: status, files and links it touched, final answer,
+    and the last tool output, cut to a token budget. The full result is kept by the planner.
+    """
+    def __init__(self, answer: str, success: bool, blocks: list | None = None):
+        """
+        Args:
+            answer (str): the agent answer, without its code blocks.
+            success (bool): whether the agent succeeded.
+            blocks (list, optional): the executorResult of the agent blocks.
+        """
+        self.answer = answer.strip()
+        self.success = success
+        self.output = blocks[-1].feedback.strip() if blocks else ""
+        text = "\n".join([self.answer] + [f"{block.block}\n{block.feedback}" for block in blocks or []])
+        self.paths = extract_paths(text)[:MAX_ARTIFACTS]
+        self.urls = extract_urls(text)[:MAX_ARTIFACTS]
+
+    @classmethod
+    def from_text(cls, work: str) -> 'HandOff':
+        """Hand-off of a result known only as text, e.g. restored from a checkpoint."""
+        success = not work.endswith(FAILURE_MARKER)
+        answer = work.removesuffix(SUCCESS_MARKER).removesuffix(FAILURE_MARKER)
+        return cls(answer, success)
+
+    def render(self, tokens: int) -> str:
+        """The hand-off as text of at most the given number of tokens (4 characters per token, see estimate_tokens)."""
+        lines = [f"Status: {'success' if self.success else 'failure'}"]
+        if self.paths:
+            lines.append(f"Files: {', '.join(self.paths)}")
+        if self.urls:
+            lines.append(f"URLs: {', '.join(self.urls)}")
+        chars = tokens * 4
+        text = clip("\n".join(lines), chars)
+        output = self.output if self.output not in self.answer else ""
+        for label, body in [("Answer", self.answer), ("Last output", output)]:
+            prefix = f"\n{label}: "
+            part = clip(body, chars - len(text) - len(prefix))
+            if part:
+                text += prefix + part
+        return text
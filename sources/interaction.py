@@ -4,8 +4,10 @@ from typing import List, Tuple, Type, Dict
 from sources.text_to_speech import Speech
 from sources.utility import pretty_print, animate_thinking
 from sources.router import AgentRouter
+from sources.agents.agent import Agent
 from sources.speech_to_text import AudioTranscriber, AudioRecorder
-import threading
+from sources.cancellation import CancellationToken, CancelledByUser, current_cancellation
+from sources.executors import executors, BACKGROUND
 
 
 class Interaction:
@@ -32,6 +34,7 @@ class Interaction:
         self.transcriber = None
         self.recorder = None
         self.is_generating = False
+        self.cancellation = None
         self.languages = langs
         if tts_enabled:
             self.initialize_tts()
@@ -145,12 +148,24 @@ class Interaction:
         self.is_active = True
         self.last_query = query
     
-    async def think(self) -> bool:
-        """Request AI agents to process the user input."""
+    def stop(self) -> bool:
+        """Cancel the query being processed, return False if there is none."""
+        if not self.is_generating or self.cancellation is None:
+            return False
+        self.cancellation.cancel()
+        return True
+
+    async def think(self, cancellation: CancellationToken | None = None, agent: Agent | None = None) -> bool:
+        """
+        Request AI agents to process the user input.
+        Args:
+            cancellation (CancellationToken, optional): token to stop the query, see stop().
+            agent (Agent, optional): agent processing the query, chosen by the router if None.
+        """
         push_last_agent_memory = False
         if self.last_query is None or len(self.last_query) == 0:
             return False
-        agent = self.router.select_agent(self.last_query)
+        agent = agent or self.router.select_agent(self.last_query)
         if agent is None:
             return False
         if self.current_agent != agent and self.last_answer is not None:
@@ -158,8 +173,18 @@ class Interaction:
         tmp = self.last_answer
         self.current_agent = agent
         self.is_generating = True
-        self.last_answer, _ = await agent.process(self.last_query, self.speech)
-        self.is_generating = False
+        self.cancellation = cancellation or CancellationToken()
+        context_token = current_cancellation.set(self.cancellation)
+        try:
+            self.last_answer, _ = await agent.process(self.last_query, self.speech)
+        except CancelledByUser as e:
+            pretty_print(f"Query cancelled: {str(e)}", color="warning")
+            agent.status_message = "Stopped"
+            self.last_answer = str(e)
+            return True
+        finally:
+            current_cancellation.reset(context_token)
+            self.is_generating = False
         if push_last_agent_memory:
             self.current_agent.memory.push('user', self.last_query)
             self.current_agent.memory.push('assistant', self.last_answer)
@@ -180,14 +205,11 @@ class Interaction:
         return self.current_agent.get_last_block_answer()
     
     def speak_answer(self) -> None:
-        """Speak the answer to the user in a non-blocking thread."""
+        """Speak the answer to the user in the background pool, without blocking."""
         if self.last_query is None:
             return
         if self.tts_enabled and self.last_answer and self.speech:
-            def speak_in_thread(speech_instance, text):
-                speech_instance.speak(text)
-            thread = threading.Thread(target=speak_in_thread, args=(self.speech, self.last_answer))
-            thread.start()
+            executors.submit(BACKGROUND, self.speech.speak, self.last_answer)
     
     def show_answer(self) -> None:
         """Show the answer to the user."""
@@ -3,25 +3,57 @@ import platform
 import socket
 import subprocess
 import time
+import asyncio
+import weakref
+from collections import deque
 from urllib.parse import urlparse
 
 import httpx
 import requests
 from dotenv import load_dotenv
 from ollama import Client as OllamaClient
-from openai import OpenAI
+from ollama import AsyncClient as AsyncOllamaClient
+from openai import OpenAI, AsyncOpenAI
 
 from sources.logger import Logger
 from sources.utility import pretty_print, animate_thinking
+from sources.llm_replay import LLMRecorder, LLMReplayer
+from sources.provider_pool import ProviderPool, current_endpoint
+from sources.metrics import registry, track_call, mark_first_token, set_usage, set_endpoint
+from sources.retry import RetryPolicy, ModelPulled
+from sources.scheduler import AdmissionScheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from sources.capabilities import CapabilityProbe
+from sources.cancellation import CancelledByUser, get_cancellation, check_cancelled
+from sources.streaming import current_stream, stream_chunk, restart_stream
+from sources.executors import executors, LLM_IO
 
 
 class Provider:
-    def __init__(self, provider_name, model, server_address="127.0.0.1:5000", is_local=False):
+    def __init__(self, provider_name, model, server_address="127.0.0.1:5000", is_local=False,
+                 record_path=None, replay_timing="recorded", max_concurrency=4, keep_alive="30m",
+                 context_length=None, num_thread=None, max_retries=2, hedge=False):
+        """
+        Args:
+            provider_name (str): backend to use (ollama, server, openai...), "replay" to serve a recording.
+            model (str): model name.
+            server_address (str): address of the backend, path of the recording for the replay provider.
+                                  Several comma separated addresses make a pool dispatching to the least loaded one.
+            is_local (bool): whether the backend runs locally.
+            record_path (str, optional): record every answer to this jsonl file.
+            replay_timing (str): replay provider latency, "recorded", "none" or a token rate.
+            max_concurrency (int): maximum number of in-flight calls per endpoint, others wait for admission.
+            keep_alive (str): how long the inference server should keep the model loaded after a call.
+            context_length (int, optional): context window to run the model with, otherwise discovered from the backend.
+            num_thread (int, optional): number of CPU threads Ollama should use.
+            max_retries (int): retries of a call failing with a transient error.
+            hedge (bool): send a second request when an async call exceeds the p95 latency.
+        """
         self.provider_name = provider_name.lower()
         self.model = model
         self.is_local = is_local
-        self.server_ip = server_address
-        self.server_address = server_address
+        self.pool = ProviderPool.from_config(server_address)
+        self.server_ip = self.pool.endpoints[0].address
+        self.server_address = self.server_ip
         self.available_providers = {
             "ollama": self.ollama_fn,
             "server": self.server_fn,
@@ -32,11 +64,48 @@ class Provider:
             "deepseek": self.deepseek_fn,
             "together": self.together_fn,
             "dsk_deepseek": self.dsk_deepseek,
+            "replay": self.replay_fn,
             "test": self.test_fn
         }
+        self.available_async_providers = {
+            "ollama": self.ollama_afn,
+            "server": self.server_afn,
+            "openai": self.openai_afn,
+            "lm-studio": self.lm_studio_afn,
+            "google": self.google_afn,
+            "deepseek": self.deepseek_afn,
+            "replay": self.replay_afn,
+            "test": self.test_afn
+        }
+        self.warmup_providers = {
+            "ollama": self.ollama_warmup_afn,
+            "openai": self.openai_warmup_afn,
+            "lm-studio": self.lm_studio_warmup_afn
+        }
         self.logger = Logger("provider.log")
         self.api_key = None
+        self.keep_alive = keep_alive
+        self.last_activity = 0.0
+        self.clients = {}
+        self.session = requests.Session()
+        self.recorder = LLMRecorder(record_path) if record_path else None
+        self.replayer = None
+        self.max_concurrency = max_concurrency
+        self.num_thread = num_thread
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.pulled_models = set() # models downloaded after a 404, not downloaded again
+        self.hedge = hedge
+        self.latencies = deque(maxlen=200)
+        self.capability_probe = CapabilityProbe(self.session, configured_ctx=context_length)
+        self.loop_states = weakref.WeakKeyDictionary()
         self.unsafe_providers = ["openai", "deepseek", "dsk_deepseek", "together", "google"]
+        self.address_providers = ["ollama", "server", "lm-studio"] + (["openai"] if is_local else [])
+        if self.provider_name in self.address_providers:
+            admission_endpoints = [endpoint.address for endpoint in self.pool.endpoints]
+        else:
+            admission_endpoints = [self.provider_name]
+        self.admission = AdmissionScheduler(admission_endpoints, max_in_flight=max_concurrency,
+                                            rank=self.rank_endpoint, available=self.is_endpoint_available)
         if self.provider_name not in self.available_providers:
             raise ValueError(f"Unknown provider: {provider_name}")
         if self.provider_name in self.unsafe_providers and self.is_local == False:
@@ -44,10 +113,178 @@ class Provider:
             self.api_key = self.get_api_key(self.provider_name)
         elif self.provider_name != "ollama":
             pretty_print(f"Provider: {provider_name} initialized at {self.server_ip}", color="success")
+        if self.provider_name == "replay":
+            self.replayer = LLMReplayer(self.server_address, timing=replay_timing)
 
     def get_model_name(self) -> str:
         return self.model
 
+    def get_capabilities(self):
+        """
+        Return the capabilities (context window) of the model, probed from the backend and cached.
+        """
+        if self.provider_name == "ollama":
+            address = self.get_ollama_host()
+        elif self.provider_name == "openai":
+            address = f"http://{self.server_address}" if self.is_local else None
+        elif self.provider_name in ["server", "lm-studio"]:
+            address = self.server_address
+        else:
+            address = None
+        return self.capability_probe.probe(self.provider_name, address, self.model)
+
+    def get_context_length(self) -> int | None:
+        return self.get_capabilities().context_length
+
+    def get_openai_client(self, base_url: str | None = None) -> OpenAI:
+        """
+        Return a pooled OpenAI client for the base url, so connections are reused across requests.
+        """
+        if base_url not in self.clients:
+            self.clients[base_url] = OpenAI(api_key=self.api_key or "none", base_url=base_url)
+        return self.clients[base_url]
+
+    def get_address(self) -> str:
+        """
+        Return the address of the endpoint selected for the current call.
+        """
+        return current_endpoint.get() or self.server_address
+
+    def is_endpoint_online(self, address: str) -> bool:
+        """
+        Check an endpoint of the pool with its cached TCP probe.
+        """
+        for endpoint in self.pool.endpoints:
+            if endpoint.address == address:
+                return self.pool.probe(endpoint)
+        return self.is_ip_online(address)
+
+    def is_endpoint_available(self, address: str) -> bool:
+        """
+        Admission gate of an endpoint: circuit closed (or half-open) and cached TCP probe passing.
+        """
+        endpoint = self.pool.get(address)
+        if endpoint is None:
+            return True
+        return endpoint.circuit_open_until <= time.time() and endpoint.last_probe_ok
+
+    def refresh_endpoints(self) -> None:
+        """
+        Refresh the cached TCP probes of the pool before admission, then admit the calls
+        waiting for an endpoint that is back up.
+        """
+        if self.provider_name not in self.address_providers:
+            return
+        for endpoint in self.pool.endpoints:
+            self.pool.probe(endpoint)
+        self.admission.wake()
+
+    def rank_endpoint(self, address: str) -> tuple:
+        """
+        Admission preference of an endpoint, healthy endpoints first, then the circuit reopening first.
+        """
+        endpoint = self.pool.get(address)
+        if endpoint is None:
+            return (0.0, False)
+        return (max(endpoint.circuit_open_until - time.time(), 0.0), not endpoint.last_probe_ok)
+
+    def call_backend(self, llm, history, verbose, address=None, options=None):
+        """
+        Call a sync backend, routed to the admitted endpoint of the pool when the backend uses an address.
+        """
+        if self.provider_name not in self.address_providers:
+            return llm(history, verbose, options)
+        with self.pool.use(self.pool.get(address)) as endpoint:
+            set_endpoint(endpoint.address)
+            return llm(history, verbose, options)
+
+    async def acall_backend(self, llm, history, verbose, address=None, options=None):
+        """
+        Call an async backend, routed to the admitted endpoint of the pool when the backend uses an address.
+        """
+        if self.provider_name not in self.address_providers:
+            return await llm(history, verbose, options)
+        with self.pool.use(self.pool.get(address)) as endpoint:
+            set_endpoint(endpoint.address)
+            return await llm(history, verbose, options)
+
+    def ollama_options(self, options: dict | None, context_length: int | None) -> tuple:
+        """
+        Map generation options to Ollama chat options and think flag.
+        context_length is the probed context (get_context_length), run off the event loop by async callers.
+        """
+        options = options or {}
+        ollama_options = {}
+        # always the same num_ctx, Ollama reloads the model when it changes
+        if context_length is not None:
+            ollama_options["num_ctx"] = context_length
+        if self.num_thread is not None:
+            ollama_options["num_thread"] = self.num_thread
+        if options.get("max_tokens", None) is not None:
+            ollama_options["num_predict"] = options["max_tokens"]
+        if options.get("stop", None):
+            ollama_options["stop"] = options["stop"]
+        if options.get("temperature", None) is not None:
+            ollama_options["temperature"] = options["temperature"]
+        think = False if options.get("reasoning_effort", None) == "none" else None
+        return ollama_options or None, think
+
+    def is_reasoning_model(self) -> bool:
+        """
+        Cloud reasoning models take max_completion_tokens and reasoning_effort, and reject stop and temperature.
+        """
+        if self.is_local or self.provider_name not in ["openai", "google"]:
+            return False
+        return self.model.startswith(("o1", "o3", "o4", "gpt-5", "gemini-2.5", "gemini-3"))
+
+    def openai_options(self, options: dict | None) -> dict:
+        """
+        Map generation options to the keyword arguments of an OpenAI compatible chat completion.
+        """
+        options = options or {}
+        kwargs = {}
+        reasoning = self.is_reasoning_model()
+        if options.get("max_tokens", None) is not None:
+            kwargs["max_completion_tokens" if reasoning else "max_tokens"] = options["max_tokens"]
+        if reasoning:
+            if options.get("reasoning_effort", None) is not None:
+                # "none" is not accepted by every reasoning model, low is the closest common value
+                effort = options["reasoning_effort"]
+                kwargs["reasoning_effort"] = "low" if effort == "none" else effort
+            return kwargs
+        if options.get("stop", None):
+            kwargs["stop"] = options["stop"]
+        if options.get("temperature", None) is not None:
+            kwargs["temperature"] = options["temperature"]
+        return kwargs
+
+    def get_loop_state(self) -> dict:
+        """
+        Return the async clients of the running event loop.
+        Async clients hold connections bound to a loop, so they are never shared across loops.
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self.loop_states:
+            self.loop_states[loop] = {
+                "clients": {}
+            }
+        return self.loop_states[loop]
+
+    def get_async_client(self, kind: str, base_url: str | None = None):
+        """
+        Return a pooled async client (openai, ollama or httpx) for the running event loop.
+        """
+        clients = self.get_loop_state()["clients"]
+        key = (kind, base_url)
+        if key not in clients:
+            if kind == "openai":
+                clients[key] = AsyncOpenAI(api_key=self.api_key or "none", base_url=base_url)
+            elif kind == "ollama":
+                clients[key] = AsyncOllamaClient(host=base_url)
+            else:
+                clients[key] = httpx.AsyncClient(timeout=None)
+        return clients[key]
+
     def get_api_key(self, provider):
         load_dotenv()
         api_key_var = f"{provider.upper()}_API_KEY"
@@ -57,31 +294,212 @@ class Provider:
             exit(1)
         return api_key
 
-    def respond(self, history, verbose=True):
+    def respond(self, history, verbose=True, caller=None, priority=PRIORITY_INTERACTIVE, session=None, options=None, stream=None):
         """
         Use the choosen provider to generate text.
+        Transient failures (connection errors, rate limits, overload) are retried with backoff.
+        Args:
+            history (list): conversation to answer.
+            verbose (bool): print the answer as it is generated.
+            caller (str, optional): name of the calling agent, for telemetry.
+            priority (int): admission priority class (see sources.scheduler).
+            session (str, optional): session of the call, endpoints are shared fairly across sessions.
+            options (dict, optional): generation options, max_tokens, stop, temperature and reasoning_effort
+                                      ("none" disables thinking where supported). Backends ignore the options they do not support.
+            stream (optional): sink receiving the answer as it is generated, with feed(chunk) and restart() for a new attempt.
+                               Streaming backends (Ollama, OpenAI compatible, llm_server) feed it chunk by chunk.
         """
         llm = self.available_providers[self.provider_name]
+        session = session or caller or "default"
         self.logger.info(f"Using provider: {self.provider_name} at {self.server_ip}")
+        check_cancelled()
+        stream_token = current_stream.set(stream)
+        with track_call(self.provider_name, self.model, history, caller) as call:
+            try:
+                thought = self.retry_policy.call(self.admitted_call, llm, history, verbose, priority, session, options, call)
+            except KeyboardInterrupt:
+                call.error = "KeyboardInterrupt"
+                self.logger.warning("User interrupted the operation with Ctrl+C")
+                return "Operation interrupted by user. REQUEST_EXIT"
+            except CancelledByUser:
+                raise
+            except Exception as e:
+                call.error = type(e).__name__
+                return self.handle_error(e)
+            finally:
+                current_stream.reset(stream_token)
+            call.output = thought
+        if self.recorder is not None:
+            self.recorder.record(history, thought, call.latency - call.queue_wait, self.provider_name, self.model)
+        return thought
+
+    def admitted_call(self, llm, history, verbose, priority, session, options, call):
+        """
+        Make one attempt of a sync call, on the endpoint given by admission control.
+        """
+        self.refresh_endpoints()
+        address = self.admission.acquire(priority, session)
+        start = time.time()
+        if call.queue_wait == 0:
+            call.queue_wait = start - call.start
+        self.last_activity = start
+        restart_stream()
         try:
-            thought = llm(history, verbose)
-        except KeyboardInterrupt:
-            self.logger.warning("User interrupted the operation with Ctrl+C")
-            return "Operation interrupted by user. REQUEST_EXIT"
-        except ConnectionError as e:
+            thought = self.call_backend(llm, history, verbose, address, options)
+        finally:
+            self.admission.release(address, session)
+        self.latencies.append(time.time() - start)
+        return thought
+
+    async def arespond(self, history, verbose=True, caller=None, priority=PRIORITY_INTERACTIVE, session=None, options=None, stream=None):
+        """
+        Use the choosen provider to generate text without blocking the event loop.
+        Backends without a native async client run in a worker thread.
+        Calls wait for admission to an endpoint (see respond), the wait is reported as queue wait.
+        Transient failures are retried, and calls slower than the p95 latency are hedged when enabled.
+        A cancelled query aborts the call right away, closing the HTTP stream so the server stops generating.
+        Calls with a stream sink are not hedged, the sink would receive two answers.
+        """
+        session = session or caller or "default"
+        self.logger.info(f"Using provider: {self.provider_name} at {self.server_ip} (async)")
+        token = get_cancellation()
+        check_cancelled()
+        with track_call(self.provider_name, self.model, history, caller) as call:
+            stream_token = current_stream.set(stream)
+            try:
+                work = asyncio.ensure_future(self.retry_policy.acall(self.hedged_acall, history, verbose, priority, session, options, call))
+            finally:
+                current_stream.reset(stream_token)
+            loop = asyncio.get_running_loop()
+            abort = lambda: loop.call_soon_threadsafe(work.cancel)
+            if token is not None:
+                token.register(abort)
+            try:
+                thought = await work
+            except asyncio.CancelledError:
+                if token is not None and token.cancelled:
+                    raise CancelledByUser(token.reason)
+                raise
+            except CancelledByUser:
+                raise
+            except Exception as e:
+                call.error = type(e).__name__
+                return self.handle_error(e)
+            finally:
+                if token is not None:
+                    token.unregister(abort)
+            call.output = thought
+        if self.recorder is not None:
+            self.recorder.record(history, thought, call.latency - call.queue_wait, self.provider_name, self.model)
+        return thought
+
+    async def admitted_acall(self, history, verbose, priority, session, options, call, hedge=False):
+        """
+        Make one attempt of an async call, on the endpoint given by admission control.
+        """
+        llm = self.available_async_providers.get(self.provider_name, None)
+        await executors.run(LLM_IO, self.refresh_endpoints)
+        address = await self.admission.aacquire(priority, session)
+        start = time.time()
+        if not hedge and call.queue_wait == 0:
+            call.queue_wait = start - call.start
+        self.last_activity = start
+        restart_stream()
+        try:
+            if llm is None:
+                thought = await executors.run(LLM_IO, self.call_backend, self.available_providers[self.provider_name], history, verbose, address, options)
+            else:
+                thought = await self.acall_backend(llm, history, verbose, address, options)
+        finally:
+            self.admission.release(address, session)
+        self.latencies.append(time.time() - start)
+        return thought
+
+    def hedge_delay(self) -> float | None:
+        """
+        Delay after which a call is hedged: the p95 of recent call latencies.
+        Hedging needs a second endpoint or a remote API, and enough latency samples.
+        """
+        if not self.hedge or current_stream.get() is not None:
+            return None
+        if self.provider_name in self.address_providers and len(self.pool) < 2:
+            return None
+        if len(self.latencies) < 20:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    async def hedged_acall(self, history, verbose, priority, session, options, call):
+        """
+        Start a second request when the first one exceeds the p95 latency, the first answer wins.
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self.admitted_acall(history, verbose, priority, session, options, call)
+        primary = asyncio.create_task(self.admitted_acall(history, verbose, priority, session, options, call))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            labels = {"provider": self.provider_name, "model": self.model}
+            registry.inc("llm_hedged_requests_total", labels=labels)
+            self.logger.info(f"Hedging request after {delay:.2f}s.")
+            hedge = asyncio.create_task(self.admitted_acall(history, False, priority, session, options, call, hedge=True))
+            pending.add(hedge)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            registry.inc("llm_hedge_wins_total", labels=labels)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def awarmup(self, history) -> bool:
+        """
+        Load the model and prefill the prompt on every endpoint, generating a single token.
+        Servers caching the prompt prefix (Ollama, llama.cpp) then skip the prefill on the next real call.
+        Returns False if the provider has nothing to warm (cloud APIs cache prompts on their side).
+        """
+        warmup = self.warmup_providers.get(self.provider_name, None)
+        if warmup is None or self.provider_name not in self.address_providers:
+            return False
+        self.last_activity = time.time()
+        for endpoint in self.pool.endpoints:
+            await self.admission.aacquire(PRIORITY_BACKGROUND, "warmup", endpoint.address)
+            try:
+                with self.pool.use(endpoint):
+                    await warmup(history)
+            except Exception as e:
+                self.logger.warning(f"Warm-up failed on {endpoint.address}: {str(e)}")
+                return False
+            finally:
+                self.admission.release(endpoint.address, "warmup")
+        self.logger.info(f"Warmed up {self.model} with a {len(history)} messages prompt.")
+        return True
+
+    def handle_error(self, e: Exception) -> str:
+        """
+        Turn a provider exception into an answer for the user or a more explicit exception.
+        """
+        if isinstance(e, ConnectionError):
             raise ConnectionError(f"{str(e)}\nConnection to {self.server_ip} failed.")
-        except AttributeError as e:
+        if isinstance(e, AttributeError):
             raise NotImplementedError(f"{str(e)}\nIs {self.provider_name} implemented ?")
-        except ModuleNotFoundError as e:
+        if isinstance(e, ModuleNotFoundError):
             raise ModuleNotFoundError(
                 f"{str(e)}\nA import related to provider {self.provider_name} was not found. Is it installed ?")
-        except Exception as e:
-            if "try again later" in str(e).lower():
-                return f"{self.provider_name} server is overloaded. Please try again later."
-            if "refused" in str(e):
-                return f"Server {self.server_ip} seem offline. Unable to answer."
-            raise Exception(f"Provider {self.provider_name} failed: {str(e)}") from e
-        return thought
+        if "try again later" in str(e).lower():
+            return f"{self.provider_name} server is overloaded. Please try again later."
+        if "refused" in str(e):
+            return f"Server {self.server_ip} seem offline. Unable to answer."
+        raise Exception(f"Provider {self.provider_name} failed: {str(e)}") from e
 
     def is_ip_online(self, address: str, timeout: int = 10) -> bool:
         """
@@ -107,29 +525,38 @@ class Provider:
         except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
             return False
 
-    def server_fn(self, history, verbose=False):
+    def server_fn(self, history, verbose=False, options=None):
         """
         Use a remote server with LLM to generate text.
         """
         thought = ""
-        route_setup = f"{self.server_ip}/setup"
-        route_gen = f"{self.server_ip}/generate"
+        address = self.get_address()
+        route_setup = f"{address}/setup"
+        route_gen = f"{address}/generate"
 
-        if not self.is_ip_online(self.server_ip):
-            pretty_print(f"Server is offline at {self.server_ip}", color="failure")
+        if not self.is_endpoint_online(address):
+            pretty_print(f"Server is offline at {address}", color="failure")
 
         try:
-            requests.post(route_setup, json={"model": self.model})
-            requests.post(route_gen, json={"messages": history})
+            self.session.post(route_setup, json={"model": self.model})
+            self.session.post(route_gen, json={"messages": history})
             is_complete = False
             while not is_complete:
+                token = get_cancellation()
+                if token is not None and token.cancelled:
+                    self.stop_server(address)
+                    token.raise_if_cancelled()
                 try:
-                    response = requests.get(f"{self.server_ip}/get_updated_sentence")
+                    response = self.session.get(f"{address}/get_updated_sentence")
                     if "error" in response.json():
                         pretty_print(response.json()["error"], color="failure")
                         break
-                    thought = response.json()["sentence"]
+                    sentence = response.json()["sentence"]
                     is_complete = bool(response.json()["is_complete"])
+                    if sentence:
+                        mark_first_token()
+                    stream_chunk(sentence[len(thought):] if sentence.startswith(thought) else "")
+                    thought = sentence
                     time.sleep(2)
                 except requests.exceptions.RequestException as e:
                     pretty_print(f"HTTP request failed: {str(e)}", color="failure")
@@ -147,21 +574,37 @@ class Provider:
             raise e
         return thought
 
-    def ollama_fn(self, history, verbose=False):
+    def stop_server(self, address: str) -> None:
+        """
+        Ask the llm_server to stop the generation in progress.
+        """
+        try:
+            self.session.post(f"{address}/stop", timeout=5)
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"Could not stop generation at {address}: {str(e)}")
+
+    def ollama_fn(self, history, verbose=False, options=None):
         """
         Use local or remote Ollama server to generate text.
         """
         thought = ""
-        host = "http://localhost:11434" if self.is_local else f"http://{self.server_address}"
+        host = self.get_ollama_host()
         client = OllamaClient(host=host)
+        ollama_options, think = self.ollama_options(options, self.get_context_length())
 
         try:
             stream = client.chat(
                 model=self.model,
                 messages=history,
                 stream=True,
+                keep_alive=self.keep_alive,
+                options=ollama_options,
+                think=think,
             )
             for chunk in stream:
+                check_cancelled()
+                self.ollama_chunk_metrics(chunk)
+                stream_chunk(chunk["message"]["content"])
                 if verbose:
                     print(chunk["message"]["content"], end="", flush=True)
                 thought += chunk["message"]["content"]
@@ -171,9 +614,12 @@ class Provider:
             ) from e
         except Exception as e:
             if hasattr(e, 'status_code') and e.status_code == 404:
+                if self.model in self.pulled_models:
+                    raise Exception(f"Model {self.model} not found on Ollama server at {host} after downloading it.") from e
                 animate_thinking(f"Downloading {self.model}...")
                 client.pull(self.model)
-                self.ollama_fn(history, verbose)
+                self.pulled_models.add(self.model)
+                raise ModelPulled(f"Downloaded {self.model}, retrying.") from e
             if "refused" in str(e).lower():
                 raise Exception(
                     f"Ollama connection refused at {host}. Is the server running?"
@@ -182,7 +628,33 @@ class Provider:
 
         return thought
 
-    def huggingface_fn(self, history, verbose=False):
+    def ollama_chunk_metrics(self, chunk) -> None:
+        """
+        Report the first token and, on the last chunk, the token counts of an Ollama stream.
+        """
+        if chunk["message"]["content"]:
+            mark_first_token()
+        if chunk.get("done", False):
+            set_usage(chunk.get("prompt_eval_count", None), chunk.get("eval_count", None))
+
+    def openai_chunk_metrics(self, chunk) -> None:
+        """
+        Report the first token and the usage chunk of an OpenAI compatible stream.
+        """
+        if getattr(chunk, "usage", None) is not None:
+            set_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+        if chunk.choices and chunk.choices[0].delta.content:
+            mark_first_token()
+
+    def get_ollama_host(self) -> str:
+        """
+        Local Ollama runs on the default port unless a pool of endpoints is configured.
+        """
+        if self.is_local and len(self.pool) == 1:
+            return "http://localhost:11434"
+        return f"http://{self.get_address()}"
+
+    def huggingface_fn(self, history, verbose=False, options=None):
         """
         Use huggingface to generate text.
         """
@@ -193,36 +665,49 @@ class Provider:
         completion = client.chat.completions.create(
             model=self.model,
             messages=history,
-            max_tokens=1024,
+            max_tokens=(options or {}).get("max_tokens", None) or 1024,
         )
         thought = completion.choices[0].message
         return thought.content
 
-    def openai_fn(self, history, verbose=False):
+    def openai_fn(self, history, verbose=False, options=None):
         """
         Use openai to generate text.
         """
-        base_url = self.server_ip
+        base_url = self.get_address()
         if self.is_local:
-            client = OpenAI(api_key=self.api_key, base_url=f"http://{base_url}")
+            client = self.get_openai_client(f"http://{base_url}")
         else:
-            client = OpenAI(api_key=self.api_key)
+            client = self.get_openai_client()
 
         try:
-            response = client.chat.completions.create(
+            stream = client.chat.completions.create(
                 model=self.model,
                 messages=history,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self.openai_options(options),
             )
-            if response is None:
+            if stream is None:
                 raise Exception("OpenAI response is empty.")
-            thought = response.choices[0].message.content
-            if verbose:
-                print(thought)
+            thought = ""
+            for chunk in stream:
+                check_cancelled()
+                self.openai_chunk_metrics(chunk)
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content or ""
+                stream_chunk(content)
+                if verbose:
+                    print(content, end="", flush=True)
+                thought += content
             return thought
+        except CancelledByUser:
+            raise
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}") from e
 
-    def google_fn(self, history, verbose=False):
+    def google_fn(self, history, verbose=False, options=None):
         """
         Use google gemini to generate text.
         """
@@ -235,9 +720,12 @@ class Provider:
             response = client.chat.completions.create(
                 model=self.model,
                 messages=history,
+                **self.openai_options(options),
             )
             if response is None:
                 raise Exception("Google response is empty.")
+            if response.usage is not None:
+                set_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
             thought = response.choices[0].message.content
             if verbose:
                 print(thought)
@@ -245,7 +733,7 @@ class Provider:
         except Exception as e:
             raise Exception(f"GOOGLE API error: {str(e)}") from e
 
-    def together_fn(self, history, verbose=False):
+    def together_fn(self, history, verbose=False, options=None):
         """
         Use together AI for completion
         """
@@ -258,9 +746,12 @@ class Provider:
             response = client.chat.completions.create(
                 model=self.model,
                 messages=history,
+                **self.openai_options(options),
             )
             if response is None:
                 raise Exception("Together AI response is empty.")
+            if response.usage is not None:
+                set_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
             thought = response.choices[0].message.content
             if verbose:
                 print(thought)
@@ -268,7 +759,7 @@ class Provider:
         except Exception as e:
             raise Exception(f"Together AI API error: {str(e)}") from e
 
-    def deepseek_fn(self, history, verbose=False):
+    def deepseek_fn(self, history, verbose=False, options=None):
         """
         Use deepseek api to generate text.
         """
@@ -279,8 +770,11 @@ class Provider:
             response = client.chat.completions.create(
                 model="deepseek-chat",
                 messages=history,
-                stream=False
+                stream=False,
+                **self.openai_options(options),
             )
+            if response.usage is not None:
+                set_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
             thought = response.choices[0].message.content
             if verbose:
                 print(thought)
@@ -288,22 +782,25 @@ class Provider:
         except Exception as e:
             raise Exception(f"Deepseek API error: {str(e)}") from e
 
-    def lm_studio_fn(self, history, verbose=False):
+    def lm_studio_fn(self, history, verbose=False, options=None):
         """
         Use local lm-studio server to generate text.
         lm studio use endpoint /v1/chat/completions not /chat/completions like openai
         """
         thought = ""
-        route_start = f"{self.server_ip}/v1/chat/completions"
+        route_start = f"{self.get_address()}/v1/chat/completions"
         payload = {
             "messages": history,
             "temperature": 0.7,
             "max_tokens": 4096,
-            "model": self.model
+            "model": self.model,
+            **self.openai_options(options)
         }
         try:
-            response = requests.post(route_start, json=payload)
+            response = self.session.post(route_start, json=payload)
             result = response.json()
+            usage = result.get("usage", {})
+            set_usage(usage.get("prompt_tokens", None), usage.get("completion_tokens", None))
             if verbose:
                 print("Response from LM Studio:", result)
             return result.get("choices", [{}])[0].get("message", {}).get("content", "")
@@ -313,7 +810,7 @@ class Provider:
             raise Exception(f"An error occurred: {str(e)}") from e
         return thought
 
-    def dsk_deepseek(self, history, verbose=False):
+    def dsk_deepseek(self, history, verbose=False, options=None):
         """
         Use: xtekky/deepseek4free
         For free api. Api key should be set to DSK_DEEPSEEK_API_KEY
@@ -349,7 +846,207 @@ class Provider:
             raise APIError(f"API error occurred: {str(e)}") from e
         return None
 
-    def test_fn(self, history, verbose=True):
+    def replay_fn(self, history, verbose=False, options=None):
+        """
+        Serve answers from a recording made with record_path, for offline benchmarks.
+        """
+        thought = self.replayer.respond(history)
+        if verbose:
+            print(thought)
+        return thought
+
+    async def server_afn(self, history, verbose=False, options=None):
+        """
+        Use a remote server with LLM to generate text, polling without blocking the event loop.
+        """
+        thought = ""
+        client = self.get_async_client("httpx")
+        address = self.get_address()
+        if not await executors.run(LLM_IO, self.is_endpoint_online, address):
+            pretty_print(f"Server is offline at {address}", color="failure")
+        try:
+            await client.post(f"{address}/setup", json={"model": self.model})
+            await client.post(f"{address}/generate", json={"messages": history})
+            is_complete = False
+            while not is_complete:
+                try:
+                    response = await client.get(f"{address}/get_updated_sentence")
+                    if "error" in response.json():
+                        pretty_print(response.json()["error"], color="failure")
+                        break
+                    sentence = response.json()["sentence"]
+                    is_complete = bool(response.json()["is_complete"])
+                    if sentence:
+                        mark_first_token()
+                    stream_chunk(sentence[len(thought):] if sentence.startswith(thought) else "")
+                    thought = sentence
+                    await asyncio.sleep(2)
+                except httpx.HTTPError as e:
+                    pretty_print(f"HTTP request failed: {str(e)}", color="failure")
+                    break
+                except ValueError as e:
+                    pretty_print(f"Failed to parse JSON response: {str(e)}", color="failure")
+                    break
+        except asyncio.CancelledError:
+            try:
+                await client.post(f"{address}/stop", timeout=5)
+            except httpx.HTTPError as e:
+                self.logger.warning(f"Could not stop generation at {address}: {str(e)}")
+            raise
+        except KeyError as e:
+            raise Exception(
+                f"{str(e)}\nError occured with server route. Are you using the correct address for the config.ini provider?") from e
+        return thought
+
+    async def ollama_afn(self, history, verbose=False, options=None):
+        """
+        Use local or remote Ollama server to generate text with the async client.
+        """
+        thought = ""
+        host = self.get_ollama_host()
+        client = self.get_async_client("ollama", host)
+        context_length = await executors.run(LLM_IO, self.get_context_length)
+        ollama_options, think = self.ollama_options(options, context_length)
+        try:
+            stream = await client.chat(
+                model=self.model,
+                messages=history,
+                stream=True,
+                keep_alive=self.keep_alive,
+                options=ollama_options,
+                think=think,
+            )
+            async for chunk in stream:
+                self.ollama_chunk_metrics(chunk)
+                stream_chunk(chunk["message"]["content"])
+                if verbose:
+                    print(chunk["message"]["content"], end="", flush=True)
+                thought += chunk["message"]["content"]
+        except httpx.ConnectError as e:
+            raise Exception(
+                f"\nOllama connection failed at {host}. Check if the server is running."
+            ) from e
+        except Exception as e:
+            if hasattr(e, 'status_code') and e.status_code == 404:
+                if self.model in self.pulled_models:
+                    raise Exception(f"Model {self.model} not found on Ollama server at {host} after downloading it.") from e
+                animate_thinking(f"Downloading {self.model}...")
+                await client.pull(self.model)
+                self.pulled_models.add(self.model)
+                raise ModelPulled(f"Downloaded {self.model}, retrying.") from e
+            if "refused" in str(e).lower():
+                raise Exception(
+                    f"Ollama connection refused at {host}. Is the server running?"
+                ) from e
+            raise e
+        return thought
+
+    async def ollama_warmup_afn(self, history):
+        client = self.get_async_client("ollama", self.get_ollama_host())
+        context_length = await executors.run(LLM_IO, self.get_context_length)
+        ollama_options, _ = self.ollama_options({"max_tokens": 1}, context_length)
+        await client.chat(
+            model=self.model,
+            messages=history,
+            keep_alive=self.keep_alive,
+            options=ollama_options,
+        )
+
+    async def openai_warmup_afn(self, history):
+        client = self.get_async_client("openai", f"http://{self.get_address()}")
+        await client.chat.completions.create(
+            model=self.model,
+            messages=history,
+            max_tokens=1,
+        )
+
+    async def lm_studio_warmup_afn(self, history):
+        client = self.get_async_client("httpx")
+        await client.post(f"{self.get_address()}/v1/chat/completions", json={
+            "messages": history,
+            "max_tokens": 1,
+            "model": self.model
+        })
+
+    async def openai_compatible_afn(self, history, verbose, base_url, model, name, options=None):
+        """
+        Stream a chat completion from an OpenAI compatible API with the async client.
+        """
+        client = self.get_async_client("openai", base_url)
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=history,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self.openai_options(options),
+            )
+            if stream is None:
+                raise Exception(f"{name} response is empty.")
+            thought = ""
+            async for chunk in stream:
+                self.openai_chunk_metrics(chunk)
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content or ""
+                stream_chunk(content)
+                if verbose:
+                    print(content, end="", flush=True)
+                thought += content
+            return thought
+        except Exception as e:
+            raise Exception(f"{name} API error: {str(e)}") from e
+
+    async def openai_afn(self, history, verbose=False, options=None):
+        base_url = f"http://{self.get_address()}" if self.is_local else None
+        return await self.openai_compatible_afn(history, verbose, base_url, self.model, "OpenAI", options)
+
+    async def google_afn(self, history, verbose=False, options=None):
+        if self.is_local:
+            raise Exception("Google Gemini is not available for local use. Change config.ini")
+        return await self.openai_compatible_afn(history, verbose,
+                                                "https://generativelanguage.googleapis.com/v1beta/openai/",
+                                                self.model, "GOOGLE", options)
+
+    async def deepseek_afn(self, history, verbose=False, options=None):
+        if self.is_local:
+            raise Exception("Deepseek (API) is not available for local use. Change config.ini")
+        return await self.openai_compatible_afn(history, verbose, "https://api.deepseek.com", "deepseek-chat", "Deepseek", options)
+
+    async def lm_studio_afn(self, history, verbose=False, options=None):
+        """
+        Use local lm-studio server to generate text with the async client.
+        """
+        client = self.get_async_client("httpx")
+        payload = {
+            "messages": history,
+            "temperature": 0.7,
+            "max_tokens": 4096,
+            "model": self.model,
+            **self.openai_options(options)
+        }
+        try:
+            response = await client.post(f"{self.get_address()}/v1/chat/completions", json=payload)
+            result = response.json()
+            usage = result.get("usage", {})
+            set_usage(usage.get("prompt_tokens", None), usage.get("completion_tokens", None))
+            if verbose:
+                print("Response from LM Studio:", result)
+            return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+        except httpx.HTTPError as e:
+            raise Exception(f"HTTP request failed: {str(e)}") from e
+
+    async def replay_afn(self, history, verbose=False, options=None):
+        record = self.replayer.next_record(history)
+        await asyncio.sleep(self.replayer.delay(record))
+        if verbose:
+            print(record['output'])
+        return record['output']
+
+    async def test_afn(self, history, verbose=False, options=None):
+        return self.test_fn(history, verbose, options)
+
+    def test_fn(self, history, verbose=True, options=None):
         """
         This function is used to conduct tests.
         """
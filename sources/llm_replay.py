@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+def history_hash(history: list) -> str:
+    """
+    Hash a conversation on its roles and contents only (memory also stores timestamps).
+    """
+    messages = [{'role': msg['role'], 'content': msg['content']} for msg in history]
+    return hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class LLMRecorder:
+    """
+    Append every LLM call (history hash, output and timing) to a jsonl file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def record(self, history: list, output: str, latency: float, provider_name: str = "", model: str = "") -> None:
+        entry = {
+            'hash': history_hash(history),
+            'provider': provider_name,
+            'model': model,
+            'messages': len(history),
+            'output': output,
+            'latency': latency,
+            'time': time.time()
+        }
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+class LLMReplayer:
+    """
+    Serve recorded LLM answers, with optional simulated latency.
+    Answers are matched on the history hash, and in recorded order when the history differs
+    (prompts containing dates or paths change between runs).
+    """
+    def __init__(self, path: str, timing: str = "recorded"):
+        """
+        Args:
+            path (str): Path of the jsonl recording made by LLMRecorder.
+            timing (str): "recorded" to replay the recorded latency, "none" to answer instantly,
+                          or a number of tokens per second to simulate decoding.
+        """
+        self.path = path
+        self.timing = timing
+        self.records = self.load_records(path)
+        self.by_hash = {}
+        for idx, record in enumerate(self.records):
+            self.by_hash.setdefault(record['hash'], []).append(idx)
+        self.served = set()
+        self.cursor = 0
+        self.lock = threading.Lock()
+
+    def load_records(self, path: str) -> list:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"LLM recording not found at path: {path}")
+        records = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        return records
+
+    def next_record(self, history: list) -> dict:
+        """
+        Find the record answering the history, by hash first then in recorded order.
+        """
+        with self.lock:
+            for idx in self.by_hash.get(history_hash(history), []):
+                if idx not in self.served:
+                    self.served.add(idx)
+                    return self.records[idx]
+            while self.cursor < len(self.records) and self.cursor in self.served:
+                self.cursor += 1
+            if self.cursor >= len(self.records):
+                raise Exception(f"LLM recording {self.path} exhausted ({len(self.records)} records).")
+            self.served.add(self.cursor)
+            return self.records[self.cursor]
+
+    def delay(self, record: dict) -> float:
+        """Simulated generation time for a record."""
+        if self.timing == "none":
+            return 0.0
+        if self.timing == "recorded":
+            return record.get('latency', 0.0)
+        tokens = len(record['output']) / 4
+        return tokens / float(self.timing)
+
+    def respond(self, history: list) -> str:
+        record = self.next_record(history)
+        time.sleep(self.delay(record))
+        return record['output']
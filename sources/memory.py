@@ -10,6 +10,10 @@ from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 
 from sources.utility import timer_decorator, pretty_print, animate_thinking
 from sources.logger import Logger
+from sources.metrics import estimate_tokens
+
+# tokens left free for the answer when fitting the history to the model context
+ANSWER_RESERVE_TOKENS = 2048
 
 class Memory():
     """
@@ -19,7 +23,8 @@ class Memory():
     def __init__(self, system_prompt: str,
                  recover_last_session: bool = False,
                  memory_compression: bool = True,
-                 model_provider: str = "deepseek-r1:14b"):
+                 model_provider: str = "deepseek-r1:14b",
+                 context_length: int | None = None):
         self.memory = [{'role': 'system', 'content': system_prompt}]
         
         self.logger = Logger("memory.log")
@@ -36,14 +41,17 @@ class Memory():
         self.device = self.get_cuda_device()
         self.memory_compression = memory_compression
         self.model_provider = model_provider
+        self.context_length = context_length
         if self.memory_compression:
             self.download_model()
 
     def get_ideal_ctx(self, model_name: str) -> int | None:
         """
-        Estimate context size based on the model name.
+        Context size of the model, as reported by the backend when known, else estimated from the model name.
         EXPERIMENTAL for memory compression
         """
+        if self.context_length is not None:
+            return self.context_length
         import re
         import math
 
@@ -185,6 +193,31 @@ class Memory():
     def get(self) -> list:
         return self.memory
 
+    def get_within_context(self, reserve: int | None = None) -> list:
+        """
+        The history to send to the model: the system prompt and the most recent messages that fit in
+        the model context (context_length) minus the tokens reserved for the answer.
+        Older messages are left out of the request, they stay in memory. The whole history if the context is unknown.
+        Args:
+            reserve (int, optional): tokens kept for the answer, ANSWER_RESERVE_TOKENS if None.
+        """
+        if self.context_length is None:
+            return self.memory
+        reserve = ANSWER_RESERVE_TOKENS if reserve is None else reserve
+        budget = max(0, self.context_length - reserve)
+        system, messages = self.memory[:1], self.memory[1:]
+        used = sum(estimate_tokens(msg['content']) for msg in system)
+        kept = 0
+        for msg in reversed(messages):
+            cost = estimate_tokens(msg['content'])
+            if kept > 0 and used + cost > budget:
+                break
+            used += cost
+            kept += 1
+        if kept < len(messages):
+            self.logger.info(f"Context of {self.context_length} tokens: sending the last {kept} of {len(messages)} messages.")
+        return system + messages[len(messages) - kept:]
+
     def get_cuda_device(self) -> str:
         if torch.backends.mps.is_available():
             return "mps"
@@ -0,0 +1,277 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from sources.logger import Logger
+
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300]
+RATE_BUCKETS = [1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250]
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets, as exported by Prometheus.
+    """
+    def __init__(self, buckets: list):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimate a quantile by linear interpolation within its bucket.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            if seen + count >= rank and count > 0:
+                low = self.buckets[idx - 1] if idx > 0 else 0.0
+                high = self.buckets[idx] if idx < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def jsonify(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "avg": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+class MetricsRegistry:
+    """
+    In-process registry of counters, gauges and histograms, keyed by name and labels.
+    """
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, labels: dict | None) -> tuple:
+        return (name, tuple(sorted((labels or {}).items())))
+
+    def inc(self, name: str, value: float = 1, labels: dict | None = None) -> None:
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: dict | None = None) -> None:
+        key = self.key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, labels: dict | None = None, buckets: list = LATENCY_BUCKETS) -> None:
+        key = self.key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def get_counter(self, name: str, labels: dict | None = None) -> float:
+        return self.counters.get(self.key(name, labels), 0)
+
+    def get_gauge(self, name: str, labels: dict | None = None) -> float | None:
+        return self.gauges.get(self.key(name, labels), None)
+
+    def get_histogram(self, name: str, labels: dict | None = None) -> Histogram | None:
+        return self.histograms.get(self.key(name, labels), None)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    @staticmethod
+    def format_labels(labels: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{v}"' for k, v in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text format.
+        """
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{self.format_labels(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f"{name}{self.format_labels(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{name}_bucket{self.format_labels(labels, le)} {cumulative}")
+                cumulative += hist.counts[-1]
+                le = 'le="+Inf"'
+                lines.append(f"{name}_bucket{self.format_labels(labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{self.format_labels(labels)} {hist.sum}")
+                lines.append(f"{name}_count{self.format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "counters": {f"{name}{self.format_labels(labels)}": value
+                             for (name, labels), value in self.counters.items()},
+                "gauges": {f"{name}{self.format_labels(labels)}": value
+                           for (name, labels), value in self.gauges.items()},
+                "histograms": {f"{name}{self.format_labels(labels)}": hist.jsonify()
+                               for (name, labels), hist in self.histograms.items()},
+            }
+
+registry = MetricsRegistry()
+
+# record of the provider call running in the current context
+current_call = contextvars.ContextVar("current_call", default=None)
+# meter of the work running in the current context (e.g. a TaskBudget), told the tokens of each finished call
+current_usage = contextvars.ContextVar("current_usage", default=None)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token) for backends not reporting usage."""
+    return max(1, len(text) // 4) if text else 0
+
+class CallRecord:
+    """
+    Timing and token usage of a single LLM call.
+    """
+    def __init__(self, provider: str, model: str, caller: str | None = None):
+        self.provider = provider
+        self.model = model
+        self.caller = caller or "unknown"
+        self.endpoint = None
+        self.start = time.time()
+        self.first_token = None
+        self.end = None
+        self.queue_wait = 0.0
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.retries = 0
+        self.error = None
+        self.output = None
+
+    def mark_first_token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.time()
+
+    def set_usage(self, prompt_tokens: int | None, completion_tokens: int | None) -> None:
+        if prompt_tokens is not None:
+            self.prompt_tokens = prompt_tokens
+        if completion_tokens is not None:
+            self.completion_tokens = completion_tokens
+
+    @property
+    def latency(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    @property
+    def ttft(self) -> float | None:
+        return self.first_token - self.start if self.first_token else None
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if not self.completion_tokens or self.end is None:
+            return None
+        decode_time = self.end - (self.first_token or self.start)
+        return self.completion_tokens / decode_time if decode_time > 0 else None
+
+    def jsonify(self) -> dict:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "caller": self.caller,
+            "endpoint": self.endpoint,
+            "latency": self.latency,
+            "ttft": self.ttft,
+            "queue_wait": self.queue_wait,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_second": self.tokens_per_second,
+            "retries": self.retries,
+            "error": self.error,
+        }
+
+def mark_first_token() -> None:
+    """Mark the first token of the current call, called by streaming backends."""
+    call = current_call.get()
+    if call is not None:
+        call.mark_first_token()
+
+def set_usage(prompt_tokens: int | None = None, completion_tokens: int | None = None) -> None:
+    """Set the token usage reported by the backend for the current call."""
+    call = current_call.get()
+    if call is not None:
+        call.set_usage(prompt_tokens, completion_tokens)
+
+def set_endpoint(address: str) -> None:
+    """Set the endpoint serving the current call."""
+    call = current_call.get()
+    if call is not None:
+        call.endpoint = address
+
+def add_retry() -> None:
+    call = current_call.get()
+    if call is not None:
+        call.retries += 1
+
+logger = Logger("llm_metrics.log")
+
+def observe_call(call: CallRecord, history: list, output: str | None) -> None:
+    """
+    Complete the token counts of a finished call and add it to the registry.
+    """
+    if call.prompt_tokens is None:
+        call.prompt_tokens = sum(estimate_tokens(msg['content']) for msg in history)
+    if call.completion_tokens is None:
+        call.completion_tokens = estimate_tokens(output or "")
+    labels = {"provider": call.provider, "model": call.model, "caller": call.caller}
+    registry.inc("llm_requests_total", labels=labels)
+    if call.error is not None:
+        registry.inc("llm_errors_total", labels=labels)
+    registry.inc("llm_retries_total", call.retries, labels=labels)
+    registry.inc("llm_prompt_tokens_total", call.prompt_tokens, labels=labels)
+    registry.inc("llm_completion_tokens_total", call.completion_tokens, labels=labels)
+    registry.observe("llm_latency_seconds", call.latency, labels)
+    registry.observe("llm_queue_wait_seconds", call.queue_wait, labels)
+    if call.ttft is not None:
+        registry.observe("llm_ttft_seconds", call.ttft, labels)
+    if call.tokens_per_second is not None:
+        registry.observe("llm_tokens_per_second", call.tokens_per_second, labels, buckets=RATE_BUCKETS)
+    logger.info(f"LLM call {call.jsonify()}")
+    usage = current_usage.get()
+    if usage is not None:
+        usage.add_tokens(call.prompt_tokens + call.completion_tokens)
+
+@contextmanager
+def track_call(provider: str, model: str, history: list, caller: str | None = None):
+    """
+    Track the LLM call made within the context, backends report to it through current_call.
+    The output must be set on the yielded record (call.output) to count completion tokens.
+    """
+    call = CallRecord(provider, model, caller)
+    token = current_call.set(call)
+    try:
+        yield call
+    except BaseException as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        current_call.reset(token)
+        call.end = time.time()
+        observe_call(call, history, call.output)
@@ -0,0 +1,168 @@
+import re
+import os
+import json
+import math
+import time
+import zlib
+import threading
+from difflib import SequenceMatcher
+
+from sources.logger import Logger
+from sources.metrics import registry
+
+VECTOR_SIZE = 4096
+
+def goal_tokens(goal: str) -> list:
+    return re.findall(r"\w+|[^\w\s]", goal)
+
+def embed_goal(goal: str) -> dict:
+    """
+    Hashed bag of words and word pairs of a goal, L2 normalized (sparse: index -> weight).
+    Goals with the same structure and a few different entities stay close.
+    """
+    words = [token.lower() for token in goal_tokens(goal) if token.isalnum()]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = {}
+    for feature in features:
+        index = zlib.crc32(feature.encode()) % VECTOR_SIZE
+        vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {index: value / norm for index, value in vector.items()} if norm else {}
+
+def cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+def match_case(original: str, replacement: str) -> str:
+    """Give the replacement the case of the text it replaces (upper, capitalized or as written)."""
+    if original.isupper() and len(original) > 1:
+        return replacement.upper()
+    if original[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+class PlanCache:
+    """
+    Plans that completed successfully, looked up by similarity of their goal.
+    A close goal differing by a few words (e.g. another city) reuses the plan with those words replaced,
+    a looser match is given to the LLM as an example to adapt.
+    Lookups are counted in planner_plan_cache_lookups_total by result (hit, seed, miss).
+    """
+    def __init__(self, path: str | None = None, hit_threshold: float = 0.75,
+                 seed_threshold: float = 0.5, max_entries: int = 200, max_replacements: int = 3):
+        """
+        Args:
+            path (str, optional): json file keeping the cache across runs, in memory only if None.
+            hit_threshold (float): similarity above which the cached plan is reused without asking the LLM.
+            seed_threshold (float): similarity above which the cached plan is given to the LLM as an example.
+            max_entries (int): number of plans kept, the least recently used are dropped.
+            max_replacements (int): maximum number of differing spans between goals for a plan to be reused.
+        """
+        self.path = path
+        self.hit_threshold = hit_threshold
+        self.seed_threshold = seed_threshold
+        self.max_entries = max_entries
+        self.max_replacements = max_replacements
+        self.entries = []
+        self.lock = threading.Lock()
+        self.logger = Logger("plan_cache.log")
+        self.load()
+
+    def load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Could not load plan cache {self.path}: {str(e)}")
+            return
+        for entry in entries:
+            entry['vector'] = embed_goal(entry['goal'])
+        self.entries = entries
+        self.logger.info(f"Loaded {len(entries)} cached plans.")
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self.lock:
+            entries = [{k: v for k, v in entry.items() if k != 'vector'} for entry in self.entries]
+        with open(self.path, 'w') as f:
+            json.dump(entries, f)
+
+    def store(self, goal: str, plan: list) -> None:
+        """
+        Keep the plan of a goal that completed successfully.
+        Args:
+            goal (str): the user goal.
+            plan (list): the plan as parsed by PlannerAgent.parse_agent_tasks.
+        """
+        entry = {"goal": goal, "plan": json.loads(json.dumps(plan)), "used": time.time(), "vector": embed_goal(goal)}
+        with self.lock:
+            self.entries = [e for e in self.entries if e['goal'] != goal]
+            self.entries.append(entry)
+            if len(self.entries) > self.max_entries:
+                self.entries.sort(key=lambda e: e['used'])
+                self.entries = self.entries[-self.max_entries:]
+        self.save()
+
+    def adapt(self, cached_goal: str, goal: str, plan: list) -> list | None:
+        """
+        Replace in the cached plan the words of the cached goal that differ in the new goal,
+        matching them case-insensitively and keeping the case of the plan text.
+        Returns None when the goals differ by more than word replacements, or when a replaced word
+        is not in the tasks of the plan (the plan would not follow the new goal).
+        """
+        old, new = goal_tokens(cached_goal), goal_tokens(goal)
+        replacements = []
+        for tag, i1, i2, j1, j2 in SequenceMatcher(a=old, b=new, autojunk=False).get_opcodes():
+            if tag == 'equal':
+                continue
+            if tag != 'replace':
+                return None
+            replacements.append((" ".join(old[i1:i2]), " ".join(new[j1:j2])))
+        if len(replacements) > self.max_replacements:
+            return None
+        adapted = json.loads(json.dumps(plan))
+        for source, target in replacements:
+            pattern = re.compile(r"(?<!\w)" + re.escape(source) + r"(?!\w)", re.IGNORECASE)
+            replace = lambda match: match_case(match.group(0), target)
+            found = False
+            for step in adapted:
+                step[0] = pattern.sub(replace, step[0])
+                step[1]['task'], count = pattern.subn(replace, step[1]['task'])
+                found = found or count > 0
+            if not found:
+                return None
+        return adapted
+
+    def lookup(self, goal: str) -> tuple:
+        """
+        Find the cached plan of the most similar goal.
+        Returns:
+            tuple: (result, plan, similarity), result is "hit" (plan adapted to the goal),
+                   "seed" (cached plan to give as an example) or "miss" (plan None).
+        """
+        vector = embed_goal(goal)
+        with self.lock:
+            scored = [(cosine(vector, entry['vector']), entry) for entry in self.entries]
+        best = max(scored, key=lambda item: item[0], default=(0.0, None))
+        similarity, entry = best
+        result, plan = "miss", None
+        if entry is not None and similarity >= self.hit_threshold:
+            plan = self.adapt(entry['goal'], goal, entry['plan'])
+            result = "hit" if plan is not None else "seed"
+        if result != "hit" and entry is not None and similarity >= self.seed_threshold:
+            result, plan = "seed", entry['plan']
+        if entry is not None and result != "miss":
+            entry['used'] = time.time()
+        registry.inc("planner_plan_cache_lookups_total", labels={"result": result})
+        hits = registry.get_counter("planner_plan_cache_lookups_total", {"result": "hit"})
+        lookups = sum(registry.get_counter("planner_plan_cache_lookups_total", {"result": r}) for r in ["hit", "seed", "miss"])
+        registry.set_gauge("planner_plan_cache_hit_ratio", hits / lookups)
+        self.logger.info(f"Plan cache {result} for goal '{goal[:80]}' (similarity {similarity:.2f}).")
+        return result, plan, similarity
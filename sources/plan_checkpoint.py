@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from sources.logger import Logger
+
+class PlanCheckpoint:
+    """
+    Progress of planner runs: the plan, the status and result of each finished task, by goal.
+    Saved after every step so an interrupted run resumes from the first unfinished task.
+    """
+    def __init__(self, folder: str | None = None, max_age: float = 24 * 3600):
+        """
+        Args:
+            folder (str, optional): folder of the checkpoint files, in memory only if None.
+            max_age (float): seconds after which a checkpoint is too old to resume.
+        """
+        self.folder = folder
+        self.max_age = max_age
+        self.checkpoints = {}
+        self.lock = threading.Lock()
+        self.logger = Logger("plan_checkpoint.log")
+
+    @staticmethod
+    def key(goal: str) -> str:
+        return hashlib.sha1(goal.strip().encode()).hexdigest()[:16]
+
+    def path(self, goal: str) -> str:
+        return os.path.join(self.folder, f"{self.key(goal)}.json")
+
+    def save(self, goal: str, plan: list, results: dict, status: dict) -> None:
+        """
+        Record the progress of a run.
+        Args:
+            goal (str): the user goal.
+            plan (list): the current plan, as parsed by PlannerAgent.parse_agent_tasks.
+            results (dict): the answer of each finished task by id.
+            status (dict): "success" or "failure" of each finished task by id.
+        """
+        checkpoint = {"goal": goal, "plan": plan, "results": results, "status": status, "updated": time.time()}
+        checkpoint = json.loads(json.dumps(checkpoint))
+        with self.lock:
+            if self.folder is None:
+                self.checkpoints[self.key(goal)] = checkpoint
+                return
+            if not os.path.exists(self.folder):
+                os.makedirs(self.folder)
+            path = self.path(goal)
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump(checkpoint, f)
+            os.replace(f"{path}.tmp", path) # a crash while writing keeps the previous step
+        self.logger.info(f"Saved checkpoint of goal '{goal[:80]}': {len(results)}/{len(plan)} tasks done.")
+
+    def read(self, key: str) -> dict | None:
+        with self.lock:
+            if self.folder is None:
+                return self.checkpoints.get(key)
+            path = os.path.join(self.folder, f"{key}.json")
+            if not os.path.exists(path):
+                return None
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Could not read checkpoint {path}: {str(e)}")
+                return None
+
+    def load(self, goal: str) -> dict | None:
+        """
+        The checkpoint of an interrupted run of the goal, None if there is none or it is too old.
+        """
+        checkpoint = self.read(self.key(goal))
+        if checkpoint is None or checkpoint['goal'] != goal:
+            return None
+        if time.time() - checkpoint['updated'] > self.max_age:
+            self.logger.info(f"Checkpoint of goal '{goal[:80]}' is too old to resume.")
+            return None
+        return checkpoint
+
+    def latest(self) -> str | None:
+        """
+        The goal of the most recently interrupted run that can be resumed.
+        """
+        if self.folder is None:
+            with self.lock:
+                keys = list(self.checkpoints)
+        elif os.path.exists(self.folder):
+            keys = [name[:-len(".json")] for name in os.listdir(self.folder) if name.endswith(".json")]
+        else:
+            keys = []
+        checkpoints = [c for c in map(self.read, keys) if c is not None and time.time() - c['updated'] <= self.max_age]
+        if not checkpoints:
+            return None
+        return max(checkpoints, key=lambda c: c['updated'])['goal']
+
+    def clear(self, goal: str) -> None:
+        """Forget the run of the goal, once it completed."""
+        with self.lock:
+            if self.folder is None:
+                self.checkpoints.pop(self.key(goal), None)
+            elif os.path.exists(self.path(goal)):
+                os.remove(self.path(goal))
@@ -0,0 +1,230 @@
+import json
+
+from sources.tools.blocks import FENCE, THINK_START, THINK_END
+
+JSON_FENCE = FENCE + "json"
+CLOSERS = {"{": "}", "[": "]"}
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+JSON_LITERALS = {"true", "false", "null"}
+
+def last_char(out: list) -> str:
+    for piece in reversed(out):
+        piece = piece.rstrip()
+        if piece:
+            return piece[-1]
+    return ""
+
+def next_char(text: str, i: int) -> str:
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return text[i] if i < len(text) else ""
+
+def strip_trailing_comma(out: list) -> None:
+    joined = "".join(out).rstrip()
+    if joined.endswith(","):
+        out[:] = [joined[:-1]]
+
+def repair_json(text: str) -> str:
+    """
+    Fix the usual mistakes of small models in a json value, in a single pass:
+    single quoted strings, trailing commas, missing commas, doubled closing quotes, raw newlines in strings,
+    Python literals, unquoted keys and words, comments, text around the value and missing closing brackets.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    i = min(starts)
+    out = []
+    stack = []
+    quote = None # quote of the string being read
+    while i < len(text):
+        c = text[i]
+        if quote is not None:
+            if c == "\\" and i + 1 < len(text):
+                escaped = text[i + 1]
+                out.append("'" if quote == "'" and escaped == "'" else c + escaped)
+                i += 2
+                continue
+            if c == quote:
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\t":
+                out.append("\\t")
+            else:
+                out.append(c)
+            i += 1
+            continue
+        prev = last_char(out)
+        missing_comma = prev != "" and (prev in '}]"' or prev.isalnum())
+        if c in "\"'":
+            if c == '"' and prev == '"' and next_char(text, i + 1) in ",}]":
+                i += 1 # doubled closing quote
+                continue
+            if missing_comma:
+                out.append(",")
+            out.append('"')
+            quote = c
+        elif c in "{[":
+            if missing_comma:
+                out.append(",")
+            stack.append(c)
+            out.append(c)
+        elif c in "}]":
+            if stack:
+                strip_trailing_comma(out)
+                if last_char(out) == ":":
+                    out.append("null")
+                out.append(CLOSERS[stack.pop()]) # the right closer, even if the model wrote the other one
+                if not stack:
+                    break # text after the value
+        elif c.isalpha() or c == "_":
+            end = i
+            while end < len(text) and (text[end].isalnum() or text[end] in "_-"):
+                end += 1
+            word = PYTHON_LITERALS.get(text[i:end], text[i:end])
+            if missing_comma:
+                out.append(",")
+            out.append(word if word in JSON_LITERALS else json.dumps(word))
+            i = end
+            continue
+        elif c.isdigit() or c == "-":
+            end = i + 1
+            while end < len(text) and (text[end].isdigit() or text[end] in ".eE+-"):
+                end += 1
+            if missing_comma:
+                out.append(",")
+            out.append(text[i:end])
+            i = end
+            continue
+        elif text.startswith("//", i) or c == "#":
+            end = text.find("\n", i)
+            i = len(text) if end == -1 else end
+            continue
+        elif c in ",:" or c.isspace():
+            out.append(c)
+        i += 1
+    if quote is not None:
+        out.append('"')
+    while stack:
+        strip_trailing_comma(out)
+        if last_char(out) == ":":
+            out.append("null")
+        out.append(CLOSERS[stack.pop()])
+    return "".join(out)
+
+def parse_json(text: str) -> tuple:
+    """
+    Parse a json value written by a LLM, repairing it when it is not valid json.
+    Returns:
+        tuple: (the value, whether it had to be repaired)
+    Raises:
+        ValueError: the text could not be repaired.
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        return json.loads(repair_json(text)), True
+
+class PlanStreamParser:
+    """
+    Stream sink of a plan answer calling on_task(task, position) for each task object of the ```json plan
+    as soon as the object is generated, before the end of the answer.
+    Reasoning between <think> tags is skipped. The text is scanned once.
+    """
+    def __init__(self, on_task=None):
+        self.on_task = on_task
+        self.closed = False
+        self.restart()
+
+    def restart(self) -> None:
+        """Forget the text fed so far, for a new generation."""
+        self.text = ""
+        self.pos = 0
+        self.in_think = False
+        self.in_fence = False
+        self.done = False
+        self.stack = [] # open brackets with their position
+        self.quote = None
+        self.escaped = False
+        self.last = "" # last character read outside strings
+        self.tasks = []
+
+    def close(self) -> None:
+        """The plan is complete, no more tasks are reported."""
+        self.closed = True
+
+    def feed(self, chunk: str) -> None:
+        if self.closed or self.done:
+            return
+        self.text += chunk
+        if not self.in_fence and not self.seek_fence():
+            return
+        self.scan()
+
+    def seek_fence(self) -> bool:
+        text = self.text
+        while True:
+            if self.in_think:
+                end = text.find(THINK_END, self.pos)
+                if end == -1:
+                    self.pos = max(self.pos, len(text) - len(THINK_END) + 1)
+                    return False
+                self.in_think = False
+                self.pos = end + len(THINK_END)
+                continue
+            fence = text.find(JSON_FENCE, self.pos)
+            think = text.find(THINK_START, self.pos)
+            if think != -1 and (fence == -1 or think < fence):
+                self.in_think = True
+                self.pos = think + len(THINK_START)
+                continue
+            if fence == -1:
+                self.pos = max(self.pos, len(text) - max(len(JSON_FENCE), len(THINK_START)) + 1)
+                return False
+            self.in_fence = True
+            self.pos = fence + len(JSON_FENCE)
+            return True
+
+    def scan(self) -> None:
+        text = self.text
+        while self.pos < len(text):
+            c = text[self.pos]
+            if self.quote is not None:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == self.quote:
+                    self.quote = None
+                    self.last = c
+            elif c in "\"'":
+                if self.last != '"': # a quote right after a string is a doubled closing quote
+                    self.quote = c
+            elif c in "{[":
+                self.stack.append((c, self.pos))
+            elif c in "}]" and self.stack:
+                bracket, start = self.stack.pop()
+                parents = [b for b, _ in self.stack]
+                if bracket == "{" and parents in (["{", "["], ["["]):
+                    self.report(text[start:self.pos + 1])
+            elif c == "`":
+                self.done = True # end of the json block
+                return
+            if self.quote is None and not c.isspace() and c not in "\"'":
+                self.last = c
+            self.pos += 1
+
+    def report(self, text: str) -> None:
+        try:
+            task, _ = parse_json(text)
+        except ValueError:
+            return
+        if not isinstance(task, dict) or 'agent' not in task or 'task' not in task:
+            return
+        self.tasks.append(task)
+        if self.on_task is not None:
+            self.on_task(task, len(self.tasks))
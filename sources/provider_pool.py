@@ -0,0 +1,159 @@
+import time
+import socket
+import threading
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from sources.logger import Logger
+
+# address of the endpoint serving the current provider call
+current_endpoint = contextvars.ContextVar("current_endpoint", default=None)
+
+class Endpoint:
+    """
+    An inference endpoint with its load, health and circuit breaker state.
+    """
+    def __init__(self, address: str):
+        self.address = address
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.circuit_open_until = 0.0
+        self.last_probe = 0.0
+        self.last_probe_ok = True
+        self.latency_avg = None
+
+    def host_port(self) -> tuple:
+        parsed = urlparse(self.address if self.address.startswith(('http://', 'https://')) else f'http://{self.address}')
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        return parsed.hostname or self.address, port
+
+    def jsonify(self) -> dict:
+        return {
+            "address": self.address,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "circuit_open": self.circuit_open_until > time.time(),
+            "healthy": self.last_probe_ok,
+            "latency_avg": self.latency_avg,
+        }
+
+class ProviderPool:
+    """
+    Dispatch provider calls to the least loaded healthy endpoint.
+    Health is a TCP probe cached for probe_ttl seconds, and each endpoint has a circuit breaker
+    that opens after failure_threshold consecutive failures and half-opens after cooldown seconds.
+    """
+    def __init__(self, addresses: list,
+                 probe_ttl: float = 30.0,
+                 probe_timeout: float = 2.0,
+                 failure_threshold: int = 3,
+                 cooldown: float = 30.0):
+        if not addresses:
+            raise ValueError("Provider pool needs at least one endpoint.")
+        self.endpoints = [Endpoint(address) for address in addresses]
+        self.probe_ttl = probe_ttl
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.logger = Logger("provider_pool.log")
+
+    @staticmethod
+    def from_config(server_address: str, **kwargs) -> 'ProviderPool':
+        """Build a pool from a comma separated list of addresses."""
+        addresses = [address.strip() for address in server_address.split(',') if address.strip()]
+        return ProviderPool(addresses or [server_address], **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def get(self, address: str | None) -> Endpoint | None:
+        for endpoint in self.endpoints:
+            if endpoint.address == address:
+                return endpoint
+        return None
+
+    def probe(self, endpoint: Endpoint) -> bool:
+        """
+        Check the endpoint accepts TCP connections, the result is cached for probe_ttl seconds.
+        """
+        now = time.time()
+        if now - endpoint.last_probe < self.probe_ttl:
+            return endpoint.last_probe_ok
+        host, port = endpoint.host_port()
+        try:
+            with socket.create_connection((host, port), timeout=self.probe_timeout):
+                ok = True
+        except OSError:
+            ok = False
+        if not ok:
+            self.logger.warning(f"Endpoint {endpoint.address} failed health probe.")
+        endpoint.last_probe = now
+        endpoint.last_probe_ok = ok
+        return ok
+
+    def is_available(self, endpoint: Endpoint) -> bool:
+        """An endpoint is available if its circuit is closed (or half-open) and it passes the probe."""
+        if endpoint.circuit_open_until > time.time():
+            return False
+        return self.probe(endpoint)
+
+    def select(self) -> Endpoint:
+        """
+        Select the least loaded available endpoint.
+        If none is available, fall back to the endpoint whose circuit reopens first.
+        """
+        available = [endpoint for endpoint in self.endpoints if self.is_available(endpoint)]
+        with self.lock:
+            if available:
+                return min(available, key=lambda e: (e.in_flight, e.latency_avg or 0.0))
+            self.logger.warning("No healthy endpoint available, using the least recently failed one.")
+            return min(self.endpoints, key=lambda e: e.circuit_open_until)
+
+    def record_success(self, endpoint: Endpoint, latency: float) -> None:
+        with self.lock:
+            endpoint.consecutive_failures = 0
+            endpoint.circuit_open_until = 0.0
+            if endpoint.latency_avg is None:
+                endpoint.latency_avg = latency
+            else:
+                endpoint.latency_avg = 0.8 * endpoint.latency_avg + 0.2 * latency
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        with self.lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.circuit_open_until = time.time() + self.cooldown
+                self.logger.warning(f"Circuit opened for {endpoint.address} after {endpoint.consecutive_failures} failures.")
+
+    @contextmanager
+    def use(self, endpoint: Endpoint | None = None):
+        """
+        Route the provider call made within the context to an endpoint and track its outcome.
+        """
+        endpoint = endpoint or self.select()
+        with self.lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        token = current_endpoint.set(endpoint.address)
+        start = time.time()
+        try:
+            yield endpoint
+        except Exception as e:
+            self.record_failure(endpoint)
+            raise e
+        else:
+            self.record_success(endpoint, time.time() - start)
+        finally:
+            current_endpoint.reset(token)
+            with self.lock:
+                endpoint.in_flight -= 1
+
+    def stats(self) -> list:
+        return [endpoint.jsonify() for endpoint in self.endpoints]
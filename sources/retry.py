@@ -0,0 +1,123 @@
+import time
+import random
+import asyncio
+import datetime
+from email.utils import parsedate_to_datetime
+
+import httpx
+import requests
+
+from sources.logger import Logger
+from sources.metrics import add_retry
+
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+TRANSIENT_MESSAGES = ["try again later", "overloaded", "rate limit"]
+
+class ModelPulled(Exception):
+    """The backend downloaded a missing model, the call can be made again."""
+
+def exception_chain(e: BaseException) -> list:
+    """Return the exception and its causes, backends wrap the client errors."""
+    chain = []
+    while e is not None and e not in chain:
+        chain.append(e)
+        e = e.__cause__ or e.__context__
+    return chain
+
+def status_code(e: BaseException) -> int | None:
+    code = getattr(e, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(e, 'response', None), 'status_code', None)
+    return code if isinstance(code, int) else None
+
+def retry_after(e: BaseException) -> float | None:
+    """
+    Delay in seconds asked by the server in a Retry-After header (seconds or HTTP date), if any.
+    """
+    for err in exception_chain(e):
+        headers = getattr(getattr(err, 'response', None), 'headers', None)
+        if not headers:
+            continue
+        value = headers.get('retry-after', None) or headers.get('Retry-After', None)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = parsedate_to_datetime(value)
+            return max(0.0, (date - datetime.datetime.now(date.tzinfo)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return None
+
+def is_transient(e: BaseException) -> bool:
+    """
+    Connection errors, timeouts, rate limits and server overload are worth retrying,
+    an LLM call has no side effect so it can be repeated.
+    """
+    for err in exception_chain(e):
+        if isinstance(err, (ModelPulled, ConnectionError, TimeoutError, httpx.TransportError,
+                            requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        if type(err).__name__ in ["APIConnectionError", "APITimeoutError"]:
+            return True
+        if status_code(err) in TRANSIENT_STATUS_CODES:
+            return True
+        if any(message in str(err).lower() for message in TRANSIENT_MESSAGES):
+            return True
+    return False
+
+class RetryPolicy:
+    """
+    Retry transient failures with exponential backoff and full jitter, honoring Retry-After.
+    """
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 30.0):
+        """
+        Args:
+            max_retries (int): number of retries after the first attempt.
+            base_delay (float): backoff of the first retry in seconds, doubled at each retry.
+            max_delay (float): maximum delay between two attempts in seconds.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.logger = Logger("retry.log")
+
+    def should_retry(self, e: BaseException, attempt: int) -> bool:
+        return attempt < self.max_retries and is_transient(e)
+
+    def delay(self, e: BaseException, attempt: int) -> float:
+        asked = retry_after(e)
+        if asked is not None:
+            return min(asked, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def next_delay(self, e: BaseException, attempt: int) -> float:
+        delay = self.delay(e, attempt)
+        add_retry()
+        self.logger.warning(f"Attempt {attempt + 1} failed ({type(e).__name__}: {str(e)[:200]}), retrying in {delay:.2f}s.")
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                time.sleep(self.next_delay(e, attempt))
+                attempt += 1
+
+    async def acall(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self.next_delay(e, attempt))
+                attempt += 1
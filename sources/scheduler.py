@@ -0,0 +1,171 @@
+import time
+import asyncio
+import itertools
+import threading
+
+from sources.logger import Logger
+from sources.metrics import registry
+
+# priority classes, lower is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PLANNER = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PLANNER: "planner",
+    PRIORITY_BACKGROUND: "background"
+}
+
+class Waiter:
+    """
+    A call waiting for admission, woken by a threading event (sync) or a future of its event loop (async).
+    """
+    def __init__(self, priority: int, session: str, seq: int, endpoint: str | None = None, loop=None):
+        self.priority = priority
+        self.session = session
+        self.seq = seq
+        self.wanted = endpoint
+        self.enqueued = time.time()
+        self.endpoint = None
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.resolve)
+
+    def resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(self.endpoint)
+
+class AdmissionScheduler:
+    """
+    Admit provider calls to the endpoints of a backend.
+    Each endpoint accepts at most max_in_flight calls, the others wait in a queue served by
+    priority class, then by fewest in-flight calls of their session (fair sharing), then in arrival order.
+    Unavailable endpoints (circuit open, failed probe) are not admitted to, unless every endpoint is unavailable.
+    Works across threads (respond) and event loops (arespond).
+    """
+    def __init__(self, endpoints: list, max_in_flight: int = 4, rank=None, available=None):
+        """
+        Args:
+            endpoints (list): addresses of the endpoints.
+            max_in_flight (int): maximum concurrent calls per endpoint.
+            rank (callable, optional): sort key of an endpoint address, to prefer healthy and fast endpoints.
+            available (callable, optional): whether an endpoint address can be admitted to, must not block.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self.max_in_flight = max_in_flight
+        self.in_flight = {address: 0 for address in endpoints}
+        self.session_in_flight = {}
+        self.waiters = []
+        self.seq = itertools.count()
+        self.rank = rank or (lambda address: 0)
+        self.available = available or (lambda address: True)
+        self.lock = threading.Lock()
+        self.logger = Logger("scheduler.log")
+
+    def free_endpoint(self, wanted: str | None = None) -> str | None:
+        """
+        Return the best available endpoint with a free slot, the lock must be held.
+        A wanted endpoint is given even if unavailable, the others only when every endpoint is unavailable.
+        """
+        candidates = [address for address, count in self.in_flight.items()
+                      if count < self.max_in_flight and (wanted is None or address == wanted)]
+        if wanted is None and any(self.available(address) for address in self.in_flight):
+            candidates = [address for address in candidates if self.available(address)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda address: (self.rank(address), self.in_flight[address]))
+
+    def grant(self, endpoint: str, priority: int, session: str, enqueued: float) -> None:
+        """Take a slot, the lock must be held."""
+        self.in_flight[endpoint] += 1
+        self.session_in_flight[session] = self.session_in_flight.get(session, 0) + 1
+        labels = {"priority": PRIORITY_NAMES.get(priority, str(priority))}
+        registry.inc("llm_admissions_total", labels=labels)
+        registry.observe("llm_admission_wait_seconds", time.time() - enqueued, labels)
+
+    def dispatch(self) -> None:
+        """Hand free slots to the waiters, the lock must be held."""
+        for waiter in sorted(self.waiters, key=lambda w: (w.priority, self.session_in_flight.get(w.session, 0), w.seq)):
+            endpoint = self.free_endpoint(waiter.wanted)
+            if endpoint is None:
+                continue
+            self.waiters.remove(waiter)
+            self.grant(endpoint, waiter.priority, waiter.session, waiter.enqueued)
+            waiter.wake(endpoint)
+
+    def wake(self) -> None:
+        """Admit the waiters that can go after endpoints became available again."""
+        with self.lock:
+            self.dispatch()
+
+    def try_acquire(self, priority: int, session: str, endpoint: str | None, loop=None) -> tuple:
+        """
+        Take a slot right away if one is free and nobody is waiting for it, otherwise enqueue a waiter.
+        Returns (endpoint, None) or (None, waiter).
+        """
+        with self.lock:
+            address = self.free_endpoint(endpoint)
+            if address is not None and not any(w.wanted in (None, address) for w in self.waiters):
+                self.grant(address, priority, session, time.time())
+                return address, None
+            waiter = Waiter(priority, session, next(self.seq), endpoint, loop)
+            self.waiters.append(waiter)
+            return None, waiter
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, session: str = "default", endpoint: str | None = None) -> str:
+        """
+        Block until a slot is free, return the endpoint address to use.
+        """
+        address, waiter = self.try_acquire(priority, session, endpoint)
+        if address is not None:
+            return address
+        waiter.event.wait()
+        return waiter.endpoint
+
+    async def aacquire(self, priority: int = PRIORITY_INTERACTIVE, session: str = "default", endpoint: str | None = None) -> str:
+        """
+        Wait for a free slot without blocking the event loop, return the endpoint address to use.
+        """
+        address, waiter = self.try_acquire(priority, session, endpoint, asyncio.get_running_loop())
+        if address is not None:
+            return address
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    granted = None
+                else:
+                    granted = waiter.endpoint
+            if granted is not None:
+                self.release(granted, session)
+            raise
+
+    def release(self, endpoint: str, session: str = "default") -> None:
+        with self.lock:
+            self.in_flight[endpoint] -= 1
+            self.session_in_flight[session] -= 1
+            if self.session_in_flight[session] == 0:
+                del self.session_in_flight[session]
+            self.dispatch()
+
+    def stats(self) -> dict:
+        with self.lock:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for waiter in self.waiters:
+                queued[PRIORITY_NAMES.get(waiter.priority, str(waiter.priority))] += 1
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": dict(self.in_flight),
+                "queued": queued,
+                "sessions": dict(self.session_in_flight)
+            }
@@ -0,0 +1,121 @@
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, wait
+
+from sources.tools.blocks import CodeBlock, FenceStreamParser
+from sources.executors import executors, TOOLS
+from sources.logger import Logger
+
+# sink receiving the chunks of the provider call in the current context (see Provider.arespond)
+current_stream = contextvars.ContextVar("current_stream", default=None)
+
+def stream_chunk(text: str) -> None:
+    """Pass a generated chunk to the stream sink of the current call, if any."""
+    sink = current_stream.get()
+    if sink is not None and text:
+        sink.feed(text)
+
+def restart_stream() -> None:
+    """A new attempt of the call starts, the sink drops the partial text of the previous one."""
+    sink = current_stream.get()
+    if sink is not None:
+        sink.restart()
+
+class BlockDispatcher:
+    """
+    Stream sink running the blocks of an answer while the LLM is still generating it.
+    Each completed block with a tag handled by the agent tools is queued and runs on the shared tools pool,
+    one at a time in answer order. After a failed block the following ones are left to the normal execution,
+    which stops on the failure.
+    """
+    def __init__(self, tools: dict, run_block):
+        """
+        Args:
+            tools (dict): the agent tools by name.
+            run_block (callable): run_block(name, tool, block) -> executorResult, see Agent.run_block.
+        """
+        self.tools = {tool.tag: (name, tool) for name, tool in tools.items()}
+        self.run_block = run_block
+        self.parser = FenceStreamParser()
+        self.results = {}
+        self.taken = set()
+        self.queue = deque()
+        self.running = None
+        self.failed = False
+        self.lock = threading.RLock() # a task cancelled or done on submit calls back while the lock is held
+        self.logger = Logger("streaming.log")
+
+    def feed(self, chunk: str) -> None:
+        for block in self.parser.feed(chunk):
+            self.dispatch(block)
+
+    def restart(self) -> None:
+        self.parser.restart()
+
+    def dispatch(self, block: CodeBlock) -> None:
+        if block.tag not in self.tools:
+            return
+        key = (block.tag, block.content)
+        with self.lock:
+            if key in self.results:
+                return # same block generated again by a retried call
+            name, tool = self.tools[block.tag]
+            self.logger.info(f"Queueing {name} block while the answer streams.")
+            self.results[key] = Future()
+            self.queue.append((key, name, tool, block.content))
+            if self.running is None:
+                self.submit_next()
+
+    def submit_next(self) -> None:
+        with self.lock:
+            if not self.queue:
+                self.running = None
+                return
+            key, name, tool, content = self.queue.popleft()
+            task = executors.submit(TOOLS, self.run, name, tool, content)
+            self.running = (key, task)
+        task.add_done_callback(lambda task: self.finish(key, task))
+
+    def run(self, name: str, tool, block: str):
+        if self.failed:
+            return None
+        result = self.run_block(name, tool, block)
+        if not result.success:
+            self.failed = True
+        return result
+
+    def finish(self, key: tuple, task: Future) -> None:
+        if not task.cancelled():
+            if task.exception() is not None:
+                self.results[key].set_exception(task.exception())
+            else:
+                self.results[key].set_result(task.result())
+        self.submit_next()
+
+    def take(self, block: CodeBlock) -> Future | None:
+        """
+        Return the execution of this block started during the stream, if any.
+        A block still waiting for a worker is taken back and left to the caller, so a caller running
+        on the tools pool never waits for a task queued behind it.
+        """
+        key = (block.tag, block.content)
+        with self.lock:
+            if key not in self.results or key in self.taken:
+                return None
+            self.taken.add(key)
+            for item in self.queue:
+                if item[0] == key:
+                    self.queue.remove(item)
+                    return None
+            if self.running is not None and self.running[0] == key and self.running[1].cancel():
+                return None
+            return self.results[key]
+
+    def close(self) -> None:
+        """Drop the blocks not started yet and wait for the running one."""
+        with self.lock:
+            self.queue.clear()
+            running = self.running
+        if running is not None:
+            wait([running[1]])
@@ -2,6 +2,7 @@
 import os, sys
 import re
 from io import StringIO
+import signal
 import subprocess
 
 if __name__ == "__main__": # if running as a script for individual testing
@@ -9,6 +10,7 @@ if __name__ == "__main__": # if running as a script for individual testing
 
 from sources.tools.tools import Tools
 from sources.tools.safety import is_unsafe
+from sources.cancellation import get_cancellation
 
 class BashInterpreter(Tools):
     """
@@ -17,6 +19,7 @@ class BashInterpreter(Tools):
     def __init__(self):
         super().__init__()
         self.tag = "bash"
+        self.thread_safe = True
         self.name = "Bash Interpreter"
         self.description = "This tool allows the agent to execute bash commands."
     
@@ -54,12 +57,23 @@ class BashInterpreter(Tools):
                     shell=True,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
-                    universal_newlines=True
+                    universal_newlines=True,
+                    start_new_session=os.name == 'posix'
                 )
                 command_output = ""
-                for line in process.stdout:
-                    command_output += line
-                return_code = process.wait(timeout=timeout)
+                token = get_cancellation()
+                kill = lambda: self.kill_process(process)
+                if token is not None:
+                    token.register(kill)
+                try:
+                    for line in process.stdout:
+                        command_output += line
+                    return_code = process.wait(timeout=timeout)
+                finally:
+                    if token is not None:
+                        token.unregister(kill)
+                if token is not None and token.cancelled:
+                    return f"Command {command} cancelled by user. Output:\n{command_output}"
                 if return_code != 0:
                     return f"Command {command} failed with return code {return_code}:\n{command_output}"
                 concat_output += f"Output of {command}:\n{command_output.strip()}\n"
@@ -70,6 +84,18 @@ class BashInterpreter(Tools):
                 return f"Command {command} failed:\n{str(e)}"
         return concat_output
 
+    def kill_process(self, process: subprocess.Popen) -> None:
+        """
+        Kill the command and the processes it started.
+        """
+        if os.name == 'posix':
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            process.kill()
+
     def interpreter_feedback(self, output):
         """
         Provide feedback based on the output of the bash interpreter
@@ -15,6 +15,7 @@ class CInterpreter(Tools):
     def __init__(self):
         super().__init__()
         self.tag = "c"
+        self.thread_safe = True
         self.name = "C Interpreter"
         self.description = "This tool allows the agent to execute C code."
 
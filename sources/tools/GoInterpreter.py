@@ -15,6 +15,7 @@ class GoInterpreter(Tools):
     def __init__(self):
         super().__init__()
         self.tag = "go"
+        self.thread_safe = True
         self.name = "Go Interpreter"
         self.description = "This tool allows you to execute Go code."
 
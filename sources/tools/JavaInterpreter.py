@@ -15,6 +15,7 @@ class JavaInterpreter(Tools):
     def __init__(self):
         super().__init__()
         self.tag = "java"
+        self.thread_safe = True
         self.name = "Java Interpreter"
         self.description = "This tool allows you to execute Java code."
 
@@ -0,0 +1,244 @@
+"""
+Single pass parser for the blocks of an LLM answer.
+
+A block is a fenced section:
+```<tag>[:save_path] [independent]
+<code or query>
+```
+Blocks marked independent do not depend on the blocks around them and may run concurrently.
+parse_blocks tokenizes the answer once and returns every block with its tag,
+so the agent can dispatch them to the tools instead of having each tool rescan the text.
+"""
+
+import sys
+import os
+
+if __name__ == "__main__": # if running as a script for individual testing
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+FENCE = '```'
+INDEPENDENT = 'independent'
+THINK_START = '<think>'
+THINK_END = '</think>'
+
+class CodeBlock:
+    """
+    A fenced block found in an LLM answer.
+    """
+    def __init__(self, tag: str, content: str, save_path: str | None, start: int, end: int, independent: bool = False):
+        """
+        Args:
+            tag (str): tag of the block (e.g. python, bash, web_search), empty for a bare fence.
+            content (str): code or query of the block, dedented to the opening fence.
+            save_path (str, optional): path given after the tag (```python:main.py).
+            start (int): offset of the opening fence in the answer.
+            end (int): offset just after the closing fence.
+            independent (bool): the block was marked independent on its opening fence.
+        """
+        self.tag = tag
+        self.content = content
+        self.save_path = save_path
+        self.start = start
+        self.end = end
+        self.independent = independent
+
+    def __repr__(self) -> str:
+        return f"CodeBlock(tag={self.tag!r}, save_path={self.save_path!r}, start={self.start}, end={self.end})"
+
+def read_tag(text: str, pos: int) -> int:
+    """Return the offset where the tag starting at pos ends (whitespace, ':' or a backtick)."""
+    end = pos
+    size = len(text)
+    while end < size and not text[end].isspace() and text[end] not in ':`':
+        end += 1
+    return end
+
+def dedent(content: str, indent: str) -> str:
+    """Remove the indentation of the opening fence from the lines of the block."""
+    if not indent:
+        return content
+    lines = content.split('\n')
+    return '\n'.join(line[len(indent):] if line.startswith(indent) else line for line in lines)
+
+def make_block(text: str, pos: int, tag_end: int, close: int) -> CodeBlock:
+    """
+    Build the block opened by the fence at pos and closed by the fence at close.
+    """
+    line_start = text.rfind('\n', 0, pos) + 1
+    content = dedent(text[tag_end:close], text[line_start:pos])
+    first_line_end = content.find('\n')
+    first_line = content if first_line_end == -1 else content[:first_line_end]
+    independent = INDEPENDENT in first_line.split()
+    if independent:
+        first_line = first_line.replace(INDEPENDENT, "").strip()
+    save_path = None
+    if ':' in first_line:
+        save_path = first_line.split(':')[1]
+    if save_path is not None or independent:
+        content = content[first_line_end+1:]
+    return CodeBlock(text[pos + len(FENCE):tag_end], content, save_path, pos, close + len(FENCE), independent)
+
+def parse_blocks(text: str) -> list[CodeBlock]:
+    """
+    Find all the fenced blocks of the text in a single left to right pass.
+    An unterminated block at the end of the text is ignored.
+    Args:
+        text (str): the LLM answer.
+    Returns:
+        list[CodeBlock]: the blocks in the order they appear.
+    """
+    blocks = []
+    pos = text.find(FENCE)
+    while pos != -1:
+        tag_end = read_tag(text, pos + len(FENCE))
+        close = text.find(FENCE, tag_end)
+        if close == -1:
+            break
+        blocks.append(make_block(text, pos, tag_end, close))
+        pos = text.find(FENCE, close + len(FENCE))
+    return blocks
+
+class FenceStreamParser:
+    """
+    Incremental version of parse_blocks for a streamed answer: feed the chunks as they arrive,
+    each call returns the blocks completed by the chunk. Reasoning between <think> tags is skipped.
+    The text is scanned once, a partial fence or tag at the end of a chunk is completed by the next one.
+    """
+    def __init__(self):
+        self.restart()
+
+    def restart(self) -> None:
+        """Forget the text fed so far, for a new generation."""
+        self.text = ""
+        self.pos = 0
+        self.in_think = False
+        self.open_fence = None
+        self.tag_end = None
+
+    def feed(self, chunk: str) -> list[CodeBlock]:
+        self.text += chunk
+        text = self.text
+        completed = []
+        while True:
+            if self.in_think:
+                end = text.find(THINK_END, self.pos)
+                if end == -1:
+                    self.pos = max(self.pos, len(text) - len(THINK_END) + 1)
+                    break
+                self.in_think = False
+                self.pos = end + len(THINK_END)
+            elif self.open_fence is None:
+                fence = text.find(FENCE, self.pos)
+                think = text.find(THINK_START, self.pos)
+                if think != -1 and (fence == -1 or think < fence):
+                    self.in_think = True
+                    self.pos = think + len(THINK_START)
+                    continue
+                if fence == -1:
+                    self.pos = max(self.pos, len(text) - len(THINK_START) + 1)
+                    break
+                self.open_fence = fence
+                self.pos = fence + len(FENCE)
+            else:
+                if self.tag_end is None:
+                    tag_end = read_tag(text, self.open_fence + len(FENCE))
+                    if tag_end == len(text): # the tag may continue in the next chunk
+                        break
+                    self.tag_end = self.pos = tag_end
+                close = text.find(FENCE, self.pos)
+                if close == -1:
+                    self.pos = max(self.pos, len(text) - len(FENCE) + 1)
+                    break
+                completed.append(make_block(text, self.open_fence, self.tag_end, close))
+                self.open_fence = self.tag_end = None
+                self.pos = close + len(FENCE)
+        return completed
+
+def blocks_by_tag(blocks: list[CodeBlock]) -> dict[str, list[CodeBlock]]:
+    """Group the blocks by tag, keeping their order within a tag."""
+    grouped = {}
+    for block in blocks:
+        grouped.setdefault(block.tag, []).append(block)
+    return grouped
+
+def replace_blocks(text: str, blocks: list[CodeBlock]) -> str:
+    """
+    Replace each block, with the lines of its fences, by a block:<index> line.
+    Text after an unterminated fence is dropped.
+    Args:
+        text (str): the LLM answer the blocks were parsed from.
+        blocks (list[CodeBlock]): the result of parse_blocks(text).
+    """
+    parts = []
+    cursor = 0
+    for idx, block in enumerate(blocks):
+        line_start = text.rfind('\n', 0, block.start) + 1
+        if line_start < cursor:
+            line_start = cursor # two blocks on the same line
+        parts.append(text[cursor:line_start])
+        parts.append(f"block:{idx}")
+        line_end = text.find('\n', block.end)
+        cursor = len(text) if line_end == -1 else line_end
+    tail = text[cursor:]
+    unterminated = tail.find(FENCE)
+    if unterminated != -1:
+        tail = tail[:max(tail.rfind('\n', 0, unterminated), 0)]
+    parts.append(tail)
+    return "".join(parts)
+
+if __name__ == "__main__":
+    import time
+
+    def legacy_load_exec_block(tag: str, llm_text: str) -> list[str]:
+        """Per tool scan done before the single pass parser, kept for comparison."""
+        start_tag = f'```{tag}'
+        blocks = []
+        start_index = 0
+        while True:
+            start_pos = llm_text.find(start_tag, start_index)
+            if start_pos == -1:
+                break
+            line_start = llm_text.rfind('\n', 0, start_pos)+1
+            end_pos = llm_text.find('```', start_pos + len(start_tag))
+            if end_pos == -1:
+                break
+            blocks.append(dedent(llm_text[start_pos + len(start_tag):end_pos], llm_text[line_start:start_pos]))
+            start_index = end_pos + 3
+        return blocks
+
+    def legacy_remove_blocks(text: str) -> str:
+        post_lines = []
+        in_block = False
+        block_idx = 0
+        for line in text.split('\n'):
+            if FENCE in line and not in_block:
+                in_block = True
+                continue
+            if not in_block:
+                post_lines.append(line)
+            if FENCE in line:
+                in_block = False
+                post_lines.append(f"block:{block_idx}")
+                block_idx += 1
+        return "\n".join(post_lines)
+
+    tags = ["python", "bash", "c", "go", "java", "file_finder"]
+    section = "Let me explain what the code does before running it.\n" * 20
+    code = "\n".join(f"    value_{i} = compute({i}) # some work" for i in range(40))
+    for n_blocks in [4, 40, 400]:
+        answer = "".join(f"{section}```{tags[i % 2]}\n{code}\n```\n" for i in range(n_blocks))
+        rounds = max(1, 2000 // n_blocks)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for tag in tags:
+                legacy_load_exec_block(tag, answer)
+            legacy_remove_blocks(answer)
+        legacy = (time.perf_counter() - start) / rounds
+        start = time.perf_counter()
+        for _ in range(rounds):
+            blocks = parse_blocks(answer)
+            blocks_by_tag(blocks)
+            replace_blocks(answer, blocks)
+        single = (time.perf_counter() - start) / rounds
+        print(f"{len(answer)/1024:8.0f} KiB, {n_blocks:4d} blocks: "
+              f"{len(tags)} tool scans {legacy*1000:8.3f} ms, single pass {single*1000:8.3f} ms ({legacy/single:.1f}x)")
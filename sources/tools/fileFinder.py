@@ -15,6 +15,8 @@ class FileFinder(Tools):
     def __init__(self):
         super().__init__()
         self.tag = "file_finder"
+        self.side_effect_free = True
+        self.thread_safe = True
         self.name = "File Finder"
         self.description = "Finds files in the current directory and returns their information."
     
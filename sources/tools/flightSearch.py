@@ -16,6 +16,8 @@ class FlightSearch(Tools):
         """
         super().__init__()
         self.tag = "flight_search"
+        self.side_effect_free = True
+        self.thread_safe = True
         self.name = "Flight Search"
         self.description = "Search for flight information using a flight number via AviationStack API."
         self.api_key = None
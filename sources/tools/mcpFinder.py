@@ -15,6 +15,8 @@ class MCP_finder(Tools):
     def __init__(self, api_key: str = None):
         super().__init__()
         self.tag = "mcp_finder"
+        self.side_effect_free = True
+        self.thread_safe = True
         self.name = "MCP Finder"
         self.description = "Find MCP servers and their tools"
         self.base_url = "https://registry.smithery.ai"
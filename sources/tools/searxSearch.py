@@ -14,6 +14,8 @@ class searxSearch(Tools):
         """
         super().__init__()
         self.tag = "web_search"
+        self.side_effect_free = True
+        self.thread_safe = True
         self.name = "searxSearch"
         self.description = "A tool for searching a SearxNG for web search"
         self.base_url = base_url or os.getenv("SEARXNG_BASE_URL")  # Requires a SearxNG base URL
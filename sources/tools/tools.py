@@ -19,6 +19,7 @@ A tool is not just for code tool but also API, internet search, MCP, etc..
 
 import sys
 import os
+import threading
 import configparser
 from abc import abstractmethod
 
@@ -26,6 +27,30 @@ if __name__ == "__main__": # if running as a script for individual testing
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sources.logger import Logger
+from sources.tools.blocks import CodeBlock, parse_blocks
+
+# config.ini and the work directory it sets, resolved once for all the tools, by config path and modification time
+config_cache = {}
+config_lock = threading.Lock()
+
+def load_config(path: str = './config.ini') -> tuple:
+    """
+    Parsed config file, read again only when the file changed.
+    Returns:
+        tuple: (modification time, None when missing, the shared parser which must not be modified,
+                dict of the values resolved from it)
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with config_lock:
+        cached = config_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            config = configparser.ConfigParser()
+            if mtime is not None:
+                config.read(path)
+            cached = (mtime, config, {})
+            config_cache[path] = cached
+        return cached
 
 class Tools():
     """
@@ -38,11 +63,13 @@ class Tools():
         self.client = None
         self.messages = []
         self.logger = Logger("tools.log")
-        self.config = configparser.ConfigParser()
+        _, self.config, self.resolved = load_config()
         self.work_dir = self.create_work_dir()
         self.excutable_blocks_found = False
         self.safe_mode = True
         self.allow_language_exec_bash = False
+        self.side_effect_free = False # blocks only read (search, lookup), they may run concurrently
+        self.thread_safe = False # blocks can execute in parallel threads
     
     def get_work_dir(self):
         return self.work_dir
@@ -70,9 +97,13 @@ class Tools():
 
     def create_work_dir(self):
         """Create the work directory if it does not exist."""
+        if 'work_dir' not in self.resolved: # checked once per config change, not for every tool
+            self.resolved['work_dir'] = self.resolve_work_dir()
+        return self.resolved['work_dir']
+
+    def resolve_work_dir(self):
         default_path = os.path.dirname(os.getcwd())
         if self.config_exists():
-            self.config.read('./config.ini')
             config_path = self.config['MAIN']['work_dir']
             dir_path = default_path if not self.check_config_dir_validity() else config_path
         else:
@@ -157,55 +188,32 @@ class Tools():
         self.excutable_blocks_found = False
         return tmp
 
-    def load_exec_block(self, llm_text: str) -> tuple[list[str], str | None]:
+    def load_exec_block(self, llm_text: str, blocks: list[CodeBlock] | None = None) -> tuple[list[str], str | None]:
         """
         Extract code/query blocks from LLM-generated text and process them for execution.
         This method parses the text looking for code blocks marked with the tool's tag (e.g. ```python).
         Args:
             llm_text (str): The raw text containing code blocks from the LLM
+            blocks (list[CodeBlock], optional): The result of parse_blocks(llm_text), to avoid parsing it again
         Returns:
             tuple[list[str], str | None]: A tuple containing:
                 - List of extracted and processed code blocks
                 - The path the code blocks was saved to
         """
         assert self.tag != "undefined", "Tag not defined"
-        start_tag = f'```{self.tag}' 
-        end_tag = '```'
+        if blocks is None:
+            blocks = parse_blocks(llm_text)
         code_blocks = []
-        start_index = 0
         save_path = None
-
-        if start_tag not in llm_text:
+        for block in blocks:
+            if block.tag != self.tag:
+                continue
+            if block.save_path is not None:
+                save_path = block.save_path
+            code_blocks.append(block.content)
+        if not code_blocks:
             return None, None
-
-        while True:
-            start_pos = llm_text.find(start_tag, start_index)
-            if start_pos == -1:
-                break
-
-            line_start = llm_text.rfind('\n', 0, start_pos)+1
-            leading_whitespace = llm_text[line_start:start_pos]
-
-            end_pos = llm_text.find(end_tag, start_pos + len(start_tag))
-            if end_pos == -1:
-                break
-            content = llm_text[start_pos + len(start_tag):end_pos]
-            lines = content.split('\n')
-            if leading_whitespace:
-                processed_lines = []
-                for line in lines:
-                    if line.startswith(leading_whitespace):
-                        processed_lines.append(line[len(leading_whitespace):])
-                    else:
-                        processed_lines.append(line)
-                content = '\n'.join(processed_lines)
-
-            if ':' in content.split('\n')[0]:
-                save_path = content.split('\n')[0].split(':')[1]
-                content = content[content.find('\n')+1:]
-            self.excutable_blocks_found = True
-            code_blocks.append(content)
-            start_index = end_pos + len(end_tag)
+        self.excutable_blocks_found = True
         self.logger.info(f"Found {len(code_blocks)} blocks to execute")
         return code_blocks, save_path
     
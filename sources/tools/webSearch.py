@@ -20,6 +20,8 @@ class webSearch(Tools):
         """
         super().__init__()
         self.tag = "web_search"
+        self.side_effect_free = True
+        self.thread_safe = True
         self.api_key = api_key or os.getenv("SERPAPI_KEY")  # Requires a SerpApi key
         self.paywall_keywords = [
             "subscribe", "login to continue", "access denied", "restricted content", "404", "this page is not working"
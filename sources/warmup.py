@@ -0,0 +1,76 @@
+import time
+import asyncio
+from typing import List
+
+from sources.logger import Logger
+
+class Warmup:
+    """
+    Keep the inference server ready for the agents.
+    At startup, and again whenever the provider has been idle for idle_timeout seconds,
+    each distinct agent system prompt is prefilled on the server and the model is pinned with keep_alive.
+    """
+    def __init__(self, agents: list, idle_timeout: float = 600.0, check_interval: float = 30.0):
+        self.agents = agents
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.logger = Logger("warmup.log")
+        self.task = None
+
+    def get_prompts(self) -> List[tuple]:
+        """
+        Collect the distinct (provider, system prompt) pairs of the agents and their sub-agents.
+        """
+        prompts = []
+        seen = set()
+        agents = list(self.agents)
+        while agents:
+            agent = agents.pop(0)
+            if hasattr(agent, 'agents') and isinstance(agent.agents, dict):
+                agents.extend(agent.agents.values())
+            if agent.memory is None or agent.llm is None:
+                continue
+            system = agent.memory.get()[0]
+            key = (id(agent.llm), system['content'])
+            if key in seen:
+                continue
+            seen.add(key)
+            prompts.append((agent.llm, [{'role': 'system', 'content': system['content']}]))
+        return prompts
+
+    async def warm(self) -> int:
+        """
+        Prefill every agent system prompt, return the number of prompts warmed.
+        """
+        start = time.time()
+        warmed = 0
+        for provider, history in self.get_prompts():
+            if await provider.awarmup(history):
+                warmed += 1
+        if warmed:
+            self.logger.info(f"Warmed {warmed} agent prompts in {time.time() - start:.2f}s")
+        return warmed
+
+    def is_idle(self) -> bool:
+        providers = set(agent.llm for agent in self.agents if agent.llm is not None)
+        return all(time.time() - provider.last_activity > self.idle_timeout for provider in providers)
+
+    async def run(self) -> None:
+        """
+        Warm at startup then after every idle period, until cancelled.
+        """
+        await self.warm()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            if self.is_idle():
+                self.logger.info("Provider idle, warming up again.")
+                await self.warm()
+
+    def start(self) -> None:
+        """Start the background warm-up loop on the running event loop."""
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
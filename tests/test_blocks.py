@@ -0,0 +1,59 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.tools.blocks import parse_blocks, blocks_by_tag, replace_blocks, FenceStreamParser
+from sources.tools.BashInterpreter import BashInterpreter
+
+ANSWER = """I will list the files then save a script.
+```bash
+ls -la
+```
+1. Save the script:
+   ```python:hello/main.py
+   def main():
+       print("hello")
+   ```
+A C++ block, not for the c tool:
+```cpp
+int main() {}
+```
+Done."""
+
+class TestBlockParser(unittest.TestCase):
+    def test_parse_blocks(self):
+        blocks = parse_blocks(ANSWER)
+        self.assertEqual([block.tag for block in blocks], ["bash", "python", "cpp"])
+        self.assertEqual(blocks[0].content, "\nls -la\n")
+        self.assertEqual(blocks[1].save_path, "hello/main.py")
+        self.assertEqual(blocks[1].content, 'def main():\n    print("hello")\n')
+        self.assertEqual(ANSWER[blocks[0].start:blocks[0].end], "```bash\nls -la\n```")
+
+    def test_dispatch_by_tag(self):
+        grouped = blocks_by_tag(parse_blocks("```python\na\n```\n```python\nb\n```\n```bash\nc\n```"))
+        self.assertEqual([block.content for block in grouped["python"]], ["\na\n", "\nb\n"])
+        bash = BashInterpreter()
+        self.assertEqual(bash.load_exec_block("", grouped["bash"]), (["\nc\n"], None))
+        self.assertEqual(bash.load_exec_block("no block here"), (None, None))
+
+    def test_replace_blocks(self):
+        text = "Run this:\n```bash\nls\n```\nthen\n```python\nprint(1)\n```\nend"
+        self.assertEqual(replace_blocks(text, parse_blocks(text)), "Run this:\nblock:0\nthen\nblock:1\nend")
+        unterminated = "Start\n```python\nprint(1)\n```\nmore\n```bash\nls"
+        self.assertEqual(replace_blocks(unterminated, parse_blocks(unterminated)), "Start\nblock:0\nmore")
+
+    def test_stream_parser_matches_parse_blocks(self):
+        streamed = "<think>draft: ```python\nprint(0)\n```</think>\n" + ANSWER
+        for size in [1, 3, 7, 64]:
+            parser = FenceStreamParser()
+            blocks = []
+            for i in range(0, len(streamed), size):
+                blocks += parser.feed(streamed[i:i+size])
+            expected = parse_blocks(ANSWER)
+            self.assertEqual([(b.tag, b.content, b.save_path) for b in blocks],
+                             [(b.tag, b.content, b.save_path) for b in expected])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import threading
+import time
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.cancellation import CancellationToken, CancelledByUser, current_cancellation, check_cancelled
+from sources.tools.BashInterpreter import BashInterpreter
+
+class TestCancellation(unittest.TestCase):
+    def test_callbacks_run_once(self):
+        token = CancellationToken()
+        calls = []
+        token.register(lambda: calls.append("abort"))
+        token.cancel()
+        token.cancel()
+        token.register(lambda: calls.append("late"))
+        self.assertEqual(calls, ["abort", "late"])
+        with self.assertRaises(CancelledByUser):
+            token.raise_if_cancelled()
+
+    def test_check_cancelled_uses_context(self):
+        token = CancellationToken()
+        context_token = current_cancellation.set(token)
+        try:
+            check_cancelled()
+            token.cancel()
+            with self.assertRaises(CancelledByUser):
+                check_cancelled()
+        finally:
+            current_cancellation.reset(context_token)
+        check_cancelled()
+
+    @unittest.skipUnless(os.name == 'posix', "process groups are POSIX only")
+    def test_cancel_kills_bash_command(self):
+        bash = BashInterpreter()
+        bash.work_dir = os.getcwd()
+        token = CancellationToken()
+        context_token = current_cancellation.set(token)
+        try:
+            threading.Timer(0.3, token.cancel).start()
+            start = time.time()
+            output = bash.execute(["sleep 10"])
+        finally:
+            current_cancellation.reset(context_token)
+        self.assertLess(time.time() - start, 5)
+        self.assertIn("cancelled", output)
+
+if __name__ == '__main__':
+    unittest.main()
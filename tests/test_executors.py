@@ -0,0 +1,51 @@
+import unittest
+import asyncio
+import threading
+import contextvars
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.executors import ExecutorService
+from sources.metrics import registry
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+class TestExecutorService(unittest.TestCase):
+    def setUp(self):
+        registry.reset()
+        self.executors = ExecutorService({"tools": 2})
+
+    def tearDown(self):
+        self.executors.shutdown()
+
+    def test_pool_is_bounded_and_instrumented(self):
+        release = threading.Event()
+        futures = [self.executors.submit("tools", release.wait, 5) for _ in range(4)]
+        stats = self.executors.stats()["tools"]
+        self.assertEqual(stats["max_workers"], 2)
+        self.assertLessEqual(stats["active"], 2)
+        self.assertEqual(stats["active"] + stats["queued"], 4)
+        release.set()
+        for future in futures:
+            future.result()
+        self.assertEqual(self.executors.stats()["tools"]["completed"], 4)
+        self.assertEqual(registry.get_gauge("executor_queue_depth", {"pool": "tools"}), 0)
+        self.assertEqual(registry.get_histogram("executor_task_seconds", {"pool": "tools"}).count, 4)
+
+    def test_context_is_propagated(self):
+        async def main():
+            request_id.set("query-1")
+            return await self.executors.run("llm_io", request_id.get)
+        self.assertEqual(asyncio.run(main()), "query-1")
+
+    def test_unknown_pool_and_late_configure(self):
+        with self.assertRaises(ValueError):
+            self.executors.get("gpu")
+        self.executors.get("background")
+        self.executors.configure(background=16)
+        self.assertEqual(self.executors.get("background").max_workers, 2)
+
+if __name__ == '__main__':
+    unittest.main()
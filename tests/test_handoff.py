@@ -0,0 +1,36 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.handoff import HandOff, extract_paths, extract_urls
+from sources.schemas import executorResult
+from sources.metrics import estimate_tokens
+
+class TestHandOff(unittest.TestCase):
+    def setUp(self):
+        code = "import csv\nwith open('data/startups.csv', 'w') as f:\n" + "    f.write('row')\n" * 200
+        self.blocks = [executorResult(code, "Saved 42 rows to data/startups.csv", True, "python")]
+        self.answer = "I saved the startups found on https://www.example.com/list, e.g. Acme, in data/startups.csv."
+
+    def test_extract_artifacts(self):
+        self.assertEqual(extract_urls(self.answer), ["https://www.example.com/list"])
+        self.assertEqual(extract_paths(self.answer + " see report.md"), ["data/startups.csv", "report.md"])
+
+    def test_render_fits_budget(self):
+        handoff = HandOff(self.answer, True, self.blocks)
+        text = handoff.render(100)
+        self.assertLessEqual(estimate_tokens(text), 100)
+        self.assertIn("Files: data/startups.csv", text)
+        self.assertIn("URLs: https://www.example.com/list", text)
+        self.assertIn("Last output: Saved 42 rows", text)
+        self.assertNotIn("f.write", text)
+        self.assertLessEqual(estimate_tokens(handoff.render(10)), 10)
+
+    def test_from_text(self):
+        handoff = HandOff.from_text("Could not open the page.\nAgent failed with task (Error detected).")
+        self.assertIn("Status: failure", handoff.render(50))
+
+if __name__ == '__main__':
+    unittest.main()
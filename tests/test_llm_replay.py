@@ -0,0 +1,51 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.llm_provider import Provider
+from sources.llm_replay import history_hash
+
+class TestLLMReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.record_path = os.path.join(self.tmp_dir.name, "record.jsonl")
+        self.history = [
+            {'role': 'system', 'content': 'You are a planner.'},
+            {'role': 'user', 'content': 'Find AI startups in Osaka.', 'time': '2025-01-01 10:00:00'}
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_history_hash_ignores_metadata(self):
+        other = [dict(msg) for msg in self.history]
+        other[1]['time'] = '2026-06-06 12:00:00'
+        self.assertEqual(history_hash(self.history), history_hash(other))
+
+    def test_record_then_replay(self):
+        recorder = Provider("test", "test-model", record_path=self.record_path)
+        answer = recorder.respond(self.history, verbose=False)
+        replayer = Provider("replay", "test-model", server_address=self.record_path, replay_timing="none")
+        self.assertEqual(replayer.respond(self.history, verbose=False), answer)
+
+    def test_replay_falls_back_to_recorded_order(self):
+        recorder = Provider("test", "test-model", record_path=self.record_path)
+        answer = recorder.respond(self.history, verbose=False)
+        replayer = Provider("replay", "test-model", server_address=self.record_path, replay_timing="none")
+        changed = self.history + [{'role': 'user', 'content': 'Today is another day.'}]
+        self.assertEqual(replayer.respond(changed, verbose=False), answer)
+        with self.assertRaises(Exception):
+            replayer.respond(changed, verbose=False)
+
+    def test_simulated_token_rate(self):
+        recorder = Provider("test", "test-model", record_path=self.record_path)
+        recorder.respond(self.history, verbose=False)
+        replayer = Provider("replay", "test-model", server_address=self.record_path, replay_timing="1000")
+        record = replayer.replayer.records[0]
+        self.assertAlmostEqual(replayer.replayer.delay(record), len(record['output']) / 4 / 1000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -73,6 +73,16 @@ class TestMemory(unittest.TestCase):
         memory_content = self.memory.get()
         self.assertEqual(len(memory_content), 2)
 
+    def test_get_within_context(self):
+        self.assertEqual(self.memory.get_within_context(), self.memory.get())
+        for i in range(10):
+            self.memory.push('user', f"message {i} " + "x" * 390)
+        self.memory.context_length = 2048 + 350
+        history = self.memory.get_within_context()
+        self.assertEqual(history[0]['role'], 'system')
+        self.assertEqual([m['content'][:9] for m in history[1:]], ["message 7", "message 8", "message 9"])
+        self.assertEqual(len(self.memory.get()), 11)
+
     def test_reset(self):
         self.memory.push("user", "Hello")
         new_memory = [{"role": "system", "content": "New prompt"}]
@@ -0,0 +1,50 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.metrics import Histogram, MetricsRegistry, registry, track_call, mark_first_token, set_usage
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        registry.reset()
+        self.history = [{'role': 'user', 'content': 'Hello, how are you?'}]
+        self.labels = {"provider": "test", "model": "m", "caller": "coder"}
+
+    def test_histogram_quantile(self):
+        hist = Histogram([1, 2, 4])
+        for value in [0.5, 1.5, 1.5, 3.0]:
+            hist.observe(value)
+        self.assertEqual(hist.count, 4)
+        self.assertAlmostEqual(hist.quantile(0.5), 1.5)
+        self.assertIsNone(Histogram([1]).quantile(0.5))
+
+    def test_track_call_uses_reported_usage(self):
+        with track_call("test", "m", self.history, caller="coder") as call:
+            mark_first_token()
+            set_usage(12, 34)
+            call.output = "I am fine."
+        self.assertIsNotNone(call.ttft)
+        self.assertEqual(registry.get_counter("llm_prompt_tokens_total", self.labels), 12)
+        self.assertEqual(registry.get_counter("llm_completion_tokens_total", self.labels), 34)
+        self.assertEqual(registry.get_histogram("llm_ttft_seconds", self.labels).count, 1)
+
+    def test_track_call_estimates_tokens_and_errors(self):
+        with self.assertRaises(ValueError):
+            with track_call("test", "m", self.history, caller="coder"):
+                raise ValueError("backend down")
+        self.assertEqual(registry.get_counter("llm_errors_total", self.labels), 1)
+        self.assertEqual(registry.get_counter("llm_prompt_tokens_total", self.labels), 4)
+        self.assertIsNone(registry.get_histogram("llm_ttft_seconds", self.labels))
+
+    def test_render_prometheus(self):
+        metrics = MetricsRegistry()
+        metrics.observe("latency", 0.3, {"provider": "test"}, buckets=[0.1, 1])
+        text = metrics.render()
+        self.assertIn('latency_bucket{provider="test",le="0.1"} 0', text)
+        self.assertIn('latency_bucket{provider="test",le="+Inf"} 1', text)
+        self.assertIn('latency_count{provider="test"} 1', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import tempfile
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.plan_cache import PlanCache
+from sources.metrics import registry
+
+GOAL = "Find AI startups in Osaka and save the list in a file"
+PLAN = [
+    ["Search startups", {"agent": "Web", "id": "1", "task": "Search AI startups in Osaka"}],
+    ["Save list", {"agent": "File", "id": "2", "task": "Save the AI startups in Osaka to startups.txt", "need": ["1"]}]
+]
+
+class TestPlanCache(unittest.TestCase):
+    def setUp(self):
+        registry.reset()
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "plan_cache.json")
+        self.cache = PlanCache(self.path)
+        self.cache.store(GOAL, PLAN)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_similar_goal_reuses_adapted_plan(self):
+        result, plan, _ = self.cache.lookup("Find AI startups in Kyoto and save the list in a file")
+        self.assertEqual(result, "hit")
+        self.assertEqual(plan[0][1]['task'], "Search AI startups in Kyoto")
+        self.assertEqual(plan[1][1]['need'], ["1"])
+        self.assertEqual(PLAN[0][1]['task'], "Search AI startups in Osaka")
+
+    def test_replaced_words_keep_the_plan_case(self):
+        result, plan, _ = self.cache.lookup("Find AI startups in Osaka and delete the list in a file")
+        self.assertEqual(result, "hit")
+        self.assertEqual(plan[1][1]['task'], "Delete the AI startups in Osaka to startups.txt")
+
+    def test_replaced_word_missing_from_plan_is_not_a_hit(self):
+        for goal in ["Find AI startups in Osaka and save the list in a pdf",
+                     "Rank AI startups in Osaka and save the list in a file"]:
+            with self.subTest(goal=goal):
+                result, plan, _ = self.cache.lookup(goal)
+                self.assertEqual(result, "seed")
+                self.assertEqual(plan, PLAN)
+
+    def test_seed_and_miss(self):
+        result, plan, _ = self.cache.lookup("Find robotics startups in Kyoto and save the list in a text file")
+        self.assertEqual(result, "seed")
+        self.assertEqual(plan, PLAN)
+        result, plan, _ = self.cache.lookup("write a snake game in python")
+        self.assertEqual((result, plan), ("miss", None))
+        self.assertEqual(registry.get_counter("planner_plan_cache_lookups_total", {"result": "miss"}), 1)
+        self.assertEqual(registry.get_gauge("planner_plan_cache_hit_ratio"), 0)
+
+    def test_persistence(self):
+        cache = PlanCache(self.path)
+        self.assertEqual(cache.lookup(GOAL)[:2], ("hit", PLAN))
+
+if __name__ == '__main__':
+    unittest.main()
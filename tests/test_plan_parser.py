@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.plan_parser import parse_json, PlanStreamParser
+
+PLAN = """## Task 1: search
+```json
+{
+  "plan": [
+    {"agent": "Web", "id": "1", "need": [], "task": "Search for weather APIs"},
+    {"agent": "Coder", "id": "2", "need": ["1"], "task": "Write the app. You are forbidden from asking clarification, just execute.""
+    }
+  ]
+}
+```
+"""
+
+class TestParseJson(unittest.TestCase):
+    def test_valid_json_is_not_repaired(self):
+        self.assertEqual(parse_json('{"plan": []}'), ({"plan": []}, False))
+
+    def test_repairs(self):
+        cases = {
+            "trailing commas": """{"plan": [{"agent": "Web", "task": "search",},]}""",
+            "single quotes": """{'plan': [{'agent': 'Web', 'task': "search"}]}""",
+            "missing brackets": """{"plan": [{"agent": "Web", "task": "search\"""",
+            "missing comma": """{"plan": [{"agent": "Web", "task": "search"} {"agent": "Web", "task": "read"}]}""",
+            "python literals": """{"plan": [{"agent": "Web", "task": "search", "need": None}]} hope it helps"""
+        }
+        for mistake, text in cases.items():
+            with self.subTest(mistake=mistake):
+                value, repaired = parse_json(text)
+                self.assertTrue(repaired)
+                self.assertEqual(value["plan"][0]["task"], "search")
+
+    def test_doubled_closing_quote(self):
+        text = PLAN.split("```json")[1].split("```")[0]
+        value, _ = parse_json(text)
+        self.assertEqual([task["id"] for task in value["plan"]], ["1", "2"])
+
+    def test_unrepairable(self):
+        with self.assertRaises(ValueError):
+            parse_json("no plan here")
+
+class TestPlanStreamParser(unittest.TestCase):
+    def test_tasks_reported_as_their_object_closes(self):
+        reported = []
+        parser = PlanStreamParser(lambda task, position: reported.append((task["id"], len(parser.text))))
+        text = "<think>```json {\"agent\": \"Web\", \"task\": \"no\"}```</think>" + PLAN
+        for i in range(0, len(text), 5):
+            parser.feed(text[i:i + 5])
+        self.assertEqual([task_id for task_id, _ in reported], ["1", "2"])
+        first_close = text.index("APIs\"}") + len("APIs\"}")
+        self.assertLess(reported[0][1], first_close + 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+import unittest
+import asyncio
+import tempfile
+import time
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.llm_provider import Provider
+from sources.agents.planner_agent import PlannerAgent
+from sources.agents.casual_agent import CasualAgent
+from sources.tools.tools import Tools
+from sources.scheduler import PRIORITY_PLANNER
+from sources.cancellation import CancellationToken, CancelledByUser, check_cancelled, current_cancellation
+from sources.metrics import track_call
+from sources.metrics import registry
+from sources.plan_checkpoint import PlanCheckpoint
+from sources.plan_parser import PlanStreamParser
+
+class TestPlannerDag(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("SEARXNG_BASE_URL", "http://127.0.0.1:8080") # the web agent search tool needs an address
+        provider = Provider("test", "test-model")
+        self.planner = PlannerAgent("Planner", "prompts/base/planner_agent.txt", provider,
+                                    browser=None, browser_factory=lambda: None, max_parallel_tasks=2)
+        self.plan = self.planner.parse_agent_tasks(provider.test_fn([]))
+        self.runs = {}
+
+        async def make_plan(prompt, stream=None):
+            return self.plan
+
+        async def update_plan(goal, agents_tasks, agents_work_result, id, success):
+            return agents_tasks
+
+        async def start_agent_process(task, required_infos, agent=None):
+            start = time.time()
+            await asyncio.sleep(0.3)
+            self.runs[task['id']] = (start, time.time(), required_infos, agent)
+            return f"result {task['id']}", True
+
+        self.planner.make_plan = make_plan
+        self.planner.update_plan = update_plan
+        self.planner.start_agent_process = start_agent_process
+
+    def test_independent_tasks_run_concurrently(self):
+        answer, _ = asyncio.run(self.planner.process("find AI startups", None))
+        self.assertEqual(answer, "result 3")
+        start_1, end_1, _, agent_1 = self.runs["1"]
+        start_2, end_2, _, agent_2 = self.runs["2"]
+        start_3, _, infos_3, _ = self.runs["3"]
+        self.assertLess(abs(start_1 - start_2), 0.1)
+        self.assertIsNot(agent_1, agent_2)
+        self.assertGreaterEqual(start_3, max(end_1, end_2))
+        self.assertEqual(infos_3, {"1": "result 1", "2": "result 2"})
+
+    def test_early_dispatch(self):
+        answer = Provider("test", "test-model").test_fn([])
+
+        async def make_plan(prompt, stream=None):
+            for i in range(0, len(answer), 20): # streamed answer
+                stream.feed(answer[i:i + 20])
+                await asyncio.sleep(0.01)
+            self.plan_done = time.time()
+            return self.planner.parse_agent_tasks(answer)
+
+        self.planner.make_plan = make_plan
+        result, _ = asyncio.run(self.planner.process("find AI startups", None))
+        self.assertEqual(result, "result 3")
+        self.assertLess(self.runs["1"][0], self.plan_done)
+        self.assertGreaterEqual(self.runs["3"][0], self.plan_done)
+
+    def test_plan_retry_restarts_stream(self):
+        answers = ["```json\n{\"plan\": 42}\n```", Provider("test", "test-model").test_fn([])]
+        reported = []
+
+        async def llm_request(options=None, stream=None):
+            stream.feed(answers.pop(0))
+            return stream.text, ""
+
+        planner = PlannerAgent("Planner", "prompts/base/planner_agent.txt", Provider("test", "test-model"), browser=None)
+        planner.llm_request = llm_request
+        stream = PlanStreamParser(lambda task, position: reported.append(task['id']))
+        plan = asyncio.run(planner.make_plan("find AI startups", stream))
+        self.assertEqual(len(plan), 3)
+        self.assertEqual(reported, ["1", "2", "3"])
+
+    def test_max_parallel_tasks(self):
+        self.planner.max_parallel_tasks = 1
+        asyncio.run(self.planner.process("find AI startups", None))
+        self.assertGreaterEqual(self.runs["2"][0], self.runs["1"][1])
+
+class TestSharedAgents(unittest.TestCase):
+    def test_planner_reuses_agents(self):
+        provider = Provider("test", "test-model")
+        casual = CasualAgent("Friday", "prompts/base/casual_agent.txt", provider)
+        planner = PlannerAgent("Planner", "prompts/base/planner_agent.txt", provider, browser=None, shared_agents=[casual])
+        self.assertEqual(planner.agents, {"casual": casual})
+        priority, memory = casual.priority, casual.memory
+        memory.push('user', "hello")
+        self.assertIs(planner.acquire_agent("casual"), casual)
+        self.assertEqual(casual.priority, PRIORITY_PLANNER)
+        self.assertEqual(casual.memory.get(), memory.get()[:1]) # the task does not see the user conversation
+        casual.memory.push('user', "planner task")
+        self.assertIsNot(planner.acquire_agent("casual"), casual)
+        planner.release_agent("casual", casual)
+        self.assertEqual(casual.priority, priority)
+        self.assertIs(casual.memory, memory)
+        self.assertEqual(len(memory.get()), 2)
+        self.assertIs(Tools().config, planner.tools['json'].config) # config.ini parsed once
+
+class TestTaskBudget(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("SEARXNG_BASE_URL", "http://127.0.0.1:8080")
+        registry.reset()
+        provider = Provider("test", "test-model")
+        self.planner = PlannerAgent("Planner", "prompts/base/planner_agent.txt", provider, browser=None,
+                                    task_time_budget=0.3, task_token_budget=1000)
+        self.agent = CasualAgent("Friday", "prompts/base/casual_agent.txt", provider)
+        self.task = {"agent": "Casual", "id": "1", "task": "find AI startups"}
+
+    def run_task(self, call_tokens: int = 0):
+        async def process(prompt, speech_module):
+            self.agent.last_answer = "Found two startups so far."
+            while True: # never decides it is done
+                if call_tokens:
+                    with track_call("test", "test-model", [{"content": "x" * call_tokens * 4}]) as call:
+                        call.output = ""
+                await asyncio.sleep(0.05)
+                check_cancelled()
+        self.agent.process = process
+        return asyncio.run(self.planner.start_agent_process(self.task, {}, self.agent))
+
+    def test_time_budget(self):
+        start = time.time()
+        answer, success = self.run_task()
+        self.assertLess(time.time() - start, 2)
+        self.assertFalse(success)
+        self.assertIn("Found two startups so far.", answer)
+        self.assertIn("time budget exceeded", answer)
+        self.assertEqual(registry.get_counter("task_budget_overruns_total", {"agent": "casual", "budget": "time"}), 1)
+
+    def test_token_budget(self):
+        answer, success = self.run_task(call_tokens=400)
+        self.assertFalse(success)
+        self.assertIn("tokens budget exceeded", answer)
+        self.assertEqual(registry.get_counter("task_budget_overruns_total", {"agent": "casual", "budget": "tokens"}), 1)
+
+    def test_query_cancellation_is_not_a_partial_result(self):
+        async def main():
+            token = CancellationToken()
+            current_cancellation.set(token)
+            asyncio.get_running_loop().call_later(0.1, token.cancel)
+            async def process(prompt, speech_module):
+                while True:
+                    await asyncio.sleep(0.02)
+                    check_cancelled()
+            self.agent.process = process
+            await self.planner.start_agent_process(self.task, {}, self.agent)
+        with self.assertRaises(CancelledByUser):
+            asyncio.run(main())
+
+class TestPlanUpdatePolicy(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("SEARXNG_BASE_URL", "http://127.0.0.1:8080")
+        registry.reset()
+        provider = Provider("test", "test-model")
+        self.planner = PlannerAgent("Planner", "prompts/base/planner_agent.txt", provider, browser=None)
+        self.plan = self.planner.parse_agent_tasks(provider.test_fn([]))
+        self.update_calls = 0
+
+        async def make_plan(prompt):
+            self.update_calls += 1
+            self.update_prompt = prompt
+            return []
+
+        self.planner.make_plan = make_plan
+
+    def update(self, work: str, success: bool):
+        return asyncio.run(self.planner.update_plan("goal", self.plan, {"1": work}, "1", success))
+
+    def test_policies(self):
+        good = "Found five AI startups in Osaka with their websites.\nAgent succeeded with task."
+        bad = "The search returned an error page.\nAgent succeeded with task."
+        self.assertEqual(self.update(good, True), self.plan)
+        self.update(good, False)
+        self.assertEqual(self.update_calls, 1)
+        self.planner.update_policy = "confidence"
+        self.update(good, True)
+        self.update(bad, True)
+        self.assertEqual(self.update_calls, 2)
+        self.planner.update_policy = "always"
+        self.update(good, True)
+        self.assertEqual(self.update_calls, 3)
+        self.assertEqual(registry.get_counter("planner_plan_updates_total", {"policy": "on_failure", "result": "skipped"}), 1)
+        self.assertEqual(registry.get_counter("planner_plan_updates_total", {"policy": "always", "result": "unchanged"}), 1)
+
+    def test_next_task_found_by_id(self):
+        self.planner.update_policy = "always"
+        plan = [["Search startups", {"agent": "Web", "id": "search", "task": "Search AI startups"}],
+                ["Write report", {"agent": "File", "id": "report", "task": "Write the report", "need": ["search", "count"]}],
+                ["Count startups", {"agent": "Casual", "id": "count", "task": "Count the startups"}]]
+        asyncio.run(self.planner.update_plan("goal", plan, {"count": "3 startups."}, "count", True))
+        self.assertIn("Next task is: Search startups.", self.update_prompt)
+        results = {"count": "3 startups.", "search": "Found them.", "report": "Done."}
+        asyncio.run(self.planner.update_plan("goal", plan, results, "report", True))
+        self.assertIn("this was the last step", self.update_prompt)
+
+class TestPlanCheckpoint(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("SEARXNG_BASE_URL", "http://127.0.0.1:8080")
+        self.folder = tempfile.TemporaryDirectory()
+        provider = Provider("test", "test-model")
+        self.planner = PlannerAgent("Planner", "prompts/base/planner_agent.txt", provider, browser=None,
+                                    checkpoints=PlanCheckpoint(self.folder.name))
+        self.plan = self.planner.parse_agent_tasks(provider.test_fn([]))
+        self.plans_made = 0
+        self.started = []
+        self.crash = True
+
+        async def make_plan(prompt, stream=None):
+            self.plans_made += 1
+            return self.plan
+
+        async def update_plan(goal, agents_tasks, agents_work_result, id, success):
+            return agents_tasks
+
+        async def start_agent_process(task, required_infos, agent=None):
+            self.started.append(task['id'])
+            if task['id'] == "3" and self.crash:
+                raise TimeoutError("browser timeout")
+            return f"result {task['id']}", True
+
+        self.planner.make_plan = make_plan
+        self.planner.update_plan = update_plan
+        self.planner.start_agent_process = start_agent_process
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_resume_from_unfinished_task(self):
+        with self.assertRaises(TimeoutError):
+            asyncio.run(self.planner.process("find AI startups", None))
+        self.assertEqual(self.planner.checkpoints.latest(), "find AI startups")
+        self.crash = False
+        self.started = []
+        answer, _ = asyncio.run(self.planner.process("find AI startups", None))
+        self.assertEqual(answer, "result 3")
+        self.assertEqual(self.started, ["3"])
+        self.assertEqual(self.plans_made, 1)
+        self.assertIsNone(self.planner.checkpoints.latest())
+
+if __name__ == '__main__':
+    unittest.main()
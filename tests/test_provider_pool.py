@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os, sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.provider_pool import ProviderPool, current_endpoint
+
+class TestProviderPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = ProviderPool.from_config("10.0.0.1:11434, 10.0.0.2:11434", failure_threshold=2, cooldown=60)
+        self.connect = patch('socket.create_connection', return_value=MagicMock())
+        self.connect.start()
+
+    def tearDown(self):
+        self.connect.stop()
+
+    def test_from_config(self):
+        self.assertEqual([e.address for e in self.pool.endpoints], ["10.0.0.1:11434", "10.0.0.2:11434"])
+        self.assertEqual(self.pool.endpoints[1].host_port(), ("10.0.0.2", 11434))
+
+    def test_least_loaded_dispatch(self):
+        with self.pool.use() as first:
+            self.assertEqual(current_endpoint.get(), first.address)
+            second = self.pool.select()
+            self.assertNotEqual(first.address, second.address)
+        self.assertIsNone(current_endpoint.get())
+        self.assertEqual(first.in_flight, 0)
+
+    def test_probe_is_cached(self):
+        endpoint = self.pool.endpoints[0]
+        with patch('socket.create_connection', side_effect=OSError) as connect:
+            self.assertFalse(self.pool.probe(endpoint))
+            self.assertFalse(self.pool.probe(endpoint))
+            self.assertEqual(connect.call_count, 1)
+        self.assertEqual(self.pool.select().address, "10.0.0.2:11434")
+
+    def test_circuit_breaker_opens(self):
+        endpoint = self.pool.endpoints[0]
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                with self.pool.use(endpoint):
+                    raise ConnectionError("refused")
+        self.assertFalse(self.pool.is_available(endpoint))
+        self.assertEqual(self.pool.select().address, "10.0.0.2:11434")
+        endpoint.circuit_open_until = 0.0
+        with self.pool.use(endpoint):
+            pass
+        self.assertEqual(endpoint.consecutive_failures, 0)
+        self.assertTrue(self.pool.is_available(endpoint))
+
+if __name__ == '__main__':
+    unittest.main()
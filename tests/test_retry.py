@@ -0,0 +1,91 @@
+import unittest
+import asyncio
+import os
+import sys
+
+import httpx
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.retry import RetryPolicy, is_transient, retry_after
+from sources.llm_provider import Provider
+
+class TestRetry(unittest.TestCase):
+    def test_transient_errors(self):
+        try:
+            try:
+                raise httpx.ConnectError("connection refused")
+            except httpx.ConnectError as e:
+                raise Exception("Ollama connection failed.") from e
+        except Exception as wrapped:
+            self.assertTrue(is_transient(wrapped))
+        self.assertTrue(is_transient(Exception("Server overloaded, try again later")))
+        self.assertFalse(is_transient(ValueError("bad json")))
+
+    def test_retry_after_header(self):
+        response = httpx.Response(429, headers={"Retry-After": "3"}, request=httpx.Request("POST", "http://api"))
+        error = httpx.HTTPStatusError("rate limited", request=response.request, response=response)
+        self.assertTrue(is_transient(error))
+        self.assertEqual(retry_after(error), 3.0)
+        self.assertEqual(RetryPolicy(max_delay=1.0).delay(error, 0), 1.0)
+
+    def test_retries_then_succeeds(self):
+        attempts = []
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError("reset by peer")
+            return "ok"
+        self.assertEqual(RetryPolicy(max_retries=2, base_delay=0.0).call(flaky), "ok")
+        attempts.clear()
+        with self.assertRaises(ConnectionError):
+            RetryPolicy(max_retries=1, base_delay=0.0).call(flaky)
+        self.assertEqual(len(attempts), 2)
+
+class NotFound(Exception):
+    status_code = 404
+
+class TestModelPull(unittest.TestCase):
+    def chunk(self, text):
+        return {"message": {"content": text}, "done": True}
+
+    def test_missing_model_is_pulled_once_then_retried(self):
+        provider = Provider("ollama", "tiny", is_local=True)
+        provider.retry_policy = RetryPolicy(max_retries=2, base_delay=0.0)
+        client = MagicMock()
+        client.chat.side_effect = [NotFound("model not found"), iter([self.chunk("hello")])]
+        with patch("sources.llm_provider.OllamaClient", return_value=client):
+            self.assertEqual(provider.retry_policy.call(provider.ollama_fn, []), "hello")
+        client.pull.assert_called_once_with("tiny")
+
+    def test_model_still_missing_after_pull_raises(self):
+        provider = Provider("ollama", "tiny", is_local=True)
+        provider.retry_policy = RetryPolicy(max_retries=2, base_delay=0.0)
+        client = MagicMock()
+        client.chat.side_effect = NotFound("model not found")
+        with patch("sources.llm_provider.OllamaClient", return_value=client):
+            with self.assertRaises(Exception) as context:
+                provider.retry_policy.call(provider.ollama_fn, [])
+        self.assertIn("after downloading", str(context.exception))
+        client.pull.assert_called_once_with("tiny")
+        self.assertEqual(client.chat.call_count, 2)
+
+class TestHedging(unittest.TestCase):
+    def test_slow_call_is_hedged(self):
+        provider = Provider("test", "test-model", hedge=True)
+        provider.latencies.extend([0.01] * 20)
+        calls = []
+
+        async def test_afn(history, verbose=False, options=None):
+            calls.append(1)
+            await asyncio.sleep(1.0 if len(calls) == 1 else 0.0)
+            return f"answer {len(calls)}"
+
+        provider.available_async_providers["test"] = test_afn
+        answer = asyncio.run(provider.arespond([{'role': 'user', 'content': 'hi'}], verbose=False))
+        self.assertEqual(answer, "answer 2")
+        self.assertEqual(provider.admission.stats()["in_flight"], {"test": 0})
+
+if __name__ == '__main__':
+    unittest.main()
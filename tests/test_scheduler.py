@@ -0,0 +1,89 @@
+import unittest
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.scheduler import AdmissionScheduler, PRIORITY_INTERACTIVE, PRIORITY_PLANNER, PRIORITY_BACKGROUND
+
+class TestAdmissionScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = AdmissionScheduler(["a:1", "b:2"], max_in_flight=1)
+
+    def test_spreads_across_endpoints(self):
+        first = self.scheduler.acquire(session="s1")
+        second = self.scheduler.acquire(session="s1")
+        self.assertEqual({first, second}, {"a:1", "b:2"})
+        self.assertEqual(self.scheduler.stats()["sessions"], {"s1": 2})
+        self.scheduler.release(first, "s1")
+        self.scheduler.release(second, "s1")
+        self.assertEqual(self.scheduler.stats()["in_flight"], {"a:1": 0, "b:2": 0})
+
+    def admission_order(self, requests: list) -> list:
+        """Fill both endpoints, queue the requests (priority, session) then free the slots one at a time."""
+        async def run():
+            order = []
+            held = [await self.scheduler.aacquire(session="holder") for _ in range(2)]
+
+            async def request(priority, session, name):
+                address = await self.scheduler.aacquire(priority, session)
+                order.append(name)
+                self.scheduler.release(address, session)
+
+            tasks = [asyncio.create_task(request(priority, session, name)) for priority, session, name in requests]
+            await asyncio.sleep(0)
+            self.assertEqual(sum(self.scheduler.stats()["queued"].values()), len(requests))
+            self.scheduler.release(held[0], "holder")
+            await asyncio.gather(*tasks)
+            self.scheduler.release(held[1], "holder")
+            return order
+        return asyncio.run(run())
+
+    def test_priority_classes(self):
+        order = self.admission_order([
+            (PRIORITY_BACKGROUND, "s1", "background"),
+            (PRIORITY_PLANNER, "s1", "planner"),
+            (PRIORITY_INTERACTIVE, "s1", "interactive"),
+        ])
+        self.assertEqual(order, ["interactive", "planner", "background"])
+
+    def test_fair_sharing_across_sessions(self):
+        order = self.admission_order([
+            (PRIORITY_PLANNER, "holder", "holder task"),
+            (PRIORITY_PLANNER, "other", "other task"),
+        ])
+        self.assertEqual(order[0], "other task")
+
+    def test_cancelled_waiter_leaves_queue(self):
+        async def run():
+            held = [await self.scheduler.aacquire() for _ in range(2)]
+            task = asyncio.create_task(self.scheduler.aacquire(session="s1"))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            for address in held:
+                self.scheduler.release(address)
+        asyncio.run(run())
+        self.assertEqual(self.scheduler.stats()["in_flight"], {"a:1": 0, "b:2": 0})
+        self.assertEqual(self.scheduler.stats()["queued"]["interactive"], 0)
+
+    def test_unavailable_endpoint_is_not_admitted(self):
+        down = {"a:1"}
+        scheduler = AdmissionScheduler(["a:1", "b:2"], max_in_flight=1, available=lambda address: address not in down)
+        self.assertEqual(scheduler.acquire(session="s1"), "b:2")
+        address, waiter = scheduler.try_acquire(PRIORITY_INTERACTIVE, "s1", None)
+        self.assertIsNone(address)
+        down.clear()
+        scheduler.wake()
+        self.assertEqual(waiter.endpoint, "a:1")
+
+    def test_every_endpoint_unavailable_falls_back(self):
+        scheduler = AdmissionScheduler(["a:1", "b:2"], max_in_flight=1, available=lambda address: False,
+                                       rank=lambda address: address != "b:2")
+        self.assertEqual(scheduler.acquire(session="s1"), "b:2")
+        self.assertEqual(scheduler.acquire(session="s1"), "a:1")
+
+if __name__ == '__main__':
+    unittest.main()
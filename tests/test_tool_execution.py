@@ -0,0 +1,121 @@
+import unittest
+import asyncio
+import time
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+from sources.agents.agent import Agent
+from sources.tools.tools import Tools
+from sources.llm_provider import Provider
+from sources.streaming import BlockDispatcher, stream_chunk
+
+class SleepTool(Tools):
+    def __init__(self, tag: str, side_effect_free: bool):
+        super().__init__()
+        self.tag = tag
+        self.side_effect_free = side_effect_free
+        self.thread_safe = True
+        self.executed = []
+
+    def execute(self, blocks, safety=False) -> str:
+        query = blocks[0].strip()
+        time.sleep(0.3)
+        self.executed.append(query)
+        return f"failure {query}" if query.startswith("fail") else f"result {query}"
+
+    def execution_failure_check(self, output: str) -> bool:
+        return output.startswith("failure")
+
+    def interpreter_feedback(self, output: str) -> str:
+        return output
+
+class ListMemory:
+    def __init__(self):
+        self.messages = []
+        self.session_id = "test"
+
+    def get(self) -> list:
+        return []
+
+    def get_within_context(self, reserve: int | None = None) -> list:
+        return []
+
+    def push(self, role: str, content: str) -> None:
+        self.messages.append(content)
+
+class TestToolExecution(unittest.TestCase):
+    def setUp(self):
+        self.agent = Agent("test", None, None)
+        self.agent.memory = ListMemory()
+        self.agent.show_block = lambda block: None
+        self.search = SleepTool("web_search", side_effect_free=True)
+        self.shell = SleepTool("bash", side_effect_free=False)
+        self.agent.tools = {"web_search": self.search, "bash": self.shell}
+
+    def test_side_effect_free_blocks_run_concurrently(self):
+        answer = "Searching:\n```web_search\nfirst\n```\n```web_search\nsecond\n```\n```web_search\nthird\n```"
+        start = time.time()
+        success, feedback = self.agent.execute_modules(answer)
+        self.assertLess(time.time() - start, 0.8)
+        self.assertTrue(success)
+        self.assertEqual([result.feedback for result in self.agent.blocks_result],
+                         ["result first", "result second", "result third"])
+        self.assertEqual(feedback, "result third")
+
+    def test_stop_on_failure_option(self):
+        answer = "Run:\n```bash\nfail one\n```\n```bash\ntwo\n```"
+        success, feedback = self.agent.execute_modules(answer)
+        self.assertFalse(success)
+        self.assertEqual(self.shell.executed, ["fail one"])
+        self.agent.stop_on_failure = False
+        self.shell.executed.clear()
+        success, feedback = self.agent.execute_modules(answer)
+        self.assertFalse(success)
+        self.assertEqual(feedback, "failure fail one")
+        self.assertEqual(self.shell.executed, ["fail one", "two"])
+
+    def test_independent_marker(self):
+        answer = "Run:\n```bash independent\none\n```\n```bash independent\ntwo\n```"
+        start = time.time()
+        self.agent.execute_modules(answer)
+        self.assertLess(time.time() - start, 0.55)
+        self.assertEqual(sorted(self.shell.executed), ["one", "two"])
+
+class TestStreamingExecution(unittest.TestCase):
+    def test_blocks_run_while_streaming(self):
+        provider = Provider("test", "test-model")
+        chunks = ["Listing:\n```ba", "sh\nfirst\n``", "`\nand then\n", "```bash\nsecond\n```\n"]
+        first_done_during_stream = []
+
+        async def test_afn(history, verbose=False, options=None):
+            for chunk in chunks:
+                stream_chunk(chunk)
+                await asyncio.sleep(0.5)
+            first_done_during_stream.append(list(shell.executed))
+            return "".join(chunks)
+
+        provider.available_async_providers["test"] = test_afn
+        agent = Agent("test", None, provider)
+        agent.memory = ListMemory()
+        agent.show_block = lambda block: None
+        shell = SleepTool("bash", side_effect_free=False)
+        agent.tools = {"bash": shell}
+
+        async def process():
+            dispatcher = BlockDispatcher(agent.tools, agent.run_block)
+            try:
+                answer, _ = await agent.llm_request(stream=dispatcher)
+                return await agent.aexecute_modules(answer, dispatcher)
+            finally:
+                dispatcher.close()
+
+        success, feedback = asyncio.run(process())
+        self.assertTrue(success)
+        self.assertEqual(first_done_during_stream, [["first", "second"]])
+        self.assertEqual(shell.executed, ["first", "second"])
+        self.assertEqual([result.feedback for result in agent.blocks_result], ["result first", "result second"])
+
+if __name__ == '__main__':
+    unittest.main()